@@ -1,8 +1,14 @@
 import json
 import os
+import sys
 from datetime import datetime, timezone
+from pathlib import Path
 from typing import List
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+
+import pipeline_state
+
 # ==========================================================
 # CONFIG
 # ==========================================================
@@ -131,7 +137,7 @@ def calculate_ar_invoice_metrics(invoice: dict) -> dict:
         aging_bucket = None
     else:
         days_outstanding = max(
-            0, (datetime.now().date() - invoice_date.date()).days
+            0, (pipeline_state.today() - invoice_date.date()).days
         )
 
         if days_outstanding <= 30:
@@ -1,18 +1,11 @@
-import os
-import pyodbc
+import foundation_db
 
-print("Starting Foundation connection test...")
+def main():
+    print("Starting Foundation connection test...")
 
-conn = pyodbc.connect(
-    "DRIVER={ODBC Driver 17 for SQL Server};"
-    "SERVER=sql.foundationsoft.com,9000;"
-    "DATABASE=Cas_5587;"
-    f"UID={os.environ['FOUNDATION_SQL_USER']};"
-    f"PWD={os.environ['FOUNDATION_SQL_PASSWORD']};",
-    timeout=5
-)
+    foundation_db.query("SELECT 1")
 
-cursor = conn.cursor()
-cursor.execute("SELECT 1")
+    print("FOUNDATION CONNECTION SUCCESSFUL")
 
-print("FOUNDATION CONNECTION SUCCESSFUL")
+if __name__ == "__main__":
+    main()
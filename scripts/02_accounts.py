@@ -1,9 +1,7 @@
-import os
-import pyodbc
-import pandas as pd
+import artifacts
+import foundation_db
+import schemas
 
-SERVER = "sql.foundationsoft.com,9000"
-DATABASE = "Cas_5587"  # MUST match the database name that worked in your test
 SCHEMA = "dbo"
 TABLE = "accounts"
 OUTFILE = "data/accounts.csv"
@@ -18,17 +16,8 @@ REMOVE_COLS = {
     "company_no",
 }
 
-def connect():
-    return pyodbc.connect(
-        "DRIVER={ODBC Driver 17 for SQL Server};"
-        f"SERVER={SERVER};"
-        f"DATABASE={DATABASE};"
-        f"UID={os.environ['FOUNDATION_SQL_USER']};"
-        f"PWD={os.environ['FOUNDATION_SQL_PASSWORD']};",
-        timeout=20
-    )
 
-def get_first_n_columns(conn, n=10):
+def get_first_n_columns(n=10):
     # Pull column names in ordinal order (matches Power Query "first 10 columns")
     sql = """
     SELECT COLUMN_NAME
@@ -36,9 +25,7 @@ def get_first_n_columns(conn, n=10):
     WHERE TABLE_SCHEMA = ? AND TABLE_NAME = ?
     ORDER BY ORDINAL_POSITION
     """
-    cur = conn.cursor()
-    rows = cur.execute(sql, (SCHEMA, TABLE)).fetchall()
-    cols = [r[0] for r in rows]
+    cols = foundation_db.query(sql, (SCHEMA, TABLE))["COLUMN_NAME"].tolist()
     return cols[:n]
 
 def quote_ident(name: str) -> str:
@@ -48,10 +35,8 @@ def quote_ident(name: str) -> str:
 def main():
     print("Exporting Accounts → accounts.csv ...")
 
-    conn = connect()
-
     # Replicate Power Query: take first 10 columns, then remove unwanted fields
-    first_10 = get_first_n_columns(conn, n=10)
+    first_10 = get_first_n_columns(n=10)
     selected_cols = [c for c in first_10 if c not in REMOVE_COLS]
 
     # Ensure account_no is present so we can build Account_Key
@@ -61,7 +46,7 @@ def main():
     col_sql = ", ".join(quote_ident(c) for c in selected_cols)
     sql = f"SELECT {col_sql} FROM {quote_ident(SCHEMA)}.{quote_ident(TABLE)}"
 
-    df = pd.read_sql(sql, conn)
+    df = foundation_db.query(sql)
 
     if "account_no" not in df.columns:
         raise RuntimeError("account_no column not found; cannot compute Account_Key")
@@ -71,17 +56,12 @@ def main():
     # - Convert to text
     # - Strip trailing '.0'
     # ------------------------------------------------------------
-    df["account_no"] = (
-        df["account_no"]
-          .astype(str)
-          .str.replace(r"\.0$", "", regex=True)
-          .str.strip()
-    )
+    df["account_no"] = schemas.normalize_id(df["account_no"])
 
     # Build Account_Key (PadStart to 4)
     df["Account_Key"] = df["account_no"].str.zfill(4)
 
-    df.to_csv(OUTFILE, index=False)
+    artifacts.write_csv("accounts", df, OUTFILE)
     print(f"Wrote {OUTFILE} ({len(df)} rows, {len(df.columns)} columns)")
 
 if __name__ == "__main__":
@@ -1,30 +1,40 @@
 import os
-import pyodbc
+import time
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import date
 
-SERVER = "sql.foundationsoft.com,9000"
-DATABASE = "Cas_5587"
+import artifacts
+import datasets
+import foundation_db
+import pipeline_state
+import schemas
+from partitions import PartitionStore
+
+# Published as the typed, month-partitioned dataset
+# data/gl_history_raw/ (see datasets.py). GL_RAW_CSV=1 also writes
+# the whole GL as OUTFILE for consumers of the old CSV.
+DATASET = "gl_history_raw"
 OUTFILE = "data/gl_history_raw.csv"
-
-QUERY_TIMEOUT_SECONDS = 900  # 15 minutes per month
+GL_RAW_CSV = os.getenv("GL_RAW_CSV") == "1"
 
 # Optional hard performance lever
 # Example: set GL_START_DATE=2022-01-01 in GitHub secrets
 GL_START_DATE = os.getenv("GL_START_DATE")
 
-def connect():
-    conn = pyodbc.connect(
-        "DRIVER={ODBC Driver 17 for SQL Server};"
-        f"SERVER={SERVER};"
-        f"DATABASE={DATABASE};"
-        f"UID={os.environ['FOUNDATION_SQL_USER']};"
-        f"PWD={os.environ['FOUNDATION_SQL_PASSWORD']};"
-        "TrustServerCertificate=yes;",
-        timeout=30
-    )
-    conn.timeout = QUERY_TIMEOUT_SECONDS
-    return conn
+# One partition per MonthStart is kept between runs (see
+# partitions.py). Only the last GL_OPEN_MONTHS months, anything
+# from the previous watermark on, and missing months are pulled;
+# closed months are reused. GL_FULL_REBUILD=1 re-pulls everything.
+GL_OPEN_MONTHS = int(os.getenv("GL_OPEN_MONTHS", "3"))
+GL_FULL_REBUILD = os.getenv("GL_FULL_REBUILD") == "1"
+
+# Months are pulled in parallel, each on its own pooled
+# connection; keep this small, Foundation's server is shared.
+# A month that times out is retried up to GL_MONTH_RETRIES times.
+GL_WORKERS = int(os.getenv("GL_WORKERS", str(foundation_db.POOL_SIZE)))
+GL_MONTH_RETRIES = int(os.getenv("GL_MONTH_RETRIES", "2"))
+
 
 def month_range(start, end):
     y, m = start.year, start.month
@@ -40,24 +50,75 @@ def month_range(start, end):
             m = 1
             y += 1
 
-def normalize(df):
-    for col in ["Account", "Job", "FullAccountNo"]:
-        if col in df.columns:
-            df[col] = (
-                df[col]
-                .astype(str)
-                .str.replace(r"\.0$", "", regex=True)
-                .str.strip()
-            )
-    return df
+def add_months(d, n):
+    i = d.year * 12 + d.month - 1 + n
+    return date(i // 12, i % 12 + 1, 1)
+
+GL_MONTH_SQL = """
+SELECT
+    basic_account_no AS Account,
+    job_no AS Job,
+    journal_no AS Jrnl,
+    transaction_no AS TrxNo,
+    line_no AS Line,
+    full_account_no AS FullAccountNo,
+    amount_db AS Debit,
+    amount_cr AS Credit,
+    description,
+    vendor_no,
+    voucher_no,
+    audit_number,
+    customer_no,
+    ar_invoice_no,
+    cash_trx_no,
+    record_status,
+    ar_invoice_id,
+    basic_account_id,
+    cash_trx_id,
+    customer_id,
+    full_account_id,
+    job_id,
+    job_trx_id,
+    journal_id,
+    line_id,
+    transaction_id,
+    vendor_id,
+    voucher_id,
+    COALESCE(date_booked, date_posted) AS ActivityDate,
+    DATEFROMPARTS(
+        YEAR(COALESCE(date_booked, date_posted)),
+        MONTH(COALESCE(date_booked, date_posted)),
+        1
+    ) AS MonthStart
+FROM dbo.gl_history WITH (NOLOCK)
+WHERE COALESCE(date_booked, date_posted) >= ?
+  AND COALESCE(date_booked, date_posted) < ?
+"""
+
+def pull_month(start, end):
+    for attempt in range(GL_MONTH_RETRIES + 1):
+        try:
+            df = foundation_db.query(GL_MONTH_SQL, [start, end])
+            # Ids and journals are normalised here, once; readers
+            # of the dataset use them as stored
+            return schemas.normalize(DATASET, df)
+        except Exception as e:
+            if attempt == GL_MONTH_RETRIES or not foundation_db.is_timeout(e):
+                raise
+            print(f"   GL month {start} timed out, retry {attempt + 1}/{GL_MONTH_RETRIES}")
+            time.sleep(10 * (attempt + 1))
 
 def main():
-    print("Exporting RAW GL History → gl_history_raw.csv")
+    print(f"Exporting RAW GL History → {datasets.path(DATASET)}/")
 
-    if os.path.exists(OUTFILE):
-        os.remove(OUTFILE)
-
-    conn = connect()
+    store = PartitionStore(
+        "gl_history_raw",
+        schemas.get(DATASET),
+        pipeline_state.code_signature(GL_MONTH_SQL, schemas.normalize, *schemas.NORMALIZE_CODE),
+    )
+    if GL_FULL_REBUILD:
+        print("Full rebuild requested: discarding stored months")
+        store.reset()
 
     # Determine date bounds
     bounds_sql = """
@@ -66,71 +127,73 @@ def main():
             MAX(COALESCE(date_booked, date_posted))
         FROM dbo.gl_history
     """
-    min_dt, max_dt = pd.read_sql(bounds_sql, conn).iloc[0]
+    min_dt, max_dt = foundation_db.query(bounds_sql).iloc[0]
 
     if GL_START_DATE:
         min_dt = max(pd.to_datetime(GL_START_DATE).date(), min_dt)
 
-    total_rows = 0
-
-    for start, end in month_range(min_dt, max_dt):
-        print(f"→ Pulling GL month {start} …")
-
-        sql = f"""
-        SELECT
-            basic_account_no AS Account,
-            job_no AS Job,
-            journal_no AS Jrnl,
-            transaction_no AS TrxNo,
-            line_no AS Line,
-            full_account_no AS FullAccountNo,
-            amount_db AS Debit,
-            amount_cr AS Credit,
-            description,
-            vendor_no,
-            voucher_no,
-            audit_number,
-            customer_no,
-            ar_invoice_no,
-            cash_trx_no,
-            record_status,
-            ar_invoice_id,
-            basic_account_id,
-            cash_trx_id,
-            customer_id,
-            full_account_id,
-            job_id,
-            job_trx_id,
-            journal_id,
-            line_id,
-            transaction_id,
-            vendor_id,
-            voucher_id,
-            COALESCE(date_booked, date_posted) AS ActivityDate,
-            DATEFROMPARTS(
-                YEAR(COALESCE(date_booked, date_posted)),
-                MONTH(COALESCE(date_booked, date_posted)),
-                1
-            ) AS MonthStart
-        FROM dbo.gl_history WITH (NOLOCK)
-        WHERE COALESCE(date_booked, date_posted) >= ?
-          AND COALESCE(date_booked, date_posted) < ?
-        """
-
-        df = pd.read_sql(sql, conn, params=[start, end])
-
-        if df.empty:
+    # Months from refresh_from on may still change. A month that
+    # was open at the last refresh is pulled once more even if it
+    # has closed since, so late postings to it are not lost.
+    open_from = add_months(pipeline_state.today().replace(day=1), -(GL_OPEN_MONTHS - 1))
+    refresh_from = open_from.isoformat()
+    if store.watermark:
+        refresh_from = min(refresh_from, store.watermark)
+
+    run_id = os.getenv("PIPELINE_RUN_ID")
+    months = list(month_range(min_dt, max_dt))
+    keys = [start.isoformat() for start, _ in months]
+
+    todo = []
+    for (start, end), month_key in zip(months, keys):
+        entry = store.entry(month_key)
+        if store.has(month_key) and (
+            month_key < refresh_from
+            # Already refreshed earlier in this run (run_all --resume)
+            or (run_id and entry["run_id"] == run_id)
+        ):
             continue
+        todo.append((start, end, month_key))
 
-        df = normalize(df)
-
-        write_header = not os.path.exists(OUTFILE)
-        df.to_csv(OUTFILE, mode="a", header=write_header, index=False)
-
-        total_rows += len(df)
-        print(f"   wrote {len(df)} rows (total {total_rows})")
+    print(
+        f"Pulling {len(todo)} months with {GL_WORKERS} workers, "
+        f"reusing {len(months) - len(todo)} closed months"
+    )
 
-    print(f"Wrote {OUTFILE} ({total_rows} rows)")
+    step = pipeline_state.current_step()
+
+    def refresh(start, end, month_key):
+        pipeline_state.set_current_step(step)
+        df = pull_month(start, end)
+        store.write(month_key, df)
+        return len(df)
+
+    # Each month lands in its own partition; a failure stops the
+    # months not yet started, the finished ones are kept
+    with ThreadPoolExecutor(max_workers=GL_WORKERS) as pool:
+        futures = {pool.submit(refresh, *month): month[0] for month in todo}
+        try:
+            for fut in as_completed(futures):
+                print(f"→ GL month {futures[fut]}: {fut.result()} rows")
+        except BaseException:
+            pool.shutdown(cancel_futures=True)
+            raise
+
+    store.set_watermark(open_from.isoformat())
+
+    total_rows = store.publish(keys, DATASET, "MonthStart")
+    print(f"Wrote {datasets.path(DATASET)}/ ({len(keys)} months, {total_rows} rows)")
+
+    if GL_RAW_CSV:
+        artifacts.write_csv_batches(
+            "gl_history_raw",
+            (df for _, df in datasets.iter_partitions(DATASET)),
+            OUTFILE,
+        )
+        print(f"Wrote {OUTFILE}")
+    elif os.path.exists(OUTFILE):
+        # A CSV left from an earlier run would no longer match
+        os.remove(OUTFILE)
 
 if __name__ == "__main__":
     main()
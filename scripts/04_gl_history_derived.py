@@ -1,53 +1,37 @@
-import os
 import pandas as pd
-import numpy as np
 
-RAW_FILE = "data/gl_history_raw.csv"
+import artifacts
+import gl_balances
+import gl_matrix
+import pipeline_state
+
 ACCTS_FILE = "data/accounts.csv"
 OUTFILE = "data/gl_history.csv"
+ALL_OUTFILE = "data/gl_history_all.csv"
 
 def _today_pacific_date():
     # Use Pacific time for month-boundary logic
-    return pd.Timestamp.now(tz="America/Los_Angeles").date()
-
-def _normalize_id_text(s: pd.Series) -> pd.Series:
-    return (
-        s.astype(str)
-         .str.replace(r"\.0$", "", regex=True)
-         .str.strip()
-         .replace({"nan": "", "None": ""})
-    )
-
-def main():
-    print("Building gl_history_derived.csv from raw + accounts...")
-
-    # ------------------------------------------------------------
-    # Load raw GL
-    # ------------------------------------------------------------
-    df = pd.read_csv(RAW_FILE, low_memory=False)
-
-    for col in ["Account", "Job", "FullAccountNo", "Jrnl"]:
-        if col in df.columns:
-            df[col] = _normalize_id_text(df[col])
-
-    df["Debit"] = pd.to_numeric(df["Debit"], errors="coerce").fillna(0.0)
-    df["Credit"] = pd.to_numeric(df["Credit"], errors="coerce").fillna(0.0)
+    return pipeline_state.today(gl_balances.TIMEZONE)
 
-    df["ActivityDate"] = pd.to_datetime(df["ActivityDate"], errors="coerce").dt.date
-    df["MonthStart"] = pd.to_datetime(df["MonthStart"], errors="coerce").dt.date
-
-    # Remove CLS journals
-    if "Jrnl" in df.columns:
-        df = df[df["Jrnl"] != "CLS"].copy()
+def require_columns(df: pd.DataFrame, cols: list[str], context: str):
+    missing = [c for c in cols if c not in df.columns]
+    if missing:
+        raise ValueError(
+            f"[FATAL] Missing required columns in {context}: {missing}"
+        )
 
+def account_months(monthly, ac):
+    """
+    The account x month rows of gl_history (Account, Account_Num,
+    Account_Description, MonthStart, MonthlyAmount), in account
+    and month order.
+    """
+    df = monthly.copy()
     df["Account_Num"] = pd.to_numeric(df["Account"], errors="coerce").astype("Int64")
-    df["NetAmount"] = df["Debit"] - df["Credit"]
 
     # ------------------------------------------------------------
     # Join Accounts descriptions
     # ------------------------------------------------------------
-    ac = pd.read_csv(ACCTS_FILE, low_memory=False)
-
     if "Account_Key" not in ac.columns:
         raise RuntimeError("accounts.csv missing Account_Key")
 
@@ -59,114 +43,120 @@ def main():
     if desc_col is None:
         raise RuntimeError("accounts.csv missing account description column")
 
-    ac["Account_Key"] = _normalize_id_text(ac["Account_Key"])
+    # Account_Key reads back as a number (see schemas.py)
+    ac["Account_Key"] = ac["Account_Key"].astype(str)
     ac = ac[["Account_Key", desc_col]].rename(columns={desc_col: "Account_Description"})
 
-    df["Account_Key"] = _normalize_id_text(df["Account"]).str.zfill(4)
+    df["Account_Key"] = df["Account"].str.zfill(4)
     df = df.merge(ac, how="left", on="Account_Key")
 
     # ------------------------------------------------------------
-    # Monthly aggregation
+    # Monthly series (accounts without a number or description
+    # are left out)
     # ------------------------------------------------------------
-    df = df[["Account", "Account_Num", "Account_Description", "MonthStart", "NetAmount"]].copy()
-    df = df[df["MonthStart"].notna() & df["Account_Num"].notna()]
+    df = df[["Account", "Account_Num", "Account_Description", "MonthStart", "MonthlyAmount"]]
+    df = df[df["Account_Num"].notna() & df["Account_Description"].notna()]
 
-    monthly = (
-        df.groupby(
-            ["Account", "Account_Num", "Account_Description", "MonthStart"],
-            as_index=False
-        )
-        .agg(MonthlyAmount=("NetAmount", "sum"))
-        .sort_values(["Account_Num", "MonthStart"])
-        .reset_index(drop=True)
-    )
+    return df.sort_values(["Account_Num", "MonthStart"]).reset_index(drop=True)
 
-    monthly["CumToDate"] = (
-        monthly.groupby(
-            ["Account", "Account_Num", "Account_Description"]
-        )["MonthlyAmount"].cumsum()
-    )
+def write_gl_history(monthly, ac):
+    monthly = account_months(monthly, ac)
 
     # ------------------------------------------------------------
-    # Date boundaries
+    # Dense account x month balances, stored for as-of rollups
+    # (see gl_balances.py)
     # ------------------------------------------------------------
-    current_date = _today_pacific_date()
-
-    start_last_complete = (
-        pd.Timestamp(current_date).replace(day=1) - pd.DateOffset(months=1)
-    ).date()
+    matrix = gl_matrix.dense(monthly, gl_matrix.KEYS)
+    rows = gl_balances.publish(matrix)
+    print(f"Wrote data/{gl_balances.DATASET}/ ({rows} account-months)")
 
-    start_previous = (
-        pd.Timestamp(start_last_complete).replace(day=1) - pd.DateOffset(months=1)
-    ).date()
-
-    start_second_previous = (
-        pd.Timestamp(start_previous).replace(day=1) - pd.DateOffset(months=1)
-    ).date()
+    # ------------------------------------------------------------
+    # Final per-account rollup as of the last complete month
+    # ------------------------------------------------------------
+    final = gl_balances.history(
+        matrix, gl_balances.last_complete_month(_today_pacific_date())
+    )
 
-    start_current_year = pd.Timestamp(start_last_complete.year, 1, 1).date()
+    artifacts.write_csv("gl_history", final, OUTFILE)
+    print(f"Wrote {OUTFILE} ({len(final)} rows, {len(final.columns)} columns)")
 
+def gl_history_all(monthly, ac):
+    """
+    Month pivot: one column per month (PARITY LOCKED).
+    """
     # ------------------------------------------------------------
-    # Final per-account rollup
+    # Join Accounts table (Power Query parity)
     # ------------------------------------------------------------
-    def last_value(series, mask):
-        s = series[mask].dropna()
-        return s.iloc[-1] if len(s) else np.nan
+    require_columns(ac, ["account_no", "description"], "accounts.csv")
 
-    rows = []
+    ac["account_no"] = ac["account_no"].astype(str)
+    ac = ac.rename(
+        columns={
+            "account_no": "Account",
+            "description": "Account_Description",
+        }
+    )[["Account", "Account_Description"]]
 
-    for (acct, acct_num, acct_desc), g in monthly.groupby(
-        ["Account", "Account_Num", "Account_Description"], sort=False
-    ):
-        g = g.sort_values("MonthStart")
+    df = monthly.merge(ac, how="left", on="Account")
+    df["Account_Num"] = pd.to_numeric(df["Account"], errors="coerce").astype("Int64")
 
-        ms = g["MonthStart"]
-        cum = g["CumToDate"]
-        amt = g["MonthlyAmount"]
+    # ------------------------------------------------------------
+    # MonthText (yyyy-MM)
+    # ------------------------------------------------------------
+    df["MonthText"] = pd.to_datetime(df["MonthStart"]).dt.strftime("%Y-%m")
 
-        is_income = 4000 <= int(acct_num) <= 8020
+    # ------------------------------------------------------------
+    # Pivot months to columns
+    # ------------------------------------------------------------
+    pivot = df.pivot_table(
+        index=["Account", "Account_Num", "Account_Description"],
+        columns="MonthText",
+        values="MonthlyAmount",
+        aggfunc="sum",
+        fill_value=0.0
+    ).reset_index()
 
-        rows.append({
-            "Account": acct,
-            "Account_Num": int(acct_num),
-            "Account_Description": acct_desc,
-            "CumToLastComplete": last_value(cum, ms <= start_last_complete),
-            "CumToPrior": last_value(cum, ms <= start_previous),
-            "CumToSecondPrior": last_value(cum, ms <= start_second_previous),
-            "NetIncomeYTD_Prior": last_value(
-                cum,
-                is_income & (ms >= start_current_year) & (ms <= start_previous)
-            ) if is_income else np.nan,
-            "NetIncomeYTD_LastComplete": last_value(
-                cum,
-                is_income & (ms >= start_current_year) & (ms <= start_last_complete)
-            ) if is_income else np.nan,
-            "LastCompleteMonthActivity": last_value(amt, ms == start_last_complete),
-            "PriorMonthActivity": last_value(amt, ms == start_previous),
-        })
+    pivot.columns.name = None
 
-    final = pd.DataFrame(rows)
+    pivot = pivot.sort_values("Account_Num").reset_index(drop=True)
 
     # ------------------------------------------------------------
-    # FINAL ROUNDING (critical for reporting parity)
+    # Final rounding
     # ------------------------------------------------------------
-    NUMERIC_COLS = [
-        "CumToLastComplete",
-        "CumToPrior",
-        "CumToSecondPrior",
-        "NetIncomeYTD_Prior",
-        "NetIncomeYTD_LastComplete",
-        "LastCompleteMonthActivity",
-        "PriorMonthActivity",
+    month_cols = [
+        c for c in pivot.columns
+        if c not in ["Account", "Account_Num", "Account_Description"]
     ]
 
-    for col in NUMERIC_COLS:
-        final[col] = pd.to_numeric(final[col], errors="coerce").round(2)
+    pivot[month_cols] = pivot[month_cols].apply(
+        lambda s: pd.to_numeric(s, errors="coerce").round(2)
+    )
+    return pivot
+
+def write_gl_history_all(monthly, ac):
+    pivot = gl_history_all(monthly, ac)
+    artifacts.write_csv("gl_history_all", pivot, ALL_OUTFILE)
 
-    final = final.sort_values("Account_Num").reset_index(drop=True)
+    print(
+        f"Wrote {ALL_OUTFILE} "
+        f"({len(pivot)} rows × {len(pivot.columns)} columns)"
+    )
 
-    final.to_csv(OUTFILE, index=False)
-    print(f"Wrote {OUTFILE} ({len(final)} rows, {len(final.columns)} columns)")
+def main():
+    print("Building gl_history.csv and gl_history_all.csv from raw + accounts...")
+
+    # ------------------------------------------------------------
+    # Account x month matrix (see gl_matrix.py): the raw GL is
+    # loaded, filtered and grouped once for both outputs
+    # ------------------------------------------------------------
+    monthly = gl_matrix.build()
+    rows = gl_matrix.publish(monthly)
+    print(f"Wrote data/{gl_matrix.DATASET}/ ({rows} account-months)")
+
+    ac = artifacts.read_csv("accounts", ACCTS_FILE, low_memory=False)
+
+    write_gl_history(monthly, ac.copy())
+    write_gl_history_all(monthly, ac)
 
 if __name__ == "__main__":
     main()
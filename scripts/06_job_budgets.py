@@ -1,23 +1,14 @@
-import os
-import pyodbc
 import pandas as pd
 
+import artifacts
+import foundation_db
+import schemas
+
 # ------------------------------------------------------------
 # Configuration
 # ------------------------------------------------------------
-SERVER = "sql.foundationsoft.com,9000"
-DATABASE = "Cas_5587"   # must match what worked earlier
 OUTFILE = "data/job_budgets.csv"
 
-def connect():
-    return pyodbc.connect(
-        "DRIVER={ODBC Driver 17 for SQL Server};"
-        f"SERVER={SERVER};"
-        f"DATABASE={DATABASE};"
-        f"UID={os.environ['FOUNDATION_SQL_USER']};"
-        f"PWD={os.environ['FOUNDATION_SQL_PASSWORD']};",
-        timeout=30
-    )
 
 def main():
     print("Exporting job_budgets.csv ...")
@@ -65,8 +56,7 @@ def main():
     ORDER BY j.job_no
     """
 
-    conn = connect()
-    df = pd.read_sql(sql, conn)
+    df = foundation_db.query(sql)
 
     # ------------------------------------------------------------
     # Type normalization (match Power Query behavior)
@@ -83,13 +73,7 @@ def main():
 
     for col in TEXT_COLS:
         if col in df.columns:
-            df[col] = (
-                df[col]
-                  .astype(str)
-                  .str.replace(r"\.0$", "", regex=True)
-                  .str.strip()
-                  .replace({"nan": "", "None": ""})
-            )
+            df[col] = schemas.normalize_id(df[col])
 
     NUMERIC_COLS = [
         "original_contract",
@@ -104,7 +88,7 @@ def main():
         if col in df.columns:
             df[col] = pd.to_numeric(df[col], errors="coerce").round(2)
 
-    df.to_csv(OUTFILE, index=False)
+    artifacts.write_csv("job_budgets", df, OUTFILE)
     print(f"Wrote {OUTFILE} ({len(df)} rows, {len(df.columns)} columns)")
 
 if __name__ == "__main__":
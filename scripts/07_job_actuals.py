@@ -1,40 +1,42 @@
 import os
-import pyodbc
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
+
+import artifacts
+import dimensions
+import foundation_db
+import pipeline_state
+import schemas
 
 # ------------------------------------------------------------
 # Configuration
 # ------------------------------------------------------------
-SERVER = "sql.foundationsoft.com,9000"
-DATABASE = "Cas_5587"
 OUTFILE = "data/job_actuals.csv"
 
-def connect():
-    return pyodbc.connect(
-        "DRIVER={ODBC Driver 17 for SQL Server};"
-        f"SERVER={SERVER};"
-        f"DATABASE={DATABASE};"
-        f"UID={os.environ['FOUNDATION_SQL_USER']};"
-        f"PWD={os.environ['FOUNDATION_SQL_PASSWORD']};",
-        timeout=30
-    )
+# Incremental state: job_history summed per job × cost code ×
+# cost class (with first/last date_posted), frozen for postings
+# dated before a boundary that trails today by REOPEN_DAYS. Each
+# run fetches only rows from the previous boundary on. If the
+# frozen rows changed in SQL (count/sum/checksum probe) the state
+# is rebuilt; JOB_ACTUALS_FULL_REBUILD=1 forces that.
+STATE_FILE = pipeline_state.state_path("job_actuals", "state.pkl")
+STATE_META_FILE = pipeline_state.state_path("job_actuals", "state.json")
+REOPEN_DAYS = int(os.getenv("JOB_ACTUALS_REOPEN_DAYS", "90"))
+FULL_REBUILD = os.getenv("JOB_ACTUALS_FULL_REBUILD") == "1"
 
-def normalize_text(series):
-    return (
-        series.astype(str)
-              .str.replace(r"\.0$", "", regex=True)
-              .str.strip()
-              .replace({"nan": "", "None": ""})
-    )
+# Where the job × cost code × cost class aggregates come from:
+#   incremental  fetch new postings, fold into the state (default)
+#   server       GROUP BY in SQL Server, only aggregates transferred
+#   full         fetch every job_history row, aggregate in pandas
+# JOB_ACTUALS_PARITY=1 also runs the full path and fails the step
+# if the output differs.
+MODE = os.getenv("JOB_ACTUALS_MODE", "incremental")
+PARITY = os.getenv("JOB_ACTUALS_PARITY") == "1"
 
-def main():
-    print("Exporting job_actuals.csv ...")
-    conn = connect()
+KEYS = ["job_no", "cost_code_no", "cost_class_no"]
 
-    # ------------------------------------------------------------
-    # 1. Job history
-    # ------------------------------------------------------------
+
+def fetch_job_history(since=None):
     job_history_sql = """
     SELECT
         job_no,
@@ -45,65 +47,158 @@ def main():
     FROM dbo.job_history
     WHERE date_posted IS NOT NULL
     """
-    job_hist = pd.read_sql(job_history_sql, conn)
+    params = None
+    if since is not None:
+        job_history_sql += "  AND date_posted >= ?\n"
+        params = [since]
+    job_hist = foundation_db.query(job_history_sql, params)
 
-    job_hist["job_no"] = normalize_text(job_hist["job_no"])
-    job_hist["cost_code_no"] = normalize_text(job_hist["cost_code_no"])
+    job_hist["job_no"] = schemas.normalize_id(job_hist["job_no"])
+    job_hist["cost_code_no"] = schemas.normalize_id(job_hist["cost_code_no"])
     job_hist["cost_class_no"] = pd.to_numeric(job_hist["cost_class_no"], errors="coerce")
     job_hist["cost"] = pd.to_numeric(job_hist["cost"], errors="coerce").fillna(0.0)
 
     # Force pandas datetime (critical)
     job_hist["date_posted"] = pd.to_datetime(job_hist["date_posted"], errors="coerce")
+    return job_hist
 
-    # ------------------------------------------------------------
-    # 2. Cost classes
-    # ------------------------------------------------------------
-    cost_classes = pd.read_sql(
-        "SELECT cost_class_no, description FROM dbo.cost_classes",
-        conn
-    )
-    cost_classes["cost_class_no"] = pd.to_numeric(cost_classes["cost_class_no"], errors="coerce")
-    cost_classes["Cost_Class"] = normalize_text(cost_classes["description"])
-    cost_classes = cost_classes[["cost_class_no", "Cost_Class"]]
+def aggregate(parts):
+    """
+    Sum cost and take first/last date_posted per job × cost code
+    × cost class. parts are raw job_history rows (cost,
+    date_posted) or earlier aggregates (cost, first/last_posted).
+    Rows with no cost class are kept: they still count towards
+    the job's cost dates.
+    """
+    frames = []
+    for part in parts:
+        if part is None or part.empty:
+            continue
+        if "date_posted" in part.columns:
+            part = part.assign(
+                first_posted=part["date_posted"],
+                last_posted=part["date_posted"],
+            )
+        frames.append(part[KEYS + ["cost", "first_posted", "last_posted"]])
 
-    # ------------------------------------------------------------
-    # 3. Cost codes
-    # ------------------------------------------------------------
-    cost_codes = pd.read_sql(
-        "SELECT cost_code_no, description FROM dbo.cost_codes",
-        conn
+    if not frames:
+        return pd.DataFrame(columns=KEYS + ["cost", "first_posted", "last_posted"])
+
+    return (
+        pd.concat(frames, ignore_index=True)
+          .groupby(KEYS, as_index=False, dropna=False)
+          .agg(
+              cost=("cost", "sum"),
+              first_posted=("first_posted", "min"),
+              last_posted=("last_posted", "max"),
+          )
     )
-    cost_codes["cost_code_no"] = normalize_text(cost_codes["cost_code_no"])
-    cost_codes["Cost_Code_Description"] = normalize_text(cost_codes["description"])
-    cost_codes = cost_codes[["cost_code_no", "Cost_Code_Description"]]
 
-    # ------------------------------------------------------------
-    # 4. Jobs
-    # ------------------------------------------------------------
-    jobs = pd.read_sql(
-        "SELECT job_no, description, project_manager_no FROM dbo.jobs",
-        conn
+def probe_frozen(before):
+    """
+    Fingerprint of the job_history rows dated before the frozen
+    boundary, computed server-side.
+    """
+    row = foundation_db.query(
+        """
+        SELECT
+            COUNT_BIG(*) AS row_count,
+            SUM(cost) AS total_cost,
+            CHECKSUM_AGG(BINARY_CHECKSUM(
+                job_no, cost_code_no, cost_class_no, cost, date_posted
+            )) AS checksum
+        FROM dbo.job_history
+        WHERE date_posted IS NOT NULL
+          AND date_posted < ?
+        """,
+        [before],
+    ).iloc[0]
+    return {
+        "rows": int(row["row_count"]),
+        "total_cost": None if pd.isna(row["total_cost"]) else float(row["total_cost"]),
+        "checksum": None if pd.isna(row["checksum"]) else int(row["checksum"]),
+    }
+
+def load_state():
+    meta = pipeline_state.load_json(STATE_META_FILE)
+    if FULL_REBUILD or meta is None or not os.path.exists(STATE_FILE):
+        return None, None
+
+    before = datetime.fromisoformat(meta["frozen_before"]).date()
+    if probe_frozen(before) != meta["probe"]:
+        print(f"Postings before {before} changed since the last run: rebuilding")
+        return None, None
+    return pd.read_pickle(STATE_FILE), before
+
+def save_state(frozen, before, probe):
+    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+    tmp = f"{STATE_FILE}.tmp"
+    frozen.to_pickle(tmp)
+    os.replace(tmp, STATE_FILE)
+    pipeline_state.save_json(STATE_META_FILE, {
+        "frozen_before": before.isoformat(),
+        "probe": probe,
+        "rows": len(frozen),
+    })
+
+def job_cost_aggregates():
+    """
+    Aggregated job_history for every job × cost code × cost class,
+    fetching only the rows not already folded into the state.
+    """
+    frozen, frozen_before = load_state()
+
+    boundary = pipeline_state.today() - timedelta(days=REOPEN_DAYS)
+    if frozen_before is not None:
+        boundary = max(boundary, frozen_before)
+
+    # Probe before fetching: a row that lands in between makes the
+    # next run's probe differ (and rebuild) rather than go missing
+    probe = probe_frozen(boundary)
+
+    if frozen is None:
+        print("Fetching all job_history rows")
+    else:
+        print(f"Fetching job_history rows posted on or after {frozen_before}")
+    job_hist = fetch_job_history(since=frozen_before)
+
+    to_freeze = job_hist["date_posted"] < pd.Timestamp(boundary)
+    frozen = aggregate([frozen, job_hist[to_freeze]])
+    save_state(frozen, boundary, probe)
+
+    print(
+        f"   {len(job_hist)} rows fetched, "
+        f"{len(frozen)} frozen aggregates before {boundary}"
     )
-    jobs["job_no"] = normalize_text(jobs["job_no"])
-    jobs["Job_Description"] = normalize_text(jobs["description"])
-    jobs["Project_Manager_No"] = normalize_text(jobs["project_manager_no"])
-    jobs = jobs[["job_no", "Job_Description", "Project_Manager_No"]]
+    return aggregate([frozen, job_hist[~to_freeze]])
 
+def finalize(job_costs):
     # ------------------------------------------------------------
-    # 5. Project managers
+    # 2–5. Lookups (cost classes, cost codes, jobs, PMs)
     # ------------------------------------------------------------
-    pms = pd.read_sql(
-        "SELECT project_manager_no, description FROM dbo.project_managers",
-        conn
+    cost_classes = dimensions.get("cost_classes").rename(
+        columns={"description": "Cost_Class"}
+    )
+    cost_codes = dimensions.get("cost_codes").rename(
+        columns={"description": "Cost_Code_Description"}
+    )
+    jobs = dimensions.get("jobs").rename(
+        columns={
+            "description": "Job_Description",
+            "project_manager_no": "Project_Manager_No",
+        }
+    )
+    pms = dimensions.get("project_managers").rename(
+        columns={
+            "project_manager_no": "Project_Manager_No",
+            "description": "Project_Manager",
+        }
     )
-    pms["Project_Manager_No"] = normalize_text(pms["project_manager_no"])
-    pms["Project_Manager"] = normalize_text(pms["description"])
-    pms = pms[["Project_Manager_No", "Project_Manager"]]
 
     # ------------------------------------------------------------
     # 6–9. Merge all lookups
     # ------------------------------------------------------------
-    df = job_hist.merge(jobs, how="left", on="job_no")
+    df = job_costs.merge(jobs, how="left", on="job_no")
     df = df.merge(pms, how="left", on="Project_Manager_No")
     df = df.merge(cost_codes, how="left", on="cost_code_no")
     df = df.merge(cost_classes, how="left", on="cost_class_no")
@@ -131,14 +226,14 @@ def main():
     # 11. Job cost dates (FIXED)
     # ------------------------------------------------------------
     job_dates = (
-        job_hist.groupby("job_no", as_index=False)
+        job_costs.groupby("job_no", as_index=False)
         .agg(
-            Oldest_Cost_Date=("date_posted", "min"),
-            Most_Recent_Cost_Date=("date_posted", "max"),
+            Oldest_Cost_Date=("first_posted", "min"),
+            Most_Recent_Cost_Date=("last_posted", "max"),
         )
     )
 
-    today = pd.Timestamp(datetime.now().date())
+    today = pd.Timestamp(pipeline_state.today())
 
     job_dates["Days_Since_First_Cost"] = (
         today - job_dates["Oldest_Cost_Date"]
@@ -175,8 +270,81 @@ def main():
     )
 
     final["Actual_Cost"] = final["Actual_Cost"].round(2)
+    return final
+
+def server_aggregates():
+    """
+    Same aggregates computed by SQL Server. Keys are normalized
+    afterwards, so groups that only differ before normalization
+    (e.g. trailing spaces) are merged again in pandas.
+    """
+    job_costs = foundation_db.query(
+        """
+        SELECT
+            job_no,
+            cost_code_no,
+            cost_class_no,
+            SUM(cost) AS cost,
+            MIN(date_posted) AS first_posted,
+            MAX(date_posted) AS last_posted
+        FROM dbo.job_history
+        WHERE date_posted IS NOT NULL
+        GROUP BY
+            job_no,
+            cost_code_no,
+            cost_class_no
+        """
+    )
+
+    job_costs["job_no"] = schemas.normalize_id(job_costs["job_no"])
+    job_costs["cost_code_no"] = schemas.normalize_id(job_costs["cost_code_no"])
+    job_costs["cost_class_no"] = pd.to_numeric(job_costs["cost_class_no"], errors="coerce")
+    job_costs["cost"] = pd.to_numeric(job_costs["cost"], errors="coerce").fillna(0.0)
+    job_costs["first_posted"] = pd.to_datetime(job_costs["first_posted"], errors="coerce")
+    job_costs["last_posted"] = pd.to_datetime(job_costs["last_posted"], errors="coerce")
+    return aggregate([job_costs])
+
+def full_aggregates():
+    return aggregate([fetch_job_history()])
+
+JOB_COST_SOURCES = {
+    "incremental": job_cost_aggregates,
+    "server": server_aggregates,
+    "full": full_aggregates,
+}
+
+def check_parity(final, expected):
+    keys = ["Job_No", "Cost_Class_No", "Cost_Code_No"]
+    check = final.merge(
+        expected, on=keys, how="outer", suffixes=("", "_full"), indicator=True
+    )
+    # Sums added up in another order can move a rounded cost a cent
+    delta = (check["Actual_Cost"] - check["Actual_Cost_full"]).abs().round(2)
+    mismatch = (check["_merge"] != "both") | (delta > 0.01)
+    for col in final.columns:
+        if col not in keys and col != "Actual_Cost":
+            a, b = check[col], check[f"{col}_full"]
+            mismatch |= (a != b) & ~(a.isna() & b.isna())
+
+    diff = check[mismatch]
+    if len(diff):
+        print(diff.head(20).to_string(index=False))
+        raise RuntimeError(f"job_actuals parity: {len(diff)} rows differ from the full path")
+    print(f"Parity OK: {len(final)} rows match the full path")
+
+def main():
+    print(f"Exporting job_actuals.csv ({MODE}) ...")
+
+    # ------------------------------------------------------------
+    # 1. Job history (aggregated per job × cost code × cost class)
+    # ------------------------------------------------------------
+    job_costs = JOB_COST_SOURCES[MODE]()
+    final = finalize(job_costs)
+
+    if PARITY and MODE != "full":
+        check_parity(final, finalize(full_aggregates()))
 
-    final.to_csv(OUTFILE, index=False)
+    artifacts.write_csv("job_actuals", final, OUTFILE)
     print(f"Wrote {OUTFILE} ({len(final)} rows, {len(final.columns)} columns)")
 
 if __name__ == "__main__":
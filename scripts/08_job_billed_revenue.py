@@ -1,52 +1,31 @@
 import os
-import pyodbc
 import pandas as pd
 
+import artifacts
+import datasets
+import dimensions
+import foundation_db
+import schemas
+
 # ------------------------------------------------------------
 # Configuration
 # ------------------------------------------------------------
-SERVER = "sql.foundationsoft.com,9000"
-DATABASE = "Cas_5587"
 OUTFILE = "data/job_billed_revenue.csv"
 
-def connect():
-    return pyodbc.connect(
-        "DRIVER={ODBC Driver 17 for SQL Server};"
-        f"SERVER={SERVER};"
-        f"DATABASE={DATABASE};"
-        f"UID={os.environ['FOUNDATION_SQL_USER']};"
-        f"PWD={os.environ['FOUNDATION_SQL_PASSWORD']};",
-        timeout=30
-    )
+# Revenue is summed from the raw GL dataset that 03 already
+# extracted, read one month at a time. GL_START_DATE trims that
+# dataset, so with it set the full table is scanned in SQL.
+RAW_GL = "gl_history_raw"
+GL_START_DATE = os.getenv("GL_START_DATE")
 
-def normalize_text(series):
-    return (
-        series.astype(str)
-              .str.replace(r"\.0$", "", regex=True)
-              .str.strip()
-              .replace({"nan": "", "None": ""})
-    )
+# JOB_BILLED_REVENUE_PARITY=1 also runs the SQL scan and fails
+# the step if the two results differ
+PARITY = os.getenv("JOB_BILLED_REVENUE_PARITY") == "1"
 
-def main():
-    print("Exporting job_billed_revenue.csv ...")
-    conn = connect()
 
-    # ------------------------------------------------------------
-    # 1. GL HISTORY – REVENUE ONLY
-    # ------------------------------------------------------------
-    gl_sql = """
-    SELECT
-        job_no,
-        basic_account_no,
-        amount_db,
-        amount_cr
-    FROM dbo.gl_history
-    WHERE journal_no <> 'CLS'
-    """
-    gl = pd.read_sql(gl_sql, conn)
-
-    gl["job_no"] = normalize_text(gl["job_no"])
-    gl["basic_account_no"] = normalize_text(gl["basic_account_no"])
+def revenue_by_job(gl):
+    # job_no and basic_account_no arrive normalised
+    # (schemas.normalize_id)
     gl["amount_db"] = pd.to_numeric(gl["amount_db"], errors="coerce").fillna(0.0)
     gl["amount_cr"] = pd.to_numeric(gl["amount_cr"], errors="coerce").fillna(0.0)
 
@@ -58,7 +37,7 @@ def main():
     # ------------------------------------------------------------
     # 3. FILTER TO 4000–4999 REVENUE ACCOUNTS
     # ------------------------------------------------------------
-    gl = gl[(gl["Account_Num"] >= 4000) & (gl["Account_Num"] < 5000)]
+    gl = gl[(gl["Account_Num"] >= 4000) & (gl["Account_Num"] < 5000)].copy()
 
     # ------------------------------------------------------------
     # 4. NET AMOUNT + FLIP SIGN
@@ -68,22 +47,61 @@ def main():
     # ------------------------------------------------------------
     # 5. GROUP BY JOB
     # ------------------------------------------------------------
-    grouped = (
+    return (
         gl.groupby("job_no", as_index=False)
           .agg(Billed_Revenue=("Billed_Revenue", "sum"))
     )
 
-    # ------------------------------------------------------------
-    # 6. JOBS TABLE (DESCRIPTION)
-    # ------------------------------------------------------------
-    jobs = pd.read_sql(
-        "SELECT job_no, description FROM dbo.jobs",
-        conn
+def combine(partials):
+    return (
+        pd.concat(partials, ignore_index=True)
+          .groupby("job_no", as_index=False)
+          .agg(Billed_Revenue=("Billed_Revenue", "sum"))
     )
-    jobs["job_no"] = normalize_text(jobs["job_no"])
-    jobs["Job_Description"] = normalize_text(jobs["description"])
-    jobs = jobs[["job_no", "Job_Description"]]
 
+def revenue_from_sql():
+    gl_sql = """
+    SELECT
+        job_no,
+        basic_account_no,
+        amount_db,
+        amount_cr
+    FROM dbo.gl_history
+    WHERE journal_no <> 'CLS'
+    """
+
+    # Streamed in fetchmany() batches; each batch is reduced to
+    # per-job sums (steps 2-5) and the partial sums are combined
+    partials = []
+    for gl in foundation_db.iter_batches(gl_sql):
+        for col in ["job_no", "basic_account_no"]:
+            gl[col] = schemas.normalize_id(gl[col])
+        partials.append(revenue_by_job(gl))
+    return combine(partials)
+
+def revenue_from_raw_gl():
+    columns = {
+        "Job": "job_no",
+        "Account": "basic_account_no",
+        "Debit": "amount_db",
+        "Credit": "amount_cr",
+        "Jrnl": "Jrnl",
+    }
+    partials = []
+    for _, gl in datasets.iter_partitions(RAW_GL, columns=list(columns)):
+        # SQL's journal_no <> 'CLS' also drops NULL journals, and
+        # compares case-insensitively, ignoring trailing spaces
+        # (03 keeps leading ones, see schemas.normalize)
+        jrnl = gl["Jrnl"].str.rstrip().str.upper()
+        gl = gl[jrnl.notna() & (jrnl != "CLS")]
+        partials.append(revenue_by_job(gl.rename(columns=columns)))
+    return combine(partials)
+
+def job_descriptions():
+    jobs = dimensions.get("jobs").rename(columns={"description": "Job_Description"})
+    return jobs[["job_no", "Job_Description"]]
+
+def finalize(grouped, jobs):
     # ------------------------------------------------------------
     # 7. MERGE JOB DESCRIPTIONS
     # ------------------------------------------------------------
@@ -96,9 +114,42 @@ def main():
     final["Billed_Revenue"] = final["Billed_Revenue"].round(2)
 
     final = final[["Job_No", "Job_Description", "Billed_Revenue"]]
-    final = final.sort_values("Job_No").reset_index(drop=True)
+    return final.sort_values("Job_No").reset_index(drop=True)
+
+def main():
+    print("Exporting job_billed_revenue.csv ...")
 
-    final.to_csv(OUTFILE, index=False)
+    # ------------------------------------------------------------
+    # 1. GL HISTORY – REVENUE ONLY
+    # ------------------------------------------------------------
+    if GL_START_DATE or not datasets.exists(RAW_GL):
+        grouped = revenue_from_sql()
+    else:
+        grouped = revenue_from_raw_gl()
+
+    # ------------------------------------------------------------
+    # 6. JOBS TABLE (DESCRIPTION)
+    # ------------------------------------------------------------
+    jobs = job_descriptions()
+
+    final = finalize(grouped, jobs)
+
+    if PARITY:
+        expected = finalize(revenue_from_sql(), jobs)
+        check = final.merge(
+            expected, on="Job_No", how="outer",
+            suffixes=("", "_sql"), indicator=True,
+        )
+        # Summation order differs, which can move a rounded total
+        # by at most a cent
+        delta = (check["Billed_Revenue"] - check["Billed_Revenue_sql"]).abs().round(2)
+        diff = check[(check["_merge"] != "both") | (delta > 0.01)]
+        if len(diff):
+            print(diff.head(20).to_string(index=False))
+            raise RuntimeError(f"job_billed_revenue parity: {len(diff)} jobs differ from SQL")
+        print(f"Parity OK: {len(final)} jobs match the SQL scan")
+
+    artifacts.write_csv("job_billed_revenue", final, OUTFILE)
     print(f"Wrote {OUTFILE} ({len(final)} rows, {len(final.columns)} columns)")
 
 if __name__ == "__main__":
@@ -1,38 +1,18 @@
-import os
-import pyodbc
 import pandas as pd
 
+import artifacts
+import dimensions
+import foundation_db
+import schemas
+
 # ------------------------------------------------------------
 # Configuration
 # ------------------------------------------------------------
-SERVER = "sql.foundationsoft.com,9000"
-DATABASE = "Cas_5587"
 OUTFILE = "data/payments.csv"
 
 
-def connect():
-    return pyodbc.connect(
-        "DRIVER={ODBC Driver 17 for SQL Server};"
-        f"SERVER={SERVER};"
-        f"DATABASE={DATABASE};"
-        f"UID={os.environ['FOUNDATION_SQL_USER']};"
-        f"PWD={os.environ['FOUNDATION_SQL_PASSWORD']};",
-        timeout=30,
-    )
-
-
-def normalize_text(series):
-    return (
-        series.astype(str)
-        .str.replace(r"\.0$", "", regex=True)
-        .str.strip()
-        .replace({"nan": "", "None": ""})
-    )
-
-
 def main():
     print("Exporting payments.csv ...")
-    conn = connect()
 
     # ------------------------------------------------------------
     # AP INVOICE HEADER
@@ -40,7 +20,7 @@ def main():
     #   - invoice_date = literal invoice date
     #   - transaction_date = Foundation AP aging anchor
     # ------------------------------------------------------------
-    ap_h = pd.read_sql(
+    ap_h = foundation_db.query(
         """
         SELECT
             voucher_no,
@@ -57,49 +37,48 @@ def main():
         FROM dbo.ap_invoice_h
         WHERE invoice_amount IS NOT NULL
         """,
-        conn,
     )
 
     # ------------------------------------------------------------
     # AP INVOICE DETAIL
+    #   Only the line count per voucher is used: joining every
+    #   detail line repeated each header × payment row once per
+    #   line, and 10 sums cash over those copies. The count keeps
+    #   one row per voucher/payment; 10 repeats them from it.
     # ------------------------------------------------------------
-    ap_d = pd.read_sql(
+    ap_d = foundation_db.query(
         """
         SELECT
             voucher_no,
-            cost_class_no,
-            cost_code_no,
-            account_no
+            COUNT(*) AS detail_line_count
         FROM dbo.ap_invoice_d
+        GROUP BY voucher_no
         """,
-        conn,
     )
 
     df = ap_h.merge(ap_d, how="left", on="voucher_no")
+    # A voucher without detail lines still kept one row
+    df["detail_line_count"] = df["detail_line_count"].fillna(1).astype(int)
 
     # ------------------------------------------------------------
     # PAYMENT SOURCES
     # ------------------------------------------------------------
-    check_pmt = pd.read_sql(
+    check_pmt = foundation_db.query(
         "SELECT voucher_no, cash_amount, void_flag FROM dbo.ap_check_vch",
-        conn,
     )
 
-    pmt = pd.read_sql(
+    pmt = foundation_db.query(
         "SELECT voucher_no, cash_amount FROM dbo.ap_pmt_vch",
-        conn,
     )
     pmt["void_flag"] = 0
 
-    prepmt = pd.read_sql(
+    prepmt = foundation_db.query(
         "SELECT voucher_no, cash_amount FROM dbo.ap_pre_pmt_vch",
-        conn,
     )
     prepmt["void_flag"] = 0
 
-    precheck = pd.read_sql(
+    precheck = foundation_db.query(
         "SELECT voucher_no, cash_amount FROM dbo.ap_pre_check_vch",
-        conn,
     )
     precheck["void_flag"] = 0
 
@@ -126,58 +105,42 @@ def main():
     # ------------------------------------------------------------
     # VENDORS
     # ------------------------------------------------------------
-    vendors = pd.read_sql(
-        "SELECT vendor_no, name FROM dbo.vendors",
-        conn,
-    )
-    vendors["vendor_no"] = normalize_text(vendors["vendor_no"])
-    vendors["vendor_name"] = normalize_text(vendors["name"])
-    vendors = vendors[["vendor_no", "vendor_name"]]
+    vendors = dimensions.get("vendors").rename(columns={"name": "vendor_name"})
 
-    df["vendor_no"] = normalize_text(df["vendor_no"])
+    df["vendor_no"] = schemas.normalize_id(df["vendor_no"])
     df = df.merge(vendors, how="left", on="vendor_no")
 
     # ------------------------------------------------------------
     # JOBS
     # ------------------------------------------------------------
-    jobs = pd.read_sql(
-        "SELECT job_no, description, project_manager_no FROM dbo.jobs",
-        conn,
-    )
-    jobs["job_no"] = normalize_text(jobs["job_no"])
-    jobs["job_description"] = normalize_text(jobs["description"])
-    jobs["project_manager_no"] = normalize_text(jobs["project_manager_no"])
-    jobs = jobs[["job_no", "job_description", "project_manager_no"]]
+    jobs = dimensions.get("jobs").rename(columns={"description": "job_description"})
 
-    df["job_no"] = normalize_text(df["job_no"])
+    df["job_no"] = schemas.normalize_id(df["job_no"])
     df = df.merge(jobs, how="left", on="job_no")
 
     # ------------------------------------------------------------
     # PROJECT MANAGERS
     # ------------------------------------------------------------
-    pms = pd.read_sql(
-        "SELECT project_manager_no, description FROM dbo.project_managers",
-        conn,
+    pms = dimensions.get("project_managers").rename(
+        columns={"description": "project_manager_name"}
     )
-    pms["project_manager_no"] = normalize_text(pms["project_manager_no"])
-    pms["project_manager_name"] = normalize_text(pms["description"])
-    pms = pms[["project_manager_no", "project_manager_name"]]
 
     df = df.merge(pms, how="left", on="project_manager_no")
 
     # ------------------------------------------------------------
-    # FINAL SCHEMA
+    # FINAL SCHEMA (only what 10_ap_invoice_summary.py uses)
     # ------------------------------------------------------------
     final = df[
         [
+            "voucher_no",
             "invoice_no",
             "invoice_date",
             "transaction_date",  # <-- AP AGING DATE
             "invoice_amount",
             "vendor_name",
-            "retainage_percent",
             "retainage_amount",
             "cash_amount",
+            "detail_line_count",
             "void_flag",
             "job_no",
             "job_description",
@@ -188,8 +151,9 @@ def main():
     # ------------------------------------------------------------
     # Type normalization
     # ------------------------------------------------------------
-    final["invoice_no"] = normalize_text(final["invoice_no"])
-    final["job_no"] = normalize_text(final["job_no"])
+    final["voucher_no"] = schemas.normalize_id(final["voucher_no"])
+    final["invoice_no"] = schemas.normalize_id(final["invoice_no"])
+    final["job_no"] = schemas.normalize_id(final["job_no"])
 
     final["invoice_date"] = pd.to_datetime(
         final["invoice_date"], errors="coerce"
@@ -208,7 +172,7 @@ def main():
     # ------------------------------------------------------------
     # Write output
     # ------------------------------------------------------------
-    final.to_csv(OUTFILE, index=False)
+    artifacts.write_csv("payments", final, OUTFILE)
     print(
         f"Wrote {OUTFILE} "
         f"({len(final)} rows, {len(final.columns)} columns)"
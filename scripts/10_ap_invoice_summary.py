@@ -1,35 +1,39 @@
+import numpy as np
 import pandas as pd
-from datetime import datetime
+
+import artifacts
+import pipeline_state
 
 INFILE = "data/payments.csv"
 OUTFILE = "data/ap_invoice_summary.csv"
 
 
-def main():
-    print("Building ap_invoice_summary.csv ...")
-
-    df = pd.read_csv(INFILE, low_memory=False)
-
-    # ------------------------------------------------------
-    # Remove voided payment rows
-    # ------------------------------------------------------
-    df["void_flag"] = (
-        pd.to_numeric(df["void_flag"], errors="coerce")
-        .fillna(0)
-        .astype(int)
+def per_invoice(df):
+    """
+    One row per invoice from payments.csv's rows (one per voucher
+    and payment, voided ones removed).
+
+    amount_paid has always summed payments over the header x
+    detail line join, so a voucher with k lines counts each
+    payment k times (PARITY LOCKED). It is computed per voucher
+    as the sum of its payments times k, without building the
+    join's rows; the result can differ from summing the k
+    copies in the last bits only.
+    """
+    # A voucher without detail lines had no rows in the join
+    df = df[df["detail_line_count"] > 0].copy()
+
+    # Each voucher's amount_paid on its first row, 0 on the others
+    by_voucher = df.groupby("voucher_no", sort=False)
+    paid = by_voucher["cash_amount"].sum() * by_voucher["detail_line_count"].first()
+    df["voucher_paid"] = np.where(
+        df["voucher_no"].duplicated(), 0.0, df["voucher_no"].map(paid)
     )
-    df = df[df["void_flag"] != 1].copy()
-
-    # ------------------------------------------------------
-    # Normalize dates
-    # ------------------------------------------------------
-    df["invoice_date"] = pd.to_datetime(df["invoice_date"], errors="coerce")
-    df["transaction_date"] = pd.to_datetime(df["transaction_date"], errors="coerce")
 
     # ------------------------------------------------------
     # ONE ROW PER INVOICE (stable identity)
     # ------------------------------------------------------
-    grouped = (
+    return (
         df.groupby(["invoice_no", "vendor_name", "job_no"], dropna=False)
         .agg(
             # Reference dates
@@ -38,7 +42,7 @@ def main():
 
             # Amounts
             invoice_amount=("invoice_amount", "max"),
-            amount_paid=("cash_amount", "sum"),
+            amount_paid=("voucher_paid", "sum"),
 
             # ORIGINAL retainage from AP header
             retainage_amount=("retainage_amount", "max"),
@@ -50,10 +54,34 @@ def main():
         .reset_index()
     )
 
+
+def main():
+    print("Building ap_invoice_summary.csv ...")
+
+    df = artifacts.read_csv("payments", INFILE, low_memory=False)
+
+    # ------------------------------------------------------
+    # Remove voided payment rows
+    # ------------------------------------------------------
+    df["void_flag"] = (
+        pd.to_numeric(df["void_flag"], errors="coerce")
+        .fillna(0)
+        .astype(int)
+    )
+    df = df[df["void_flag"] != 1].copy()
+
+    # ------------------------------------------------------
+    # Normalize dates
+    # ------------------------------------------------------
+    df["invoice_date"] = pd.to_datetime(df["invoice_date"], errors="coerce")
+    df["transaction_date"] = pd.to_datetime(df["transaction_date"], errors="coerce")
+
+    grouped = per_invoice(df)
+
     # ------------------------------------------------------
     # As-of date (Foundation-style)
     # ------------------------------------------------------
-    as_of_date = pd.Timestamp(datetime.now().date())
+    as_of_date = pd.Timestamp(pipeline_state.today())
 
     # ------------------------------------------------------
     # Core AP balances
@@ -145,7 +173,7 @@ def main():
         ]
     ]
 
-    final.to_csv(OUTFILE, index=False)
+    artifacts.write_csv("ap_invoice_summary", final, OUTFILE)
     print(f"Wrote {OUTFILE} ({len(final)} invoices)")
 
 
@@ -1,37 +1,24 @@
-import os
-import pyodbc
 import pandas as pd
-from datetime import date
+
+import artifacts
+import foundation_db
+import pipeline_state
+import schemas
 
 # ==========================================================
 # CONFIG
 # ==========================================================
-SERVER = "sql.foundationsoft.com,9000"
-DATABASE = "Cas_5587"
 OUTFILE = "data/ar_invoice_summary.csv"
 
-# 🔑 AR aging date = today (PDF-faithful, no overrides)
-AS_OF_DATE = date.today()
-
-# ==========================================================
-# DB CONNECTION
-# ==========================================================
-def connect():
-    return pyodbc.connect(
-        "DRIVER={ODBC Driver 17 for SQL Server};"
-        f"SERVER={SERVER};"
-        f"DATABASE={DATABASE};"
-        f"UID={os.environ['FOUNDATION_SQL_USER']};"
-        f"PWD={os.environ['FOUNDATION_SQL_PASSWORD']};",
-        timeout=30
-    )
+# 🔑 AR aging date = today (PDF-faithful; PIPELINE_AS_OF pins it
+# only to replay a recorded run)
+AS_OF_DATE = pipeline_state.today()
 
 # ==========================================================
 # MAIN
 # ==========================================================
 def main():
     print(f"Exporting PDF-faithful AR Aging as of {AS_OF_DATE} …")
-    conn = connect()
 
     sql = f"""
     DECLARE @AsOfDate date = '{AS_OF_DATE}';
@@ -155,12 +142,12 @@ def main():
         ROUND(i.invoice_amount - ISNULL(ca.cash_applied, 0), 2) <> 0
 
     ORDER BY
-        customer_name,
-        job_no,
-        invoice_no;
+        i.customer_name,
+        i.job_no,
+        i.invoice_no;
     """
 
-    df = pd.read_sql(sql, conn)
+    df = foundation_db.query(sql)
 
     # ------------------------------------------------------
     # Final formatting
@@ -177,7 +164,10 @@ def main():
 
     df["invoice_date"] = pd.to_datetime(df["invoice_date"], errors="coerce")
 
-    df.to_csv(OUTFILE, index=False)
+    for col in ["invoice_no", "job_no"]:
+        df[col] = schemas.normalize_id(df[col])
+
+    artifacts.write_csv("ar_invoice_summary", df, OUTFILE)
     print(f"Wrote {OUTFILE} ({len(df)} rows)")
 
 if __name__ == "__main__":
@@ -1,98 +1,141 @@
-import os
-import pyodbc
 import pandas as pd
 
+import artifacts
+import foundation_db
+import pipeline_state
+import schemas
+from document_store import DocumentStore
+
 # ------------------------------------------------------------
 # Configuration
 # ------------------------------------------------------------
-SERVER = "sql.foundationsoft.com,9000"
-DATABASE = "Cas_5587"
 OUTFILE = "data/ap_payment_job_allocation.csv"
 
-def connect():
-    return pyodbc.connect(
-        "DRIVER={ODBC Driver 17 for SQL Server};"
-        f"SERVER={SERVER};"
-        f"DATABASE={DATABASE};"
-        f"UID={os.environ['FOUNDATION_SQL_USER']};"
-        f"PWD={os.environ['FOUNDATION_SQL_PASSWORD']};",
-        timeout=30
-    )
-
-def main():
-    print("Exporting ap_payment_job_allocation.csv ...")
-    conn = connect()
-
-    sql = """
-    SELECT
-      c.company_no                               AS company_no,
-      CAST(c.check_no AS varchar(20))            AS payment_document_no,
-      c.check_date                               AS payment_date,
-
-      (
-        SELECT SUM(h2.cash_amount)
-        FROM ap_history h2
-        WHERE h2.company_no = c.company_no
-          AND h2.check_no   = c.check_no
-          AND h2.gl_cash BETWEEN 1000 AND 1999
-      )                                          AS payment_amount,
-
-      c.check_type                               AS payment_type,
-      c.source                                   AS payment_source,
-      c.type                                     AS payment_subtype,
-      c.vendor_no                                AS vendor_no,
-      c.name                                     AS vendor_name,
-
-      h.voucher_no                               AS voucher_no,
-      h.line_no                                  AS line_no,
-
-      h.cash_amount                              AS applied_amount,
-      h.gl_cash                                  AS gl_cash_account,
-
-      CASE
-        WHEN h.gl_cash BETWEEN 1000 AND 1999
-        THEN h.cash_amount
-        ELSE 0
-      END                                        AS cash_applied_amount,
-
-      CASE
-        WHEN h.gl_cash BETWEEN 1000 AND 1999 THEN 1
-        ELSE 0
-      END                                        AS is_cash_row,
-
-      CASE
-        WHEN h.gl_cash BETWEEN 1000 AND 1999 THEN 'Cash payment (bank)'
-        ELSE 'Non-cash AP adjustment / liability'
-      END                                        AS reconciliation_note,
-
-      d.job_no                                   AS job_no,
-      j.description                              AS job_description
-
-    FROM ap_check c
-    JOIN ap_history h
-      ON h.company_no = c.company_no
-     AND h.check_no   = c.check_no
-
-    JOIN ap_invoice_d d
-      ON d.company_no = h.company_no
-     AND d.voucher_no = h.voucher_no
-     AND d.line_no    = h.line_no
-
-    LEFT JOIN jobs j
-      ON j.job_no = d.job_no
-
-    WHERE
-      c.void_flag <> 'Y'
-
-    ORDER BY
-      c.check_date DESC,
-      c.check_no,
-      h.voucher_no,
-      h.line_no
-    """
-
-    df = pd.read_sql(sql, conn)
-
+# Rows are kept in a DocumentStore keyed per check; only checks
+# inside the trailing window or flagged by the probe are fetched
+DOCUMENT_KEYS = ["company_no", "payment_document_no"]
+
+# Raw sort keys (the SQL ORDER BY); stored, not written
+SORT_COLS = ["sort_check_no", "sort_voucher_no"]
+
+# One row per check, live or voided: keys, date, whether it is
+# live (the export's void_flag <> 'Y') and a checksum of the
+# header. Reads ap_check alone; detail lines are only fetched for
+# the checks the store refetches.
+PROBE_SQL = """
+SELECT
+  c.company_no                               AS company_no,
+  CAST(c.check_no AS varchar(20))            AS payment_document_no,
+  c.check_date                               AS document_date,
+  CASE WHEN c.void_flag <> 'Y' THEN 1 ELSE 0 END AS live,
+  BINARY_CHECKSUM(
+    c.check_type, c.source, c.type, c.vendor_no, c.name
+  )                                          AS checksum
+FROM ap_check c
+"""
+
+# Check totals come from one pre-aggregated pass over the fetched
+# checks instead of a correlated subquery per row. {window} limits
+# the fetch to the checks the store refetches.
+SQL = """
+WITH checks AS (
+  SELECT
+    company_no, check_no, check_date, check_type, source, type,
+    vendor_no, name
+  FROM ap_check
+  WHERE void_flag <> 'Y'
+    {window}
+),
+
+totals AS (
+  SELECT
+    h2.company_no,
+    h2.check_no,
+    SUM(h2.cash_amount)                      AS payment_amount
+  FROM ap_history h2
+  JOIN checks c2
+    ON c2.company_no = h2.company_no
+   AND c2.check_no   = h2.check_no
+  WHERE h2.gl_cash BETWEEN 1000 AND 1999
+  GROUP BY
+    h2.company_no,
+    h2.check_no
+)
+
+SELECT
+  c.company_no                               AS company_no,
+  CAST(c.check_no AS varchar(20))            AS payment_document_no,
+  c.check_date                               AS payment_date,
+  t.payment_amount                           AS payment_amount,
+
+  c.check_type                               AS payment_type,
+  c.source                                   AS payment_source,
+  c.type                                     AS payment_subtype,
+  c.vendor_no                                AS vendor_no,
+  c.name                                     AS vendor_name,
+
+  h.voucher_no                               AS voucher_no,
+  h.line_no                                  AS line_no,
+
+  h.cash_amount                              AS applied_amount,
+  h.gl_cash                                  AS gl_cash_account,
+
+  CASE
+    WHEN h.gl_cash BETWEEN 1000 AND 1999
+    THEN h.cash_amount
+    ELSE 0
+  END                                        AS cash_applied_amount,
+
+  CASE
+    WHEN h.gl_cash BETWEEN 1000 AND 1999 THEN 1
+    ELSE 0
+  END                                        AS is_cash_row,
+
+  CASE
+    WHEN h.gl_cash BETWEEN 1000 AND 1999 THEN 'Cash payment (bank)'
+    ELSE 'Non-cash AP adjustment / liability'
+  END                                        AS reconciliation_note,
+
+  d.job_no                                   AS job_no,
+  j.description                              AS job_description,
+
+  c.check_no                                 AS sort_check_no,
+  h.voucher_no                               AS sort_voucher_no
+
+FROM checks c
+JOIN ap_history h
+  ON h.company_no = c.company_no
+ AND h.check_no   = c.check_no
+
+JOIN ap_invoice_d d
+  ON d.company_no = h.company_no
+ AND d.voucher_no = h.voucher_no
+ AND d.line_no    = h.line_no
+
+LEFT JOIN totals t
+  ON t.company_no = c.company_no
+ AND t.check_no   = c.check_no
+
+LEFT JOIN jobs j
+  ON j.job_no = d.job_no
+"""
+
+# Numeric columns pinned so every batch (and every stored month)
+# has the same types; text columns go through normalize_id
+DTYPES = {
+    "company_no": "int64",
+    "payment_amount": "float64",
+    "line_no": "int64",
+    "applied_amount": "float64",
+    "gl_cash_account": "Int64",
+    "cash_applied_amount": "float64",
+    "is_cash_row": "int64",
+    "sort_check_no": "int64",
+    "sort_voucher_no": "int64",
+}
+
+
+def normalize(df):
     # ------------------------------------------------------------
     # Type normalization (light, non-destructive)
     # ------------------------------------------------------------
@@ -111,21 +154,68 @@ def main():
 
     for col in TEXT_COLS:
         if col in df.columns:
-            df[col] = (
-                df[col]
-                  .astype(str)
-                  .str.replace(r"\.0$", "", regex=True)
-                  .str.strip()
-                  .replace({"nan": "", "None": ""})
-            )
+            df[col] = schemas.normalize_id(df[col])
 
     MONEY_COLS = ["payment_amount", "applied_amount", "cash_applied_amount"]
     for col in MONEY_COLS:
         if col in df.columns:
             df[col] = pd.to_numeric(df[col], errors="coerce").round(2)
 
-    df.to_csv(OUTFILE, index=False)
-    print(f"Wrote {OUTFILE} ({len(df)} rows, {len(df.columns)} columns)")
+    return df
+
+
+def normalize_probe(probe):
+    probe["payment_document_no"] = schemas.normalize_id(probe["payment_document_no"])
+    probe["document_date"] = pd.to_datetime(probe["document_date"], errors="coerce")
+    probe["live"] = probe["live"] == 1
+    return probe
+
+
+def sort_rows(df):
+    # Same order as the former ORDER BY check_date DESC, check_no,
+    # voucher_no, line_no (stable, so ties keep store order)
+    return df.sort_values(
+        ["payment_date", "sort_check_no", "sort_voucher_no", "line_no"],
+        ascending=[False, True, True, True],
+        kind="mergesort",
+    )
+
+
+def main():
+    print("Exporting ap_payment_job_allocation.csv ...")
+
+    name = "ap_payment_job_allocation"
+    store = DocumentStore(
+        name, DOCUMENT_KEYS, "payment_date",
+        pipeline_state.code_signature(
+            schemas.get(name), SORT_COLS, DTYPES, PROBE_SQL, SQL,
+            normalize, normalize_probe, *schemas.NORMALIZE_CODE,
+        ),
+    )
+    probe = normalize_probe(foundation_db.query(PROBE_SQL))
+    since = store.refresh_from(probe)
+
+    window = ""
+    params = None
+    if since is not None:
+        window = "AND (check_date >= ? OR check_date IS NULL)"
+        params = [since]
+
+    store.upsert(
+        (
+            normalize(df)
+            for df in foundation_db.iter_batches(SQL.format(window=window), params, dtypes=DTYPES)
+        ),
+        probe,
+    )
+
+    # Written a month at a time, newest first: the full sort order
+    rows = artifacts.write_csv_batches(
+        name,
+        (sort_rows(df).drop(columns=SORT_COLS) for df in store.partitions()),
+        OUTFILE,
+    )
+    print(f"Wrote {OUTFILE} ({rows} rows, {len(schemas.get(name))} columns)")
 
 if __name__ == "__main__":
     main()
@@ -1,87 +1,119 @@
-import os
-import pyodbc
 import pandas as pd
 
+import artifacts
+import foundation_db
+import pipeline_state
+import schemas
+from document_store import DocumentStore
+
 # ------------------------------------------------------------
 # Configuration
 # ------------------------------------------------------------
-SERVER = "sql.foundationsoft.com,9000"
-DATABASE = "Cas_5587"
 OUTFILE = "data/ar_receipt_job_allocation.csv"
 
-def connect():
-    return pyodbc.connect(
-        "DRIVER={ODBC Driver 17 for SQL Server};"
-        f"SERVER={SERVER};"
-        f"DATABASE={DATABASE};"
-        f"UID={os.environ['FOUNDATION_SQL_USER']};"
-        f"PWD={os.environ['FOUNDATION_SQL_PASSWORD']};",
-        timeout=30
-    )
-
-def normalize_text(series):
-    return (
-        series.astype(str)
-              .str.replace(r"\.0$", "", regex=True)
-              .str.strip()
-              .replace({"nan": "", "None": ""})
-    )
-
-def main():
-    print("Exporting ar_receipt_job_allocation.csv ...")
-    conn = connect()
-
-    sql = """
-    SELECT
-      c.company_no                               AS company_no,
-      CAST(c.check_no AS varchar(20))            AS receipt_document_no,
-      c.cash_receipt_no                          AS receipt_no,
-      c.receipt_date                             AS receipt_date,
-
-      (
-        SELECT SUM(ci2.cash_amount)
-        FROM ar_cash_invoice ci2
-        WHERE ci2.company_no      = c.company_no
-          AND ci2.cash_receipt_no = c.cash_receipt_no
-      )                                          AS receipt_amount,
-
-      c.cash_receipt_type                        AS receipt_type,
-      c.cash_receipt_source                      AS receipt_source,
-      c.cash_flag                                AS receipt_subtype,
-      c.customer_no                              AS customer_no,
-
-      ci.invoice_no                              AS invoice_no,
-      ci.line_no                                 AS line_no,
-
-      ci.cash_amount                             AS applied_amount,
-
-      i.job_no                                   AS job_no,
-      j.description                              AS job_description
-
-    FROM ar_cash c
-    JOIN ar_cash_invoice ci
-      ON ci.company_no      = c.company_no
-     AND ci.cash_receipt_no = c.cash_receipt_no
-
-    JOIN ar_invoice i
-      ON i.company_no = ci.company_no
-     AND i.invoice_no = ci.invoice_no
-
-    LEFT JOIN jobs j
-      ON j.job_no = i.job_no
-
-    WHERE
-      c.reversal <> 'Y'
-
-    ORDER BY
-      c.receipt_date DESC,
-      c.cash_receipt_no,
-      ci.invoice_no,
-      ci.line_no
-    """
-
-    df = pd.read_sql(sql, conn)
-
+# Rows are kept in a DocumentStore keyed per cash receipt; only
+# receipts inside the trailing window or flagged by the probe
+# are fetched
+DOCUMENT_KEYS = ["company_no", "receipt_no"]
+
+# Raw sort key (the SQL ORDER BY); stored, not written
+SORT_COLS = ["sort_invoice_no"]
+
+# One row per receipt, live or reversed: keys, date, whether it
+# is live (the export's reversal <> 'Y') and a checksum of the
+# header. Reads ar_cash alone; detail lines are only fetched for
+# the receipts the store refetches.
+PROBE_SQL = """
+SELECT
+  c.company_no                               AS company_no,
+  c.cash_receipt_no                          AS receipt_no,
+  c.receipt_date                             AS document_date,
+  CASE WHEN c.reversal <> 'Y' THEN 1 ELSE 0 END AS live,
+  BINARY_CHECKSUM(
+    c.check_no, c.cash_receipt_type, c.cash_receipt_source,
+    c.cash_flag, c.customer_no
+  )                                          AS checksum
+FROM ar_cash c
+"""
+
+# Receipt totals come from one pre-aggregated pass over the
+# fetched receipts instead of a correlated subquery per row.
+# {window} limits the fetch to the receipts the store refetches.
+SQL = """
+WITH receipts AS (
+  SELECT
+    company_no, check_no, cash_receipt_no, receipt_date,
+    cash_receipt_type, cash_receipt_source, cash_flag, customer_no
+  FROM ar_cash
+  WHERE reversal <> 'Y'
+    {window}
+),
+
+totals AS (
+  SELECT
+    ci2.company_no,
+    ci2.cash_receipt_no,
+    SUM(ci2.cash_amount)                     AS receipt_amount
+  FROM ar_cash_invoice ci2
+  JOIN receipts c2
+    ON c2.company_no      = ci2.company_no
+   AND c2.cash_receipt_no = ci2.cash_receipt_no
+  GROUP BY
+    ci2.company_no,
+    ci2.cash_receipt_no
+)
+
+SELECT
+  c.company_no                               AS company_no,
+  CAST(c.check_no AS varchar(20))            AS receipt_document_no,
+  c.cash_receipt_no                          AS receipt_no,
+  c.receipt_date                             AS receipt_date,
+  t.receipt_amount                           AS receipt_amount,
+
+  c.cash_receipt_type                        AS receipt_type,
+  c.cash_receipt_source                      AS receipt_source,
+  c.cash_flag                                AS receipt_subtype,
+  c.customer_no                              AS customer_no,
+
+  ci.invoice_no                              AS invoice_no,
+  ci.line_no                                 AS line_no,
+
+  ci.cash_amount                             AS applied_amount,
+
+  i.job_no                                   AS job_no,
+  j.description                              AS job_description,
+
+  ci.invoice_no                              AS sort_invoice_no
+
+FROM receipts c
+JOIN ar_cash_invoice ci
+  ON ci.company_no      = c.company_no
+ AND ci.cash_receipt_no = c.cash_receipt_no
+
+JOIN ar_invoice i
+  ON i.company_no = ci.company_no
+ AND i.invoice_no = ci.invoice_no
+
+LEFT JOIN totals t
+  ON t.company_no      = c.company_no
+ AND t.cash_receipt_no = c.cash_receipt_no
+
+LEFT JOIN jobs j
+  ON j.job_no = i.job_no
+"""
+
+# Numeric columns pinned so every batch (and every stored month)
+# has the same types; text columns go through normalize_id
+DTYPES = {
+    "company_no": "int64",
+    "receipt_no": "int64",
+    "receipt_amount": "float64",
+    "line_no": "int64",
+    "applied_amount": "float64",
+}
+
+
+def normalize(df):
     # ------------------------------------------------------------
     # Light normalization (matches prior patterns)
     # ------------------------------------------------------------
@@ -98,7 +130,7 @@ def main():
 
     for col in TEXT_COLS:
         if col in df.columns:
-            df[col] = normalize_text(df[col])
+            df[col] = schemas.normalize_id(df[col])
 
     MONEY_COLS = ["receipt_amount", "applied_amount"]
     for col in MONEY_COLS:
@@ -107,8 +139,59 @@ def main():
 
     df["receipt_date"] = pd.to_datetime(df["receipt_date"], errors="coerce")
 
-    df.to_csv(OUTFILE, index=False)
-    print(f"Wrote {OUTFILE} ({len(df)} rows, {len(df.columns)} columns)")
+    return df
+
+def normalize_probe(probe):
+    probe["document_date"] = pd.to_datetime(probe["document_date"], errors="coerce")
+    probe["live"] = probe["live"] == 1
+    return probe
+
+def sort_rows(df):
+    # Same order as the former ORDER BY receipt_date DESC,
+    # cash_receipt_no, invoice_no, line_no (stable, so ties keep
+    # store order)
+    return df.sort_values(
+        ["receipt_date", "receipt_no", "sort_invoice_no", "line_no"],
+        ascending=[False, True, True, True],
+        kind="mergesort",
+    )
+
+
+def main():
+    print("Exporting ar_receipt_job_allocation.csv ...")
+
+    name = "ar_receipt_job_allocation"
+    store = DocumentStore(
+        name, DOCUMENT_KEYS, "receipt_date",
+        pipeline_state.code_signature(
+            schemas.get(name), SORT_COLS, DTYPES, PROBE_SQL, SQL,
+            normalize, normalize_probe, *schemas.NORMALIZE_CODE,
+        ),
+    )
+    probe = normalize_probe(foundation_db.query(PROBE_SQL))
+    since = store.refresh_from(probe)
+
+    window = ""
+    params = None
+    if since is not None:
+        window = "AND (receipt_date >= ? OR receipt_date IS NULL)"
+        params = [since]
+
+    store.upsert(
+        (
+            normalize(df)
+            for df in foundation_db.iter_batches(SQL.format(window=window), params, dtypes=DTYPES)
+        ),
+        probe,
+    )
+
+    # Written a month at a time, newest first: the full sort order
+    rows = artifacts.write_csv_batches(
+        name,
+        (sort_rows(df).drop(columns=SORT_COLS) for df in store.partitions()),
+        OUTFILE,
+    )
+    print(f"Wrote {OUTFILE} ({rows} rows, {len(schemas.get(name))} columns)")
 
 if __name__ == "__main__":
     main()
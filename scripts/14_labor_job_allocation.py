@@ -1,46 +1,147 @@
 import os
-import pyodbc
+from datetime import timedelta
+
 import pandas as pd
 
+import artifacts
+import foundation_db
+import pipeline_state
+import schemas
+from partitions import PartitionStore
+
 # ------------------------------------------------------------
 # Configuration
 # ------------------------------------------------------------
-SERVER = "sql.foundationsoft.com,9000"
-DATABASE = "Cas_5587"
 OUTFILE = "data/labor_job_allocation.csv"
 
-# ------------------------------------------------------------
-# Connection
-# ------------------------------------------------------------
-def connect():
-    return pyodbc.connect(
-        "DRIVER={ODBC Driver 17 for SQL Server};"
-        f"SERVER={SERVER};"
-        f"DATABASE={DATABASE};"
-        f"UID={os.environ['FOUNDATION_SQL_USER']};"
-        f"PWD={os.environ['FOUNDATION_SQL_PASSWORD']};",
-        timeout=30
-    )
+# cost_class_no is NULL on every pending timecard, so a full
+# result reads it as float64; pin it so every streamed batch does.
+# The money columns are pinned too: a week whose rows are all
+# COALESCE(..., 0) must not be written as integers.
+DTYPES = {
+    "cost_class_no": "float64",
+    "labor_cost_estimated": "float64",
+    "job_labor_cost_posted": "float64",
+}
+
+# One partition per week_start is kept between runs (see
+# partitions.py). Only the last LABOR_OPEN_WEEKS weeks (pending
+# timecards and recent postings still land there) and anything
+# from the previous watermark on are recomputed; older weeks are
+# reused. LABOR_FULL_REBUILD=1 recomputes every week, e.g. for a
+# periodic rebuild that picks up late edits to closed weeks.
+LABOR_OPEN_WEEKS = int(os.getenv("LABOR_OPEN_WEEKS", "8"))
+LABOR_FULL_REBUILD = os.getenv("LABOR_FULL_REBUILD") == "1"
+
+# Partition for rows without a date (NULL week_start); it sorts
+# after every week, as NULLs do under ORDER BY week_start DESC
+UNDATED = "undated"
 
 # ------------------------------------------------------------
 # Helpers
 # ------------------------------------------------------------
-def normalize_text(series):
+def normalize(df):
+    # ------------------------------------------------------------
+    # Normalization
+    # ------------------------------------------------------------
+    TEXT_COLS = [
+        "employee_no",
+        "employee_name",
+        "pay_type",
+        "labor_rate_type",
+        "job_no",
+        "cost_code_no",
+        "hour_type_group",
+    ]
+
+    for col in TEXT_COLS:
+        if col in df.columns:
+            df[col] = schemas.normalize_id(df[col])
+
+    MONEY_COLS = [
+        "labor_cost_estimated",
+        "job_labor_cost_posted",
+    ]
+
+    for col in MONEY_COLS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").round(2)
+
+    df["week_start"] = pd.to_datetime(df["week_start"], errors="coerce")
+
+    return df
+
+def week_start(d):
+    """
+    Python twin of the SQL week expression
+    DATEADD(day, -DATEPART(weekday, d) + 2, d) under the default
+    DATEFIRST 7: the Monday on or before d, except that a Sunday
+    belongs to the following Monday's week.
+    """
+    if d.weekday() == 6:
+        return d + timedelta(days=1)
+    return d - timedelta(days=d.weekday())
+
+def window_filter(col, since):
+    """
+    WHERE clause and params restricting a source table to rows
+    whose week starts on or after since (plus undated rows).
+    The plain date bound lets the server use an index on col.
+    """
+    if since is None:
+        return "", []
+    week = f"DATEADD(day, -DATEPART(weekday, {col}) + 2, CAST({col} AS date))"
     return (
-        series.astype(str)
-              .str.replace(r"\.0$", "", regex=True)
-              .str.strip()
-              .replace({"nan": "", "None": ""})
+        f"WHERE {col} IS NULL OR ({col} >= DATEADD(day, -7, ?) AND {week} >= ?)",
+        [since, since],
     )
 
+def iter_weeks(batches):
+    """
+    Regroup streamed batches (ordered by week_start DESC) into
+    one frame per week, yielded as (partition key, frame) once
+    the week is complete.
+    """
+    current, parts = None, []
+    for df in batches:
+        keys = df["week_start"].dt.strftime("%Y-%m-%d").fillna(UNDATED)
+        for key, part in df.groupby(keys, sort=False):
+            if key != current and parts:
+                yield current, pd.concat(parts, ignore_index=True)
+                parts = []
+            current = key
+            parts.append(part)
+    if parts:
+        yield current, pd.concat(parts, ignore_index=True)
+
 # ------------------------------------------------------------
 # Main
 # ------------------------------------------------------------
 def main():
     print("Exporting labor_job_allocation.csv ...")
-    conn = connect()
 
-    sql = """
+    store = PartitionStore("labor_job_allocation")
+    if LABOR_FULL_REBUILD:
+        print("Full rebuild requested: discarding stored weeks")
+        store.reset()
+
+    # Weeks from since on are recomputed; a week that was open at
+    # the last refresh is recomputed once more after it closes
+    open_from = week_start(pipeline_state.today()) - timedelta(weeks=LABOR_OPEN_WEEKS - 1)
+    since = None
+    if store.keys():
+        since = open_from.isoformat()
+        if store.watermark:
+            since = min(since, store.watermark)
+        print(f"Recomputing weeks from {since}, reusing older weeks")
+    else:
+        print("No stored weeks: computing every week")
+
+    pay_check_where, pay_check_params = window_filter("dated", since)
+    pending_where, pending_params = window_filter("dated", since)
+    history_where, history_params = window_filter("date_posted", since)
+
+    sql = f"""
     WITH employees AS (
         SELECT
             employee_no,
@@ -90,6 +191,7 @@ def main():
                 hours,
                 'Approved' AS src
             FROM dbo.v_hr_pay_check_timecards
+            {pay_check_where}
 
             UNION ALL
 
@@ -103,6 +205,7 @@ def main():
                 hours,
                 'Pending' AS src
             FROM dbo.pending_timecards
+            {pending_where}
         ) t
         GROUP BY
             employee_no,
@@ -121,6 +224,7 @@ def main():
             DATEADD(day, -DATEPART(weekday, date_posted) + 2, CAST(date_posted AS date)) AS week_start,
             SUM(cost) AS job_labor_cost_posted
         FROM dbo.job_history
+        {history_where}
         GROUP BY
             job_no,
             cost_code_no,
@@ -239,38 +343,36 @@ def main():
         cost_code_no
     """
 
-    df = pd.read_sql(sql, conn)
-
-    # ------------------------------------------------------------
-    # Normalization
-    # ------------------------------------------------------------
-    TEXT_COLS = [
-        "employee_no",
-        "employee_name",
-        "pay_type",
-        "labor_rate_type",
-        "job_no",
-        "cost_code_no",
-        "hour_type_group",
-    ]
+    params = pay_check_params + pending_params + history_params
 
-    for col in TEXT_COLS:
-        if col in df.columns:
-            df[col] = normalize_text(df[col])
+    # Streamed in fetchmany() batches and regrouped by week, so
+    # memory stays bounded by the largest week. The output is
+    # assembled from the partition files, not written through
+    # artifacts.write_csv, so each week is checked against its
+    # schema here, before it is stored (reused weeks were checked
+    # when they were computed)
+    batches = foundation_db.iter_batches(sql, params, dtypes=DTYPES)
+    written = set()
+    for key, df in iter_weeks(normalize(df) for df in batches):
+        schemas.check("labor_job_allocation", df)
+        store.write(key, df)
+        written.add(key)
 
-    MONEY_COLS = [
-        "labor_cost_estimated",
-        "job_labor_cost_posted",
-    ]
+    # Recomputed weeks that no longer have any rows
+    for key in store.keys():
+        if key not in written and (since is None or key >= since):
+            store.write(key, pd.DataFrame())
 
-    for col in MONEY_COLS:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce").round(2)
+    store.set_watermark(open_from.isoformat())
 
-    df["week_start"] = pd.to_datetime(df["week_start"], errors="coerce")
+    keys = sorted((k for k in store.keys() if k != UNDATED), reverse=True)
+    if store.entry(UNDATED):
+        keys.append(UNDATED)
+    print(f"Recomputed {len(written)} weeks, reused {len(keys) - len(written)}")
 
-    df.to_csv(OUTFILE, index=False)
-    print(f"Wrote {OUTFILE} ({len(df)} rows, {len(df.columns)} columns)")
+    rows = store.assemble(keys, OUTFILE)
+    artifacts.register_file("labor_job_allocation", OUTFILE)
+    print(f"Wrote {OUTFILE} ({rows} rows)")
 
 # ------------------------------------------------------------
 if __name__ == "__main__":
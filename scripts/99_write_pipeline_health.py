@@ -1,7 +1,10 @@
 import json
 import os
 from datetime import datetime, timezone
-import pandas as pd
+
+import artifacts
+import datasets
+import pipeline_state
 
 DATA_FILES = [
     "data/accounts.csv",
@@ -13,6 +16,10 @@ DATA_FILES = [
     "data/labor_job_allocation.csv",
 ]
 
+DATASETS = [
+    "gl_history_raw",
+]
+
 JSON_FILES = [
     "public/data/financials_gl.json",
     "public/data/financials_jobs.json",
@@ -24,9 +31,20 @@ JSON_FILES = [
 
 OUTFILE = "public/data/pipeline_health.json"
 
+# Per-step wall / CPU / RSS / bytes / rows written by run_all
+RUN_METRICS_FILE = pipeline_state.state_path("run_metrics.json")
+
 def count_csv(path):
     try:
-        return int(pd.read_csv(path).shape[0])
+        name = os.path.splitext(os.path.basename(path))[0]
+        return int(artifacts.read_csv(name, path).shape[0])
+    except Exception:
+        return None
+
+def count_dataset(name):
+    try:
+        manifest = datasets.load_manifest(datasets.path(name))
+        return sum(p["rows"] for p in manifest["partitions"].values())
     except Exception:
         return None
 
@@ -46,17 +64,29 @@ def main():
     now_utc = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
 
     csv_counts = {p: count_csv(p) for p in DATA_FILES if os.path.exists(p)}
+    dataset_counts = {
+        datasets.path(n): count_dataset(n) for n in DATASETS if datasets.exists(n)
+    }
     json_counts = {p: count_json(p) for p in JSON_FILES if os.path.exists(p)}
+    run_metrics = pipeline_state.load_json(RUN_METRICS_FILE, {})
+    steps = run_metrics.get("steps", {})
+
+    failed = any(m["status"] in ("failed", "blocked") for m in steps.values())
 
     health = {
-        "status": "success",
+        "status": "failed" if failed else "success",
         "last_refresh_utc": now_utc,
         "csv_row_counts": csv_counts,
+        "dataset_row_counts": dataset_counts,
         "json_record_counts": json_counts,
         "files_present": {
             "csv": list(csv_counts.keys()),
+            "datasets": list(dataset_counts.keys()),
             "json": list(json_counts.keys()),
-        }
+        },
+        "run_started_utc": run_metrics.get("run_started_utc"),
+        "run_mode": run_metrics.get("mode"),
+        "steps": steps,
     }
 
     os.makedirs(os.path.dirname(OUTFILE), exist_ok=True)
@@ -0,0 +1,132 @@
+"""
+In-memory artifact registry shared by pipeline steps.
+
+Steps publish their CSV outputs and consume their inputs through
+this module under a logical name (e.g. "gl_history_raw",
+"payments"). The CSV on disk is always written, so every file
+keeps its current format and location.
+
+When run_all executes steps in-process (--in-process), the
+registry is enabled: a written CSV is also kept in memory and
+parsed at most once, and every later reader gets its own copy
+of the parsed frame. In a normal subprocess run the registry is
+disabled and every call falls straight through to disk.
+
+Every name has its columns declared in schemas.py: writes are
+checked against the declaration and reads parse with its dtypes.
+"""
+import io
+import threading
+
+import pandas as pd
+
+import schemas
+
+_lock = threading.Lock()
+_enabled = False
+
+_paths = {}   # name -> path on disk
+_text = {}    # name -> CSV text written this run (not yet parsed)
+_frames = {}  # (name, read options) -> parsed DataFrame
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def write_csv(name, df, path, **kwargs):
+    """
+    Write df to path exactly as df.to_csv(path, index=False)
+    would, and register it under name. Raises
+    schemas.SchemaError (before writing) if df does not match
+    the declared columns.
+    """
+    schemas.check(name, df)
+    kwargs.setdefault("index", False)
+    text = df.to_csv(**kwargs)
+
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(text)
+
+    with _lock:
+        _forget(name)
+        _paths[name] = path
+        if _enabled:
+            _text[name] = text
+
+
+def write_csv_batches(name, batches, path, **kwargs):
+    """
+    Write an iterable of DataFrames to path as one CSV (header
+    from the first batch), as if they had been concatenated and
+    written with write_csv. Only one batch is held at a time, so
+    the file is registered on disk rather than kept in memory.
+    Returns the number of rows written.
+    """
+    kwargs.setdefault("index", False)
+    rows = 0
+
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for i, df in enumerate(batches):
+            schemas.check(name, df)
+            df.to_csv(f, header=(i == 0), **kwargs)
+            rows += len(df)
+
+    register_file(name, path)
+    return rows
+
+
+def register_file(name, path):
+    """
+    Register a CSV that was written directly to disk (e.g. in
+    appended chunks). Readers parse it once from disk.
+    """
+    with _lock:
+        _forget(name)
+        _paths[name] = path
+
+
+def read_csv(name, path, **kwargs):
+    """
+    Equivalent of pd.read_csv(path, dtype=<declared dtypes>,
+    **kwargs). Inside an in-process run the parsed frame is
+    shared between readers.
+    """
+    key = (name, repr(sorted(kwargs.items())))
+    kwargs.setdefault("dtype", schemas.read_dtypes(name))
+
+    if not _enabled:
+        return pd.read_csv(path, **kwargs)
+
+    with _lock:
+        frame = _frames.get(key)
+        text = _text.get(name)
+
+    if frame is None:
+        source = io.StringIO(text) if text is not None else path
+        frame = pd.read_csv(source, **kwargs)
+        with _lock:
+            _frames[key] = frame
+            _text.pop(name, None)
+            # A name no step wrote this run (skipped or resumed)
+            # is read from disk; register it so release() frees it
+            _paths.setdefault(name, path)
+
+    return frame.copy()
+
+
+def release(path):
+    """
+    Drop anything cached for the artifact stored at path
+    (called by run_all once every reader has finished).
+    """
+    with _lock:
+        for name in [n for n, p in _paths.items() if p == path]:
+            _forget(name)
+
+
+def _forget(name):
+    _text.pop(name, None)
+    for key in [k for k in _frames if k[0] == name]:
+        del _frames[key]
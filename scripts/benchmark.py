@@ -0,0 +1,919 @@
+"""
+Benchmarks for the transform stages: every pipeline step that
+does not touch the database (04, 10, the JSON builders) plus
+the metrics ETL.
+
+    python scripts/benchmark.py                      # scales 1 3 10 28
+    python scripts/benchmark.py --scale 1 --scale 10 --stage 04 --stage 10
+    python scripts/benchmark.py --compare benchmarks/results/<commit>.json
+    python scripts/benchmark.py --kernels            # kernels vs their references at 1x
+
+Inputs are generated, never pulled. A stand-in database
+(generate_standin.py) is extracted once, by the pipeline's own
+database steps, into a base data set of roughly production size.
+Each scale factor then replicates the base rows up to scale x
+PRODUCTION_GL_ROWS GL rows (1 is today's ~355k, 28 is ~10M).
+Replicated documents, jobs and employees get keys of their own
+(SCALED_KEYS), so their counts grow with the data; the chart of
+accounts keeps its size.
+
+Stages run one process each, in pipeline order, in a scratch
+directory per scale. Wall time and CPU come from the process's
+rusage, peak RSS from its own high-water mark. Results, with a
+digest of every output, go to BENCH_DIR/results/<commit>.json.
+Everything runs as of AS_OF, so runs on different days and
+commits see the same inputs.
+
+--kernels checks parity on its own: it runs each optimised kernel
+(schemas.normalize_id on the GL and labor id columns, 04's GL
+rollups as of several months, 10's per-invoice rollup) and its
+reference, the PARITY LOCKED code it replaced, on a scale's
+inputs, fails if their outputs differ and times both in-process,
+best of --repeat.
+
+--compare reads an earlier results file and also fails if any
+stage produced different output from identical inputs (runs of
+commits with another input format or INPUTS_VERSION are not
+compared).
+"""
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timezone
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+import artifacts
+import datasets
+import gl_balances
+import gl_matrix
+import pipeline_state
+import run_all
+import schemas
+
+# ------------------------------------------------------------
+# Configuration
+# ------------------------------------------------------------
+BENCH_DIR = os.getenv("BENCHMARK_DIR", "benchmarks")
+
+# Pinned as-of moment for every generated database and stage
+AS_OF = os.getenv("BENCHMARK_AS_OF", "2026-01-15T20:00:00+00:00")
+
+# gl_history_raw rows at scale 1 (production as of this writing)
+PRODUCTION_GL_ROWS = 355_000
+DEFAULT_SCALES = [1, 3, 10, 28]
+KERNEL_SCALES = [1]
+
+# Bump when input generation changes so cached inputs are rebuilt
+INPUTS_VERSION = 5
+
+# Offset added to numeric keys per replica
+KEY_OFFSET = 10_000_000
+
+# Runs a stage as __main__ and writes its own peak RSS (VmHWM, kB)
+# to argv[2]: the rusage of a child process starts from the peak
+# of the process that forked it, i.e. this one
+STAGE_RUNNER = """
+import os, runpy, sys
+path, peak_file = sys.argv[1], sys.argv[2]
+sys.argv = [path]
+sys.path.insert(0, os.path.dirname(path))
+try:
+    runpy.run_path(path, run_name="__main__")
+finally:
+    with open("/proc/self/status") as f:
+        peak = next(line.split()[1] for line in f if line.startswith("VmHWM:"))
+    with open(peak_file, "w") as f:
+        f.write(peak)
+"""
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Stage inputs -> key columns that get a new value per replica.
+# [] replicates rows as they are (more GL postings per account
+# and month); None keeps the file as is.
+SCALED_KEYS = {
+    "data/gl_history_raw/manifest.json": [],
+    "data/accounts.csv": None,
+    "data/payments.csv": ["invoice_no", "job_no"],
+    "data/job_budgets.csv": ["job_no"],
+    "data/job_actuals.csv": ["Job_No"],
+    "data/job_billed_revenue.csv": ["Job_No"],
+    "data/ar_invoice_summary.csv": ["invoice_no", "customer_no", "job_no"],
+    "data/ap_payment_job_allocation.csv": ["payment_document_no", "voucher_no", "job_no"],
+    "data/ar_receipt_job_allocation.csv": ["receipt_document_no", "invoice_no", "job_no"],
+    "data/labor_job_allocation.csv": ["employee_no", "job_no"],
+}
+
+# Run by the workflow after the pipeline (not a run_all step)
+METRICS_STAGE = {
+    "path": "metrics/metrics_etl.py",
+    "reads": [
+        "public/data/financials_jobs.json",
+        "public/data/ar_invoices.json",
+        "public/data/ap_invoices.json",
+    ],
+    "writes": [
+        "public/data/metrics_jobs.json",
+        "public/data/metrics_ar.json",
+        "public/data/metrics_ap.json",
+    ],
+}
+
+
+# ------------------------------------------------------------
+# Stages
+# ------------------------------------------------------------
+def stage_name(stage):
+    path = stage["path"]
+    if path.startswith("scripts/"):
+        return run_all.step_name(path)
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def transform_stages(selected=None):
+    """
+    The benchmarked stages in pipeline order: the selected ones
+    (name prefixes, e.g. "04" or "json/01") and every stage they
+    read from.
+    """
+    stages = [
+        s for s in run_all.STEPS
+        if run_all.DB not in s["reads"]
+        and run_all.DB not in s["writes"]
+        and not s.get("barrier")
+    ] + [METRICS_STAGE]
+    if not selected:
+        return stages
+
+    keep = {stage_name(s) for s in stages if any(stage_name(s).startswith(p) for p in selected)}
+    if not keep:
+        raise SystemExit(f"No stage matches {selected}")
+
+    writers = {res: stage_name(s) for s in stages for res in s["writes"]}
+    frontier = list(keep)
+    while frontier:
+        name = frontier.pop()
+        stage = next(s for s in stages if stage_name(s) == name)
+        for res in stage["reads"]:
+            if res in writers and writers[res] not in keep:
+                keep.add(writers[res])
+                frontier.append(writers[res])
+    return [s for s in stages if stage_name(s) in keep]
+
+
+def external_inputs(stages):
+    written = {res for s in stages for res in s["writes"]}
+    inputs = []
+    for s in stages:
+        for res in s["reads"]:
+            if res not in written and res not in inputs:
+                inputs.append(res)
+    return inputs
+
+
+def bench_env(workdir, **extra):
+    env = dict(
+        os.environ,
+        PYTHONUNBUFFERED="1",
+        PIPELINE_AS_OF=AS_OF,
+        PIPELINE_STATE_DIR=os.path.join(workdir, ".pipeline"),
+        FOUNDATION_REPLAY="",
+    )
+    env.update(extra)
+    return env
+
+
+def run_logged(args, workdir, env, log):
+    """
+    Run a script from workdir, output appended to log. Returns
+    (exit code, wall seconds, rusage of the process).
+    """
+    started = time.perf_counter()
+    with open(log, "a", encoding="utf-8") as f:
+        f.write(f"\n=== {args[2] if args[0] == '-c' else ' '.join(args)}\n")
+        f.flush()
+        proc = subprocess.Popen(
+            [sys.executable, *args], cwd=workdir, env=env,
+            stdout=f, stderr=subprocess.STDOUT,
+        )
+        _, status, ru = os.wait4(proc.pid, 0)
+    return os.waitstatus_to_exitcode(status), time.perf_counter() - started, ru
+
+
+def check(returncode, what, log):
+    if returncode != 0:
+        with open(log, encoding="utf-8") as f:
+            tail = f.readlines()[-20:]
+        raise RuntimeError(f"{what} failed (exit {returncode}); end of {log}:\n{''.join(tail)}")
+
+
+# ------------------------------------------------------------
+# Inputs
+# ------------------------------------------------------------
+def build_base(seed, inputs):
+    """
+    Base data set: the stand-in database extracted by the
+    pipeline's database steps. Built once per seed (and again
+    when the steps' outputs have moved).
+    """
+    base = os.path.abspath(os.path.join(BENCH_DIR, f"base-{seed}"))
+    stamp_file = os.path.join(base, "base.json")
+    stamp = {
+        "seed": seed,
+        "as_of": AS_OF,
+        "version": INPUTS_VERSION,
+    }
+    if pipeline_state.load_json(stamp_file) == stamp and all(
+        os.path.exists(os.path.join(base, res)) for res in inputs
+    ):
+        return base
+
+    print(f"Building base data set in {base} ...")
+    shutil.rmtree(base, ignore_errors=True)
+    for d in ("data", "public/data"):
+        os.makedirs(os.path.join(base, d))
+
+    db = os.path.join(base, "foundation.sqlite")
+    env = bench_env(base, FOUNDATION_BACKEND="standin", FOUNDATION_STANDIN_DB=db)
+    log = os.path.join(base, "build.log")
+
+    code, wall, _ = run_logged(
+        [os.path.join(REPO, "scripts/generate_standin.py"),
+         "--scale", "1", "--out", db, "--seed", str(seed)],
+        base, env, log,
+    )
+    check(code, "generate_standin", log)
+    print(f"→ stand-in database ({wall:.1f}s)")
+
+    for step in run_all.STEPS:
+        if run_all.DB in step["reads"]:
+            code, wall, _ = run_logged([os.path.join(REPO, step["path"])], base, env, log)
+            check(code, step["path"], log)
+            print(f"→ {run_all.step_name(step['path'])} ({wall:.1f}s)")
+
+    os.remove(db)
+    pipeline_state.save_json(stamp_file, stamp)
+    return base
+
+
+def rekey(values, replica):
+    """
+    New key values for a replica: numeric keys shifted by
+    replica x KEY_OFFSET (still numeric, same format), other
+    non-empty keys suffixed.
+    """
+    if replica == 0:
+        return values
+
+    def key(v):
+        m = re.fullmatch(r"(\d+)(\.0)?", v)
+        if m:
+            return f"{int(m.group(1)) + replica * KEY_OFFSET}{m.group(2) or ''}"
+        if v in ("", "None", "nan"):
+            return v
+        return f"{v}-{replica}"
+
+    uniques = values.unique()
+    return values.map(dict(zip(uniques, map(key, uniques))))
+
+
+def write_scaled(src, dst, keys, factor, rng):
+    """
+    Write src replicated to round(rows x factor) rows. Cells are
+    copied as text, so the replica parses exactly like the base.
+    """
+    df = pd.read_csv(src, dtype=str, keep_default_na=False)
+    target = int(round(len(df) * factor))
+    full, rest = divmod(target, len(df)) if len(df) else (0, 0)
+
+    def replica(r, rows=None):
+        part = df if rows is None else df.iloc[rows]
+        if r and keys:
+            part = part.copy()
+            for col in keys:
+                if col in part.columns:
+                    part[col] = rekey(part[col], r)
+        return part.to_csv(index=False, header=False)
+
+    with open(dst, "w", encoding="utf-8", newline="") as f:
+        f.write(df.iloc[:0].to_csv(index=False))
+        if not keys and full:
+            body = replica(0)
+            for _ in range(full):
+                f.write(body)
+        else:
+            for r in range(full):
+                f.write(replica(r))
+        if rest:
+            f.write(replica(full, np.sort(rng.choice(len(df), rest, replace=False))))
+    return target
+
+
+def write_scaled_dataset(src, dst, keys, factor, rng):
+    """
+    write_scaled for a partitioned dataset (see datasets.py):
+    each partition replicated in place, same column types.
+    """
+    manifest = datasets.load_manifest(src)
+    by, columns = manifest["partition_by"], manifest["columns"]
+    sources = []
+    target = 0
+
+    for key, entry in manifest["partitions"].items():
+        if not entry["rows"]:
+            sources.append((key, None))
+            continue
+        df = pd.read_parquet(os.path.join(src, entry["file"]))
+        n = int(round(len(df) * factor))
+        full, rest = divmod(n, len(df))
+        parts = [df] * full
+        if rest:
+            parts.append(df.iloc[np.sort(rng.choice(len(df), rest, replace=False))])
+        for r, part in enumerate(parts):
+            if r and keys:
+                part = parts[r] = part.copy()
+                for col in keys:
+                    part[col] = rekey(part[col].astype(str), r)
+        if not n:
+            sources.append((key, None))
+            continue
+        file = os.path.join(dst, f"{key}.parquet")
+        os.makedirs(dst, exist_ok=True)
+        datasets.write_file(file, pd.concat(parts, ignore_index=True), columns)
+        sources.append((key, file))
+        target += n
+
+    datasets.publish(dst, sources, columns, by)
+    return target
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def prepare_inputs(base, workdir, inputs, scale, seed):
+    """
+    Scaled copies of the base inputs in workdir/data, reused
+    while the base, scale and seed are unchanged.
+    """
+    stamp_file = os.path.join(workdir, "inputs.json")
+    wanted = {"spec": input_spec(base, scale, seed), "inputs": sorted(inputs)}
+
+    stamp = pipeline_state.load_json(stamp_file) or {}
+    if {k: stamp.get(k) for k in wanted} == wanted:
+        return stamp["files"]
+
+    shutil.rmtree(workdir, ignore_errors=True)
+    for d in ("data", "public/data"):
+        os.makedirs(os.path.join(workdir, d))
+
+    gl = datasets.load_manifest(os.path.join(base, "data/gl_history_raw"))
+    gl_rows = sum(p["rows"] for p in gl["partitions"].values())
+    factor = scale * PRODUCTION_GL_ROWS / gl_rows
+    rng = np.random.default_rng(seed)
+
+    print(f"Preparing inputs at {scale:g}x (base x {factor:.2f}) ...")
+    files = {}
+    for res in inputs:
+        if res not in SCALED_KEYS:
+            raise KeyError(f"{res} has no entry in SCALED_KEYS")
+        src, dst = os.path.join(base, res), os.path.join(workdir, res)
+        keys = SCALED_KEYS[res]
+        if res.endswith("/manifest.json"):
+            rows = write_scaled_dataset(
+                os.path.dirname(src), os.path.dirname(dst), keys, factor, rng
+            )
+        elif keys is None:
+            shutil.copyfile(src, dst)
+            rows = len(pd.read_csv(src, dtype=str))
+        else:
+            rows = write_scaled(src, dst, keys, factor, rng)
+        files[res] = {"rows": rows, "sha256": file_digest(dst)}
+        print(f"→ {res}: {rows} rows")
+
+    pipeline_state.save_json(stamp_file, {**wanted, "files": files})
+    return files
+
+
+def input_spec(base, scale, seed):
+    """
+    What the inputs of a scale are generated from. Runs with the
+    same spec had the same input rows, whatever the storage
+    format of the commit that ran them.
+    """
+    return {
+        "base": pipeline_state.load_json(os.path.join(base, "base.json")),
+        "scale": scale,
+        "seed": seed,
+    }
+
+
+# ------------------------------------------------------------
+# Measurement
+# ------------------------------------------------------------
+def output_digest(path):
+    """
+    Digest of an output; JSON payloads without their
+    generated_at timestamp.
+    """
+    if not path.endswith(".json"):
+        return file_digest(path)
+    with open(path, encoding="utf-8") as f:
+        payload = json.load(f)
+    if isinstance(payload, dict):
+        payload.pop("generated_at", None)
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def run_stage(stage, workdir, repeat):
+    """
+    Best of repeat runs by wall time; peak RSS is the highest seen.
+    """
+    log = os.path.join(workdir, "stages.log")
+    peak_file = os.path.join(workdir, "peak_rss_kb")
+    env = bench_env(workdir)
+    best = None
+    peak = 0.0
+
+    for _ in range(repeat):
+        code, wall, ru = run_logged(
+            ["-c", STAGE_RUNNER, os.path.join(REPO, stage["path"]), peak_file],
+            workdir, env, log,
+        )
+        check(code, stage["path"], log)
+        with open(peak_file, encoding="utf-8") as f:
+            peak = max(peak, int(f.read()) / 1024)
+        if best is None or wall < best["wall_s"]:
+            best = {
+                "wall_s": round(wall, 3),
+                "user_cpu_s": round(ru.ru_utime, 3),
+                "system_cpu_s": round(ru.ru_stime, 3),
+            }
+
+    best["peak_rss_mb"] = round(peak, 1)
+    best["outputs"] = {
+        res: output_digest(os.path.join(workdir, res))
+        for res in stage["writes"]
+        if os.path.exists(os.path.join(workdir, res))
+    }
+    return best
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=REPO, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit
+
+
+# ------------------------------------------------------------
+# Kernels
+# ------------------------------------------------------------
+# Each kernel is checked against a reference: the code it
+# replaced (PARITY LOCKED), ported to the same inputs. Both run
+# on every --kernels run, so parity needs no earlier results.
+def reference_normalize_id(s):
+    """
+    The per-row id normalisation every step ran before
+    schemas.normalize_id: the reference for its output and time.
+    """
+    return (
+        s.astype(str)
+         .str.replace(r"\.0$", "", regex=True)
+         .str.strip()
+         .replace({"nan": "", "None": ""})
+    )
+
+
+def reference_gl_history(raw, ac, last_complete):
+    """
+    gl_history as 04 computed it before the account x month
+    matrix (gl_matrix, gl_balances): raw lines grouped per
+    account and month, then a loop over accounts.
+    """
+    df = raw[reference_normalize_id(raw["Jrnl"]) != "CLS"].copy()
+    df["Account_Num"] = pd.to_numeric(df["Account"], errors="coerce").astype("Int64")
+    df["NetAmount"] = df["Debit"].fillna(0.0) - df["Credit"].fillna(0.0)
+
+    ac = ac[["Account_Key", "description"]].rename(columns={"description": "Account_Description"})
+    ac["Account_Key"] = reference_normalize_id(ac["Account_Key"])
+    df["Account_Key"] = df["Account"].str.zfill(4)
+    df = df.merge(ac, how="left", on="Account_Key")
+
+    df = df[df["MonthStart"].notna() & df["Account_Num"].notna()]
+    monthly = (
+        df.groupby(["Account", "Account_Num", "Account_Description", "MonthStart"], as_index=False)
+        .agg(MonthlyAmount=("NetAmount", "sum"))
+        .sort_values(["Account_Num", "MonthStart"])
+        .reset_index(drop=True)
+    )
+    monthly["CumToDate"] = (
+        monthly.groupby(["Account", "Account_Num", "Account_Description"])["MonthlyAmount"].cumsum()
+    )
+
+    previous = gl_balances.month_start(last_complete, -1)
+    second_previous = gl_balances.month_start(last_complete, -2)
+    year_start = date(last_complete.year, 1, 1)
+
+    def last_value(series, mask):
+        s = series[mask].dropna()
+        return s.iloc[-1] if len(s) else np.nan
+
+    rows = []
+    for (acct, acct_num, acct_desc), g in monthly.groupby(
+        ["Account", "Account_Num", "Account_Description"], sort=False
+    ):
+        g = g.sort_values("MonthStart")
+        ms, cum, amt = g["MonthStart"], g["CumToDate"], g["MonthlyAmount"]
+        is_income = 4000 <= int(acct_num) <= 8020
+        rows.append({
+            "Account": acct,
+            "Account_Num": int(acct_num),
+            "Account_Description": acct_desc,
+            "CumToLastComplete": last_value(cum, ms <= last_complete),
+            "CumToPrior": last_value(cum, ms <= previous),
+            "CumToSecondPrior": last_value(cum, ms <= second_previous),
+            "NetIncomeYTD_Prior": last_value(
+                cum, (ms >= year_start) & (ms <= previous)
+            ) if is_income else np.nan,
+            "NetIncomeYTD_LastComplete": last_value(
+                cum, (ms >= year_start) & (ms <= last_complete)
+            ) if is_income else np.nan,
+            "LastCompleteMonthActivity": last_value(amt, ms == last_complete),
+            "PriorMonthActivity": last_value(amt, ms == previous),
+        })
+
+    final = pd.DataFrame(rows)
+    for col in final.columns[3:]:
+        final[col] = pd.to_numeric(final[col], errors="coerce").round(2)
+    return final.sort_values("Account_Num").reset_index(drop=True)
+
+
+def reference_gl_history_all(raw, ac):
+    """
+    gl_history_all as 05 computed it before it was fused into
+    04: raw lines grouped per account and month, then pivoted.
+    """
+    df = raw[reference_normalize_id(raw["Jrnl"]) != "CLS"].copy()
+    df["Account_Num"] = pd.to_numeric(df["Account"], errors="coerce").astype("Int64")
+    df["NetAmount"] = df["Debit"].fillna(0.0) - df["Credit"].fillna(0.0)
+
+    ac = ac.rename(columns={"account_no": "Account", "description": "Account_Description"})
+    ac = ac[["Account", "Account_Description"]]
+    ac["Account"] = reference_normalize_id(ac["Account"])
+    df = df.merge(ac, how="left", on="Account")
+    df["MonthText"] = pd.to_datetime(df["MonthStart"]).dt.strftime("%Y-%m")
+
+    grouped = (
+        df.groupby(
+            ["Account", "Account_Num", "Account_Description", "MonthText"],
+            as_index=False, dropna=False,
+        )
+        .agg(MonthlyAmount=("NetAmount", "sum"))
+    )
+    pivot = grouped.pivot_table(
+        index=["Account", "Account_Num", "Account_Description"],
+        columns="MonthText", values="MonthlyAmount", aggfunc="sum", fill_value=0.0,
+    ).reset_index()
+    pivot.columns.name = None
+    pivot = pivot.sort_values("Account_Num").reset_index(drop=True)
+
+    month_cols = list(pivot.columns[3:])
+    pivot[month_cols] = pivot[month_cols].apply(lambda s: pd.to_numeric(s, errors="coerce").round(2))
+    return pivot
+
+
+def reference_per_invoice(df):
+    """
+    10's per-invoice rollup as it was computed before
+    per_invoice: the header x detail line join's rows rebuilt
+    (each voucher's payments, detail_line_count times over) and
+    cash_amount summed over them.
+    """
+    df = df[df["detail_line_count"] > 0]
+    k = df["detail_line_count"].to_numpy()
+    row = np.repeat(np.arange(len(df)), k)
+    copy = np.arange(len(row)) - np.repeat(np.cumsum(k) - k, k)
+    voucher = df.groupby("voucher_no", sort=False).ngroup().to_numpy()
+    order = np.lexsort((row, copy, voucher[row]))
+    df = df.iloc[row[order]].reset_index(drop=True)
+    return (
+        df.groupby(["invoice_no", "vendor_name", "job_no"], dropna=False)
+        .agg(
+            invoice_date=("invoice_date", "min"),
+            transaction_date=("transaction_date", "first"),
+            invoice_amount=("invoice_amount", "max"),
+            amount_paid=("cash_amount", "sum"),
+            retainage_amount=("retainage_amount", "max"),
+            job_description=("job_description", "first"),
+            project_manager_name=("project_manager_name", "first"),
+        )
+        .reset_index()
+    )
+
+
+def gl_snapshots(raw, ac, months):
+    """
+    gl_history as of each of months and gl_history_all, the way
+    04 and gl_balances compute them.
+    """
+    derived = importlib.import_module("04_gl_history_derived")
+    monthly = gl_matrix.aggregate(raw[~gl_matrix.closing(raw["Jrnl"])])
+    matrix = gl_matrix.dense(derived.account_months(monthly, ac.copy()), gl_matrix.KEYS)
+    return [gl_balances.history(matrix, m) for m in months], derived.gl_history_all(monthly, ac.copy())
+
+
+def reference_gl_snapshots(raw, ac, months):
+    return [reference_gl_history(raw, ac, m) for m in months], reference_gl_history_all(raw, ac)
+
+
+def same_frames(a, b, **tolerance):
+    try:
+        pd.testing.assert_frame_equal(a, b, check_dtype=False, check_exact=not tolerance, **tolerance)
+    except AssertionError:
+        return False
+    return True
+
+
+def same_gl(a, b):
+    (history_a, all_a), (history_b, all_b) = a, b
+    return same_frames(all_a, all_b) and all(map(same_frames, history_a, history_b))
+
+
+def same_per_invoice(a, b):
+    # Summing per voucher rather than per copy moves the last
+    # bits of amount_paid only (see 10's per_invoice)
+    return same_frames(a.drop(columns="amount_paid"), b.drop(columns="amount_paid")) and same_frames(
+        a[["amount_paid"]], b[["amount_paid"]], rtol=1e-12, atol=0.0
+    )
+
+
+def kernel_cases(workdir):
+    """
+    (kernel, input, rows, kernel, reference, same) for every
+    kernel and input at a scale: the id columns of the GL and
+    labor inputs, in the forms steps get them from the driver
+    (text with NULL as None, numbers with NULL as NaN); the GL
+    rollups as of the last complete month and a year and two
+    years before; payments.csv's per-invoice rollup.
+    """
+    data = os.path.join(workdir, "data")
+    raw = datasets.read(
+        "gl_history_raw",
+        columns=["Account", "Job", "FullAccountNo", "Jrnl", "Debit", "Credit", "MonthStart"],
+        directory=os.path.join(data, "gl_history_raw"),
+    )
+    labor = pd.read_csv(
+        os.path.join(data, "labor_job_allocation.csv"),
+        usecols=["employee_no", "job_no", "cost_code_no"],
+        dtype=str,
+    )
+    ids = {
+        "GL Account (text)": raw["Account"],
+        "GL FullAccountNo (text)": raw["FullAccountNo"],
+        "GL Job (text)": raw["Job"].where(raw["Job"] != "", None),
+        "GL Job (number)": pd.to_numeric(raw["Job"], errors="coerce"),
+        "labor employee_no (text)": labor["employee_no"],
+        "labor job_no (text)": labor["job_no"],
+        "labor job_no (number)": pd.to_numeric(labor["job_no"], errors="coerce"),
+        "labor cost_code_no (text)": labor["cost_code_no"],
+    }
+    for label, s in ids.items():
+        yield (
+            "normalize_id", label, len(s),
+            partial(schemas.normalize_id, s), partial(reference_normalize_id, s),
+            lambda a, b: a.equals(b),
+        )
+
+    ac = artifacts.read_csv("accounts", os.path.join(data, "accounts.csv"))
+    last_complete = gl_balances.last_complete_month(
+        pd.Timestamp(AS_OF).tz_convert(gl_balances.TIMEZONE).date()
+    )
+    months = [gl_balances.month_start(last_complete, -offset) for offset in (0, 12, 24)]
+    yield (
+        "gl_rollup", "GL as of 3 months + pivot", len(raw),
+        partial(gl_snapshots, raw, ac, months), partial(reference_gl_snapshots, raw, ac, months),
+        same_gl,
+    )
+
+    summary = importlib.import_module("10_ap_invoice_summary")
+    payments = artifacts.read_csv("payments", os.path.join(data, "payments.csv"))
+    yield (
+        "ap_per_invoice", "payments", len(payments),
+        partial(summary.per_invoice, payments), partial(reference_per_invoice, payments),
+        same_per_invoice,
+    )
+
+
+def best_time(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_kernels(workdir, repeat):
+    """
+    Time every kernel against its reference on a scale's inputs;
+    raises if an output differs.
+    """
+    results = {}
+    for name, label, rows, kernel, reference, same in kernel_cases(workdir):
+        if not same(kernel(), reference()):
+            raise RuntimeError(f"{name} differs from its reference on {label}")
+        results.setdefault(name, {})[label] = {
+            "rows": rows,
+            "reference_ms": round(best_time(reference, repeat) * 1000, 2),
+            "kernel_ms": round(best_time(kernel, repeat) * 1000, 2),
+        }
+    return results
+
+
+# ------------------------------------------------------------
+# Comparison
+# ------------------------------------------------------------
+def compare(results, baseline):
+    """
+    Print timings against baseline. Returns the number of stages
+    compared and those whose outputs differ from the baseline
+    for identical inputs.
+
+    Outputs are matched by file, not by stage, so a stage that
+    now writes what other stages wrote (e.g. two stages fused
+    into one) is compared with those stages, timings summed.
+    """
+    print(f"\nCompared with {baseline['commit']}:")
+    print(f"{'scale':>6}  {'stage':<36}{'wall':>8}{'peak RSS':>10}  output")
+    compared = 0
+    failures = []
+
+    for scale, run in results["runs"].items():
+        ref = baseline["runs"].get(scale)
+        if ref is None:
+            continue
+        if ref["inputs"] != run["inputs"]:
+            print(f"{scale:>6}  inputs differ from the baseline run, not compared")
+            continue
+
+        for name, stage in run["stages"].items():
+            before = [
+                old for old_name, old in ref["stages"].items()
+                if old_name == name or set(old["outputs"]) & set(stage["outputs"])
+            ]
+            if not before:
+                continue
+            ref_outputs = {r: d for old in before for r, d in old["outputs"].items()}
+            common = set(stage["outputs"]) & set(ref_outputs)
+            if not common:
+                parity = "n/a"
+            elif all(stage["outputs"][r] == ref_outputs[r] for r in common):
+                parity = "identical"
+            else:
+                parity = "DIFFERENT"
+                failures.append((scale, name))
+            compared += bool(common)
+            wall = sum(old["wall_s"] for old in before)
+            peak = max(old["peak_rss_mb"] for old in before)
+            print(
+                f"{scale:>6}  {name:<36}"
+                f"{stage['wall_s'] / max(wall, 1e-3):>7.2f}x"
+                f"{stage['peak_rss_mb'] / max(peak, 1e-3):>9.2f}x"
+                f"  {parity}"
+            )
+    return compared, failures
+
+
+# ------------------------------------------------------------
+# Main
+# ------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the transform stages")
+    parser.add_argument(
+        "--scale",
+        type=float,
+        action="append",
+        help=f"GL volume multiplier over production, repeatable (default {DEFAULT_SCALES})",
+    )
+    parser.add_argument(
+        "--stage",
+        action="append",
+        help="only this stage (name prefix, e.g. 04 or json/01) and its upstream stages",
+    )
+    parser.add_argument(
+        "--repeat", type=int, help="runs per stage (default 1) or kernel (5), best time kept"
+    )
+    parser.add_argument("--seed", type=int, default=5587)
+    parser.add_argument("--compare", help="earlier results file to check parity and timings against")
+    parser.add_argument("--out", help="results file (default BENCH_DIR/results/<commit>.json)")
+    parser.add_argument(
+        "--kernels",
+        action="store_true",
+        help=f"check and time the kernels against their references instead of the stages (default scale {KERNEL_SCALES})",
+    )
+    args = parser.parse_args()
+
+    scales = args.scale or (KERNEL_SCALES if args.kernels else DEFAULT_SCALES)
+    stages = transform_stages(args.stage)
+    # Always every input, so runs of a few stages share them
+    inputs = external_inputs(transform_stages())
+    commit = git_commit()
+    out = args.out or os.path.join(BENCH_DIR, "results", f"{commit}.json")
+
+    results = pipeline_state.load_json(out) or {"commit": commit, "runs": {}}
+    results.update({
+        "recorded_utc": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "as_of": AS_OF,
+        "seed": args.seed,
+    })
+
+    base = build_base(args.seed, inputs)
+
+    if args.kernels:
+        print(f"\n{'scale':>6}  {'kernel':<16}{'input':<28}{'rows':>10}{'reference ms':>14}{'kernel ms':>11}")
+        for scale in scales:
+            workdir = os.path.abspath(os.path.join(BENCH_DIR, "work", f"scale-{scale:g}"))
+            prepare_inputs(base, workdir, inputs, scale, args.seed)
+            key = f"{scale:g}"
+            kernels = run_kernels(workdir, args.repeat or 5)
+            results.setdefault("kernels", {})[key] = {
+                "inputs": input_spec(base, scale, args.seed),
+                **kernels,
+            }
+            for name, by_input in kernels.items():
+                for label, m in by_input.items():
+                    print(
+                        f"{key:>6}  {name:<16}{label:<28}{m['rows']:>10}"
+                        f"{m['reference_ms']:>14.1f}{m['kernel_ms']:>11.1f}",
+                        flush=True,
+                    )
+        pipeline_state.save_json(out, results)
+        print(f"\nWrote {out}")
+        return
+
+    print(f"\n{'scale':>6}  {'stage':<36}{'wall s':>8}{'cpu s':>8}{'peak MB':>9}")
+    for scale in scales:
+        workdir = os.path.abspath(os.path.join(BENCH_DIR, "work", f"scale-{scale:g}"))
+        files = prepare_inputs(base, workdir, inputs, scale, args.seed)
+
+        key = f"{scale:g}"
+        spec = input_spec(base, scale, args.seed)
+        run = results["runs"].setdefault(key, {"inputs": spec, "stages": {}})
+        if run["inputs"] != spec:
+            run.update({"inputs": spec, "stages": {}})
+        run["input_files"] = files
+
+        for stage in stages:
+            name = stage_name(stage)
+            m = run_stage(stage, workdir, max(1, args.repeat or 1))
+            run["stages"][name] = m
+            print(
+                f"{key:>6}  {name:<36}{m['wall_s']:>8.2f}"
+                f"{m['user_cpu_s'] + m['system_cpu_s']:>8.2f}{m['peak_rss_mb']:>9.1f}",
+                flush=True,
+            )
+        pipeline_state.save_json(out, results)
+
+    print(f"\nWrote {out}")
+
+    if args.compare:
+        baseline = pipeline_state.load_json(args.compare)
+        if baseline is None:
+            raise SystemExit(f"No results file {args.compare}")
+        compared, failures = compare(results, baseline)
+        if failures:
+            print("\nPARITY FAILED (output differs from the baseline for the same inputs):")
+            for scale, name in failures:
+                print(f"  {name} at {scale}x")
+            sys.exit(1)
+        if not compared:
+            raise SystemExit("\nNothing to compare: no stage ran on the baseline's inputs")
+        print(f"\nParity: outputs of {compared} stage runs identical to the baseline")
+
+
+if __name__ == "__main__":
+    main()
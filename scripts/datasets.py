@@ -0,0 +1,245 @@
+"""
+Typed, compressed intermediate datasets.
+
+An intermediate dataset is a directory under data/ (e.g.
+data/gl_history_raw/) with one Parquet file per partition (e.g.
+per GL month), or a single file for a small unpartitioned one
+(write()), and a manifest.json listing the files with their row
+counts and content hashes. Every partition has the
+column types declared for the dataset in schemas.py, so readers
+get typed columns back without inference, and read only what
+they ask for:
+
+    datasets.read(
+        "gl_history_raw",
+        columns=["Account", "MonthStart", "Debit", "Credit", "Jrnl"],
+        filters=[("MonthStart", ">=", date(2024, 1, 1))],
+    )
+
+A filter on the partition column skips whole files; other
+filters skip row groups by their statistics and then drop rows.
+Rows come back in partition order.
+
+The manifest is replaced last, so a reader never sees a
+half-published dataset; run_all steps declare it as the input or
+output (see STEPS).
+"""
+import operator
+import os
+import shutil
+from datetime import date
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import pipeline_state
+
+DATA_DIR = "data"
+
+COMPRESSION = "zstd"
+ROW_GROUP_ROWS = 128 * 1024
+
+# Declared column kind (see schemas.py) -> Parquet type
+TYPES = {
+    "id": pa.string(),
+    "string": pa.string(),
+    "category": pa.dictionary(pa.int32(), pa.string()),
+    "int64": pa.int64(),
+    "Int64": pa.int64(),
+    "float64": pa.float64(),
+    "date": pa.date32(),
+}
+TEXT = ("id", "string", "category")
+
+OPERATORS = {
+    "==": operator.eq,
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda a, b: a in b,
+    "not in": lambda a, b: a not in b,
+}
+
+
+def path(name):
+    return os.path.join(DATA_DIR, name)
+
+
+def manifest_path(name):
+    return os.path.join(path(name), "manifest.json")
+
+
+def exists(name):
+    return os.path.exists(manifest_path(name))
+
+
+def schema(columns):
+    return pa.schema([(col, TYPES[kind]) for col, kind in columns.items()])
+
+
+# ------------------------------------------------------------
+# Writing
+# ------------------------------------------------------------
+def to_table(df, columns):
+    """
+    df as an Arrow table with exactly the declared columns and
+    types (text columns may arrive as numbers, dates as
+    timestamps, integer columns with NULLs as floats).
+    """
+    arrays = []
+    for col, kind in columns.items():
+        s = df[col]
+        if kind in TEXT:
+            s = s.astype(object)
+            s = s.where(s.isna(), s.astype(str))
+            if kind == "category":
+                arrays.append(pa.array(s, type=pa.string(), from_pandas=True).dictionary_encode())
+                continue
+        elif kind == "date":
+            s = pd.to_datetime(s).dt.normalize()
+            arrays.append(pa.array(s, from_pandas=True).cast(pa.date32()))
+            continue
+        elif s.dtype == object:
+            s = pd.to_numeric(s)
+        arrays.append(pa.array(s, type=TYPES[kind], from_pandas=True))
+    return pa.Table.from_arrays(arrays, schema=schema(columns))
+
+
+def write_file(file, df, columns):
+    """
+    Write df as one Parquet file (atomically).
+    """
+    tmp = f"{file}.tmp"
+    pq.write_table(
+        to_table(df, columns), tmp,
+        compression=COMPRESSION, row_group_size=ROW_GROUP_ROWS,
+    )
+    os.replace(tmp, file)
+
+
+def publish(directory, sources, columns, partition_by):
+    """
+    Make directory the dataset of the given partitions: sources
+    is a list of (key, Parquet file or None for an empty
+    partition) in order, partition_by None for an unpartitioned
+    dataset. Files are hard-linked where possible.
+    """
+    os.makedirs(directory, exist_ok=True)
+    partitions = {}
+
+    for key, src in sources:
+        if src is None:
+            partitions[key] = {"file": None, "rows": 0, "sha256": None}
+            continue
+        file = f"{key}.parquet"
+        dst = os.path.join(directory, file)
+        # Skipped when dst is already src (or a link to it): a
+        # rename onto another link of the same file does nothing,
+        # which would leave the .tmp link behind
+        if not (os.path.exists(dst) and os.path.samefile(src, dst)):
+            tmp = f"{dst}.tmp"
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            try:
+                os.link(src, tmp)
+            except OSError:
+                shutil.copyfile(src, tmp)
+            os.replace(tmp, dst)
+        partitions[key] = {
+            "file": file,
+            "rows": pq.read_metadata(dst).num_rows,
+            "sha256": pipeline_state.fingerprint_file(dst)["sha256"],
+        }
+
+    pipeline_state.save_json(os.path.join(directory, "manifest.json"), {
+        "columns": columns,
+        "partition_by": partition_by,
+        "partitions": partitions,
+    })
+
+    listed = {p["file"] for p in partitions.values()} | {"manifest.json"}
+    for file in os.listdir(directory):
+        if file not in listed and not file.endswith(".tmp"):
+            os.remove(os.path.join(directory, file))
+    return sum(p["rows"] for p in partitions.values())
+
+
+def write(name, df, columns):
+    """
+    Publish df as the unpartitioned dataset name (one file).
+    """
+    directory = path(name)
+    os.makedirs(directory, exist_ok=True)
+    staged = os.path.join(directory, "all.parquet.new")
+    write_file(staged, df, columns)
+    return publish(directory, [("all", staged)], columns, None)
+
+
+# ------------------------------------------------------------
+# Reading
+# ------------------------------------------------------------
+def load_manifest(directory):
+    manifest = pipeline_state.load_json(os.path.join(directory, "manifest.json"))
+    if manifest is None:
+        raise FileNotFoundError(f"No dataset in {directory} (missing manifest.json)")
+    return manifest
+
+
+def partition_value(key, kind):
+    if kind == "date":
+        return date.fromisoformat(key)
+    if kind == "int64":
+        return int(key)
+    if kind == "float64":
+        return float(key)
+    return key
+
+
+def iter_partitions(name, columns=None, filters=None, directory=None):
+    """
+    The dataset one partition at a time, as (key, DataFrame),
+    skipping partitions excluded by filters on the partition
+    column and empty ones. filters is a list of (column, op,
+    value) with op one of OPERATORS.
+    """
+    directory = directory or path(name)
+    manifest = load_manifest(directory)
+    by = manifest["partition_by"]
+
+    for key, entry in manifest["partitions"].items():
+        if not entry["rows"]:
+            continue
+        if by is not None:
+            value = partition_value(key, manifest["columns"][by])
+            if any(OPERATORS[op](value, v) is False for col, op, v in filters or [] if col == by):
+                continue
+        table = pq.read_table(
+            os.path.join(directory, entry["file"]),
+            columns=columns,
+            filters=filters or None,
+        )
+        yield key, table.to_pandas()
+
+
+def read(name, columns=None, filters=None, directory=None):
+    """
+    The dataset (or the requested columns, partitions and rows of
+    it) as one DataFrame.
+    """
+    frames = [df for _, df in iter_partitions(name, columns, filters, directory)]
+    manifest = load_manifest(directory or path(name))
+    if not frames:
+        empty = schema(manifest["columns"]).empty_table().to_pandas()
+        return empty[columns] if columns else empty
+
+    df = pd.concat(frames, ignore_index=True)
+    # Partitions each have their own categories; concat falls
+    # back to plain text where they differ
+    for col, kind in manifest["columns"].items():
+        if kind == "category" and col in df.columns and df[col].dtype != "category":
+            df[col] = df[col].astype("category")
+    return df
@@ -0,0 +1,111 @@
+"""
+Shared lookup tables (jobs, project managers, cost codes, ...).
+
+Each table is fetched and normalized once per run and handed to
+every step that joins it. Between runs it is kept in
+STATE_DIR/dimensions/ and reused while a cheap probe (row count
+plus CHECKSUM_AGG over the fetched columns) shows the table is
+unchanged and it was built by the same code: the cache's signature
+also hashes the table's definition (DIMENSIONS) and the code that
+normalizes it (_load, schemas.normalize_id), so changing either
+refetches. DIMENSIONS_NO_CACHE=1 always refetches.
+"""
+import os
+import threading
+
+import pandas as pd
+
+import foundation_db
+import pipeline_state
+import schemas
+
+CACHE_DIR = pipeline_state.state_path("dimensions")
+NO_CACHE = os.getenv("DIMENSIONS_NO_CACHE") == "1"
+
+# name -> source table and columns. Columns listed under numeric
+# are parsed with pd.to_numeric; all others are text, normalized
+# with schemas.normalize_id like every step's ids.
+DIMENSIONS = {
+    "jobs": {
+        "table": "dbo.jobs",
+        "columns": ["job_no", "description", "project_manager_no"],
+    },
+    "project_managers": {
+        "table": "dbo.project_managers",
+        "columns": ["project_manager_no", "description"],
+    },
+    "cost_codes": {
+        "table": "dbo.cost_codes",
+        "columns": ["cost_code_no", "description"],
+    },
+    "cost_classes": {
+        "table": "dbo.cost_classes",
+        "columns": ["cost_class_no", "description"],
+        "numeric": ["cost_class_no"],
+    },
+    "vendors": {
+        "table": "dbo.vendors",
+        "columns": ["vendor_no", "name"],
+    },
+}
+
+_lock = threading.Lock()
+_table_locks = {}
+_frames = {}
+
+
+def get(name):
+    """
+    The normalized lookup table (a copy the caller may modify).
+    Concurrent steps asking for the same table share one fetch.
+    """
+    with _lock:
+        table_lock = _table_locks.setdefault(name, threading.Lock())
+
+    with table_lock:
+        if name not in _frames:
+            _frames[name] = _load(name)
+    return _frames[name].copy()
+
+
+def _load(name):
+    spec = DIMENSIONS[name]
+    cols = ", ".join(spec["columns"])
+
+    probe = foundation_db.query(
+        f"SELECT COUNT_BIG(*) AS row_count, "
+        f"CHECKSUM_AGG(BINARY_CHECKSUM({cols})) AS checksum "
+        f"FROM {spec['table']}"
+    ).iloc[0]
+    signature = {
+        "columns": spec["columns"],
+        "code": pipeline_state.code_signature(spec, _load, *schemas.NORMALIZE_CODE),
+        "rows": int(probe["row_count"]),
+        "checksum": None if pd.isna(probe["checksum"]) else int(probe["checksum"]),
+    }
+
+    path = os.path.join(CACHE_DIR, f"{name}.pkl")
+    meta_file = os.path.join(CACHE_DIR, f"{name}.json")
+
+    if (
+        not NO_CACHE
+        and os.path.exists(path)
+        and pipeline_state.load_json(meta_file) == signature
+    ):
+        print(f"   [dim {name}] unchanged ({signature['rows']} rows), reusing cache")
+        return pd.read_pickle(path)
+
+    df = foundation_db.query(f"SELECT {cols} FROM {spec['table']}")
+    numeric = spec.get("numeric", [])
+    for col in spec["columns"]:
+        if col in numeric:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+        else:
+            df[col] = schemas.normalize_id(df[col])
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    df.to_pickle(tmp)
+    os.replace(tmp, path)
+    pipeline_state.save_json(meta_file, signature)
+    return df
@@ -0,0 +1,253 @@
+"""
+Allocation rows kept between runs and upserted per document.
+
+A document step (AP checks, AR receipts) stores its output rows
+under STATE_DIR/<name>/, one pickle per document month ("none"
+for undated documents), with an index of the month each stored
+document is in and the last probe: one row per document with its
+date, whether it is live (not voided / reversed) and a checksum
+of its header row. The probe reads the document table alone, no
+detail lines, and transfers keys and numbers only.
+
+Each run compares a fresh probe with the stored one. Documents
+that disappeared or are no longer live are dropped; new documents
+and documents whose date or header changed are refetched with
+their detail lines, together with every document dated inside the
+trailing window. Everything else is reused. A change to the lines
+of a document older than the window that leaves its header alone
+is not seen by the probe; ALLOCATION_FULL_REBUILD=1 resyncs.
+
+Fetched rows are streamed into the store batch by batch (spooled
+per month, then merged one month at a time) and the output is
+read back a month at a time, so memory is bounded by a batch and
+a month of rows, not the whole history.
+
+The manifest records a signature of the columns and the code the
+rows were built with (see pipeline_state.code_signature); a store
+with another signature, or left incomplete by a killed run, is
+discarded and rebuilt.
+"""
+import os
+import shutil
+from datetime import timedelta
+
+import pandas as pd
+
+import pipeline_state
+
+# Documents dated within this many days are always refetched
+WINDOW_DAYS = int(os.getenv("ALLOCATION_WINDOW_DAYS", "45"))
+FULL_REBUILD = os.getenv("ALLOCATION_FULL_REBUILD") == "1"
+
+# Probe columns besides the document keys
+PROBE_COLS = ["document_date", "live", "checksum"]
+
+# Partition of documents without a date
+UNDATED = "none"
+
+
+class DocumentStore:
+    def __init__(self, name, keys, date_col, signature):
+        self.name = name
+        self.keys = keys
+        self.date_col = date_col
+        self.signature = signature
+        self.dir = pipeline_state.state_path(name)
+        self.manifest_file = os.path.join(self.dir, "manifest.json")
+        self.index_file = os.path.join(self.dir, "index.pkl")
+        self.probe_file = os.path.join(self.dir, "probe.pkl")
+
+        self.manifest = None
+        self.index = None
+        self.probe = None
+        self.refetch = None
+
+        manifest = pipeline_state.load_json(self.manifest_file)
+        if FULL_REBUILD or manifest is None:
+            pass
+        elif manifest.get("signature") != signature:
+            print(f"   [{name}] stored rows were built by other code or columns; rebuilding")
+        elif not manifest.get("complete"):
+            print(f"   [{name}] stored rows are incomplete (killed run); rebuilding")
+        else:
+            self.manifest = manifest
+            self.index = pd.read_pickle(self.index_file)
+            self.probe = pd.read_pickle(self.probe_file)
+
+    def partition_path(self, partition):
+        return os.path.join(self.dir, f"{partition}.pkl")
+
+    def partition_of(self, df):
+        dates = pd.to_datetime(df[self.date_col], errors="coerce")
+        return dates.dt.strftime("%Y-%m").fillna(UNDATED)
+
+    # ------------------------------------------------------------
+    # Probe
+    # ------------------------------------------------------------
+    def refresh_from(self, probe):
+        """
+        Earliest document date to refetch, or None for a full
+        fetch (no usable store, or ALLOCATION_FULL_REBUILD=1).
+        """
+        live = probe[probe["live"]]
+        if self.manifest is None:
+            self.refetch = live[self.keys]
+            return None
+
+        check = live.merge(
+            self.probe, on=self.keys, how="left",
+            suffixes=("", "_stored"), indicator=True,
+        )
+        stale = check["_merge"] == "left_only"
+        for col in PROBE_COLS:
+            a, b = check[col], check[f"{col}_stored"]
+            stale |= (a != b) & ~(a.isna() & b.isna())
+
+        since = pipeline_state.today() - timedelta(days=WINDOW_DAYS)
+        stale_dates = pd.to_datetime(check.loc[stale, "document_date"]).dropna()
+        if len(stale_dates):
+            since = min(since, stale_dates.min().date())
+
+        dates = pd.to_datetime(live["document_date"])
+        self.refetch = live.loc[dates.isna() | (dates >= pd.Timestamp(since)), self.keys]
+
+        print(
+            f"   [{self.name}] {int(stale.sum())} new or changed documents, "
+            f"refetching from {since}"
+        )
+        return since
+
+    # ------------------------------------------------------------
+    # Upsert
+    # ------------------------------------------------------------
+    def upsert(self, batches, probe):
+        """
+        Stream the fetched rows (an iterable of DataFrames) into
+        the store: replace every fetched or refetched document's
+        rows, drop documents the probe no longer lists as live,
+        and persist the result. Returns the number of rows stored.
+        """
+        if self.manifest is None:
+            shutil.rmtree(self.dir, ignore_errors=True)
+            stored = {}
+        else:
+            stored = self.manifest["partitions"]
+        os.makedirs(self.dir, exist_ok=True)
+        columns = self.manifest["columns"] if self.manifest else None
+
+        # A killed run from here on leaves an incomplete store
+        pipeline_state.save_json(
+            self.manifest_file,
+            {"signature": self.signature, "complete": False, "columns": columns,
+             "partitions": stored},
+        )
+
+        spool = os.path.join(self.dir, "incoming")
+        os.makedirs(spool, exist_ok=True)
+        incoming = {}
+        fetched = []
+        fetched_rows = 0
+        for df in batches:
+            columns = list(df.columns)
+            if not len(df):
+                continue
+            partition = self.partition_of(df)
+            for key, rows in df.groupby(partition, sort=False):
+                files = incoming.setdefault(key, [])
+                files.append(os.path.join(spool, f"{key}.{len(files)}.pkl"))
+                rows.to_pickle(files[-1])
+            fetched.append(df[self.keys].assign(partition=partition).drop_duplicates())
+            fetched_rows += len(df)
+
+        fetched = (
+            pd.concat(fetched, ignore_index=True).drop_duplicates(self.keys)
+            if fetched else pd.DataFrame(columns=[*self.keys, "partition"])
+        )
+
+        # Stored documents that stay: still live, not refetched
+        if self.index is None:
+            kept = pd.DataFrame(columns=[*self.keys, "partition"])
+            gone = kept
+        else:
+            live = probe.loc[probe["live"], self.keys]
+            replaced = pd.concat([self.refetch, fetched[self.keys]], ignore_index=True)
+            stays = (
+                _has(self.index, live, self.keys)
+                & ~_has(self.index, replaced, self.keys)
+            )
+            kept = self.index[stays]
+            gone = self.index[~stays]
+
+        partitions = dict(stored)
+        reused = sum(stored.values())
+        for partition in sorted(set(gone["partition"]) | set(incoming)):
+            frames = []
+            if partition in stored:
+                old = pd.read_pickle(self.partition_path(partition))
+                old = old[_has(old, kept[kept["partition"] == partition], self.keys)]
+                reused -= stored[partition] - len(old)
+                frames.append(old)
+            frames += [pd.read_pickle(f) for f in incoming.get(partition, [])]
+            frames = [df for df in frames if len(df)]
+
+            if frames:
+                rows = pd.concat(frames, ignore_index=True)
+                _save_pickle(rows, self.partition_path(partition))
+                partitions[partition] = len(rows)
+            elif partition in partitions:
+                os.remove(self.partition_path(partition))
+                del partitions[partition]
+
+        shutil.rmtree(spool)
+        if self.index is not None:
+            print(
+                f"   [{self.name}] reused {reused} rows, "
+                f"replaced or dropped {sum(stored.values()) - reused}, fetched {fetched_rows}"
+            )
+
+        self.index = pd.concat([kept, fetched], ignore_index=True)
+        self.probe = probe
+        _save_pickle(self.index, self.index_file)
+        _save_pickle(probe, self.probe_file)
+
+        self.manifest = {
+            "signature": self.signature,
+            "complete": True,
+            "columns": columns,
+            "partitions": partitions,
+        }
+        pipeline_state.save_json(self.manifest_file, self.manifest)
+        return sum(partitions.values())
+
+    # ------------------------------------------------------------
+    # Read back
+    # ------------------------------------------------------------
+    def partitions(self):
+        """
+        The stored rows one month at a time, newest first, then
+        the undated ones (the order of a date DESC sort). Yields
+        one empty frame with the columns if nothing is stored.
+        """
+        stored = self.manifest["partitions"]
+        order = sorted((p for p in stored if p != UNDATED), reverse=True)
+        if UNDATED in stored:
+            order.append(UNDATED)
+        if not order:
+            yield pd.DataFrame(columns=self.manifest["columns"])
+        for partition in order:
+            yield pd.read_pickle(self.partition_path(partition))
+
+
+def _has(df, documents, keys):
+    """
+    Mask of df's rows whose keys are among documents'.
+    """
+    return pd.MultiIndex.from_frame(df[keys]).isin(
+        pd.MultiIndex.from_frame(documents[keys])
+    )
+
+
+def _save_pickle(df, path):
+    tmp = f"{path}.tmp"
+    df.to_pickle(tmp)
+    os.replace(tmp, path)
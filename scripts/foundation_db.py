@@ -0,0 +1,289 @@
+"""
+Shared Foundation SQL Server access.
+
+Every extraction step connects and queries through this module:
+one connection string, one timeout policy, a small pool of
+reusable connections (shared by all steps of an in-process run),
+and per-query telemetry appended to the run's query-stats file.
+"""
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+import pipeline_state
+import sql_replay
+
+# ------------------------------------------------------------
+# Configuration
+# ------------------------------------------------------------
+# "sqlserver" (Foundation) or "standin": the local SQLite copy
+# from generate_standin.py (see foundation_standin.py), for
+# benchmarking and profiling without the live server
+BACKEND = os.getenv("FOUNDATION_BACKEND", "sqlserver")
+if BACKEND == "standin":
+    import foundation_standin as driver
+elif BACKEND == "sqlserver":
+    import pyodbc as driver
+else:
+    raise ValueError(f"Unknown FOUNDATION_BACKEND: {BACKEND}")
+
+SERVER = os.getenv("FOUNDATION_SQL_SERVER", "sql.foundationsoft.com,9000")
+DATABASE = os.getenv("FOUNDATION_SQL_DATABASE", "Cas_5587")
+
+LOGIN_TIMEOUT_SECONDS = int(os.getenv("FOUNDATION_LOGIN_TIMEOUT", "30"))
+QUERY_TIMEOUT_SECONDS = int(os.getenv("FOUNDATION_QUERY_TIMEOUT", "900"))
+
+# Idle connections kept for reuse; ones idle longer than
+# PING_AFTER_SECONDS are checked with SELECT 1 before reuse
+POOL_SIZE = int(os.getenv("FOUNDATION_POOL_SIZE", "4"))
+PING_AFTER_SECONDS = 60
+
+# Rows per fetchmany() call for streamed queries (iter_batches)
+BATCH_ROWS = int(os.getenv("FOUNDATION_BATCH_ROWS", "50000"))
+
+QUERY_STATS_FILE = pipeline_state.state_path("query_stats.jsonl")
+
+# Join run_all's recording or replay (FOUNDATION_REPLAY); see
+# sql_replay.attach
+sql_replay.attach()
+
+_lock = threading.Lock()
+_idle = []  # [(conn, last_used)]
+
+
+# ------------------------------------------------------------
+# Connections
+# ------------------------------------------------------------
+def connect():
+    if BACKEND == "standin":
+        conn = driver.connect()
+        conn.timeout = QUERY_TIMEOUT_SECONDS
+        return conn
+
+    conn = driver.connect(
+        "DRIVER={ODBC Driver 17 for SQL Server};"
+        f"SERVER={SERVER};"
+        f"DATABASE={DATABASE};"
+        f"UID={os.environ['FOUNDATION_SQL_USER']};"
+        f"PWD={os.environ['FOUNDATION_SQL_PASSWORD']};"
+        "TrustServerCertificate=yes;",
+        timeout=LOGIN_TIMEOUT_SECONDS
+    )
+    conn.timeout = QUERY_TIMEOUT_SECONDS
+    return conn
+
+
+def _alive(conn):
+    try:
+        conn.cursor().execute("SELECT 1").fetchall()
+        return True
+    except driver.Error:
+        return False
+
+
+@contextmanager
+def connection():
+    """
+    Borrow a pooled connection for the duration of the block.
+    If the block raises (a database error, or a streamed query
+    abandoned half-read) the connection is discarded.
+    Replay (FOUNDATION_REPLAY=replay) never connects: the block
+    gets None.
+    """
+    if sql_replay.MODE == "replay":
+        yield None
+        return
+
+    conn = None
+    while conn is None:
+        with _lock:
+            if not _idle:
+                break
+            candidate, last_used = _idle.pop()
+        if time.monotonic() - last_used < PING_AFTER_SECONDS or _alive(candidate):
+            conn = candidate
+        else:
+            _close(candidate)
+    if conn is None:
+        conn = connect()
+
+    try:
+        yield conn
+    except BaseException:
+        _close(conn)
+        raise
+    else:
+        with _lock:
+            if len(_idle) < POOL_SIZE:
+                _idle.append((conn, time.monotonic()))
+                conn = None
+        if conn is not None:
+            _close(conn)
+
+
+def is_timeout(exc):
+    """
+    True for errors worth retrying on a fresh connection: query
+    timeout (HYT00/HYT01) or a dropped link (08S01).
+    """
+    return (
+        isinstance(exc, driver.Error)
+        and bool(exc.args)
+        and exc.args[0] in ("HYT00", "HYT01", "08S01")
+    )
+
+
+def _close(conn):
+    try:
+        conn.close()
+    except driver.Error:
+        pass
+
+
+@atexit.register
+def close_all():
+    with _lock:
+        while _idle:
+            _close(_idle.pop()[0])
+
+
+# ------------------------------------------------------------
+# Queries
+# ------------------------------------------------------------
+def _execute(conn, sql, params):
+    """
+    Cursor with sql executed on conn; through the recorder or
+    the replayer when FOUNDATION_REPLAY is set (see sql_replay.py).
+    """
+    if sql_replay.MODE == "replay":
+        cursor = sql_replay.ReplayCursor()
+    elif sql_replay.MODE == "record":
+        cursor = sql_replay.RecordingCursor(conn.cursor())
+    else:
+        cursor = conn.cursor()
+
+    if params:
+        cursor.execute(sql, params)
+    else:
+        cursor.execute(sql)
+    return cursor
+
+
+def query(sql, params=None, conn=None):
+    """
+    pd.read_sql equivalent that records telemetry for the query.
+    Uses a pooled connection unless conn is given.
+    """
+    if conn is None and sql_replay.MODE != "replay":
+        with connection() as conn:
+            return query(sql, params, conn)
+
+    started = time.perf_counter()
+    cursor = _execute(conn, sql, params)
+    first_result = time.perf_counter()
+
+    columns = [d[0] for d in cursor.description]
+    rows = [tuple(r) for r in cursor.fetchall()]
+    cursor.close()
+    fetched = time.perf_counter()
+
+    df = pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+
+    log_query(sql, {
+        "server_s": round(first_result - started, 3),
+        "fetch_s": round(fetched - first_result, 3),
+        "rows": len(df),
+        "bytes": int(df.memory_usage(index=False, deep=True).sum()),
+    })
+    return df
+
+
+def iter_batches(sql, params=None, batch_rows=None, dtypes=None):
+    """
+    Stream a result set as DataFrames of at most batch_rows rows,
+    so peak memory is bounded by the batch, not the table.
+
+    Column types are inferred per batch; pass dtypes for columns
+    whose inferred type could change between batches (e.g. an
+    integer column that is NULL in some rows reads as float64 in
+    a full result but as int64 in a batch without NULLs).
+    An empty result still yields one empty frame with the columns.
+    """
+    batch_rows = batch_rows or BATCH_ROWS
+
+    with connection() as conn:
+        started = time.perf_counter()
+        cursor = _execute(conn, sql, params)
+        first_result = time.perf_counter()
+
+        columns = [d[0] for d in cursor.description]
+        rows = 0
+        nbytes = 0
+        batches = 0
+        try:
+            records = cursor.fetchmany(batch_rows)
+            while True:
+                df = pd.DataFrame.from_records(
+                    [tuple(r) for r in records], columns=columns, coerce_float=True
+                )
+                if dtypes:
+                    df = df.astype({c: t for c, t in dtypes.items() if c in df.columns})
+                rows += len(df)
+                nbytes += int(df.memory_usage(index=False, deep=True).sum())
+                batches += 1
+                yield df
+
+                records = cursor.fetchmany(batch_rows)
+                if not records:
+                    break
+        finally:
+            cursor.close()
+
+    log_query(sql, {
+        "server_s": round(first_result - started, 3),
+        "fetch_s": round(time.perf_counter() - first_result, 3),
+        "rows": rows,
+        "bytes": nbytes,
+        "batches": batches,
+    })
+
+
+# ------------------------------------------------------------
+# Telemetry
+# ------------------------------------------------------------
+def sql_fingerprint(sql):
+    """
+    Stable id for a statement: whitespace collapsed and literals
+    replaced, so the same query with other values matches.
+    """
+    text = re.sub(r"--[^\n]*|/\*.*?\*/", " ", sql, flags=re.S)
+    text = re.sub(r"'(?:[^']|'')*'", "?", text)
+    text = re.sub(r"\b\d+(\.\d+)?\b", "?", text)
+    text = " ".join(text.split()).lower()
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12], text
+
+
+def log_query(sql, stats):
+    fingerprint, text = sql_fingerprint(sql)
+    record = {
+        "run_id": os.getenv("PIPELINE_RUN_ID"),
+        "step": pipeline_state.current_step(),
+        "sql_fingerprint": fingerprint,
+        "statement": text[:120],
+        **stats,
+    }
+    with _lock:
+        os.makedirs(os.path.dirname(QUERY_STATS_FILE) or ".", exist_ok=True)
+        with open(QUERY_STATS_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    print(
+        f"   [sql {fingerprint}] {stats['rows']} rows, "
+        f"{stats['server_s'] + stats['fetch_s']:.1f}s"
+    )
@@ -0,0 +1,716 @@
+"""
+Offline stand-in for the Foundation SQL Server.
+
+With FOUNDATION_BACKEND=standin, foundation_db connects through
+this module instead of pyodbc: a local SQLite file (path in
+FOUNDATION_STANDIN_DB) holding the subset of the Foundation schema
+the extraction steps query, filled by generate_standin.py.
+
+The module mimics the slice of pyodbc the pipeline uses (connect,
+Connection.cursor/timeout/close, Cursor.execute/fetchmany/
+fetchall/description, Error). Statements are translated from the
+T-SQL the steps use (NOLOCK hints, DECLARE, ISNULL,
+LEFT, DATEADD/DATEPART/DATEDIFF, CAST AS date, COUNT_BIG,
+CHECKSUM_AGG, string +) and ISO date strings come back as
+date/datetime, as they do from SQL Server, so every step runs
+unchanged.
+
+It is meant for measuring and profiling extraction changes, not for
+checking results against production: checksums, numeric types and
+collation follow SQLite, except for the COLLATED columns, which
+compare as SQL Server's default collation does.
+"""
+import os
+import re
+import sqlite3
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+DEFAULT_PATH = os.getenv("FOUNDATION_STANDIN_DB", "standin/foundation.sqlite")
+
+Error = sqlite3.Error
+
+# ------------------------------------------------------------
+# Schema (Foundation types; SQLite stores dates as ISO text)
+# ------------------------------------------------------------
+SCHEMA = {
+    # Dimensions
+    "accounts": [
+        ("company_no", "int"),
+        ("account_no", "varchar"),
+        ("description", "varchar"),
+        ("debit_credit", "varchar"),
+        ("apply_subdivision", "varchar"),
+        ("inc_exp_type", "varchar"),
+        ("overhead_percent", "decimal"),
+        ("overhead_formula_percent", "decimal"),
+        ("jc_income_expense", "varchar"),
+        ("force_job_costing", "varchar"),
+        ("account_type", "varchar"),
+        ("active_flag", "varchar"),
+    ],
+    "jobs": [
+        ("company_no", "int"),
+        ("job_no", "varchar"),
+        ("description", "varchar"),
+        ("customer_no", "varchar"),
+        ("job_status", "varchar"),
+        ("project_manager_no", "varchar"),
+        ("original_contract", "decimal"),
+        ("original_cost", "decimal"),
+    ],
+    "job_chg": [
+        ("job_no", "varchar"),
+        ("change_no", "int"),
+        ("status", "varchar"),
+        ("tot_income_adj", "decimal"),
+        ("tot_cost_adj", "decimal"),
+    ],
+    "project_managers": [
+        ("project_manager_no", "varchar"),
+        ("description", "varchar"),
+    ],
+    "customers": [
+        ("customer_no", "varchar"),
+        ("name", "varchar"),
+    ],
+    "vendors": [
+        ("vendor_no", "varchar"),
+        ("name", "varchar"),
+    ],
+    "cost_codes": [
+        ("cost_code_no", "varchar"),
+        ("description", "varchar"),
+    ],
+    "cost_classes": [
+        ("cost_class_no", "int"),
+        ("description", "varchar"),
+    ],
+    "earn_types": [
+        ("earn_type_no", "int"),
+        ("description", "varchar"),
+    ],
+    "v_hr_employees": [
+        ("employee_no", "varchar"),
+        ("last_name", "varchar"),
+        ("first_name", "varchar"),
+        ("hourly_or_salary", "varchar"),
+        ("pay_rate", "decimal"),
+    ],
+
+    # General ledger and job cost
+    "gl_history": [
+        ("basic_account_no", "varchar"),
+        ("job_no", "varchar"),
+        ("journal_no", "varchar"),
+        ("transaction_no", "int"),
+        ("line_no", "int"),
+        ("full_account_no", "varchar"),
+        ("amount_db", "decimal"),
+        ("amount_cr", "decimal"),
+        ("description", "varchar"),
+        ("vendor_no", "varchar"),
+        ("voucher_no", "int"),
+        ("audit_number", "int"),
+        ("customer_no", "varchar"),
+        ("ar_invoice_no", "varchar"),
+        ("cash_trx_no", "int"),
+        ("record_status", "varchar"),
+        ("ar_invoice_id", "int"),
+        ("basic_account_id", "int"),
+        ("cash_trx_id", "int"),
+        ("customer_id", "int"),
+        ("full_account_id", "int"),
+        ("job_id", "int"),
+        ("job_trx_id", "int"),
+        ("journal_id", "int"),
+        ("line_id", "int"),
+        ("transaction_id", "int"),
+        ("vendor_id", "int"),
+        ("voucher_id", "int"),
+        ("date_booked", "date"),
+        ("date_posted", "date"),
+    ],
+    "job_history": [
+        ("job_no", "varchar"),
+        ("cost_code_no", "varchar"),
+        ("cost_class_no", "int"),
+        ("cost", "decimal"),
+        ("date_posted", "datetime"),
+    ],
+
+    # Accounts payable
+    "ap_invoice_h": [
+        ("company_no", "int"),
+        ("voucher_no", "int"),
+        ("invoice_no", "varchar"),
+        ("vendor_no", "varchar"),
+        ("invoice_date", "date"),
+        ("transaction_date", "date"),
+        ("invoice_amount", "decimal"),
+        ("retainage_percent", "decimal"),
+        ("retainage_amount", "decimal"),
+        ("job_no", "varchar"),
+    ],
+    "ap_invoice_d": [
+        ("company_no", "int"),
+        ("voucher_no", "int"),
+        ("line_no", "int"),
+        ("job_no", "varchar"),
+        ("cost_code_no", "varchar"),
+        ("cost_class_no", "int"),
+        ("account_no", "varchar"),
+        ("amount", "decimal"),
+    ],
+    "ap_check_vch": [
+        ("voucher_no", "int"),
+        ("check_no", "int"),
+        ("cash_amount", "decimal"),
+        ("void_flag", "int"),
+    ],
+    "ap_pmt_vch": [
+        ("voucher_no", "int"),
+        ("cash_amount", "decimal"),
+    ],
+    "ap_pre_pmt_vch": [
+        ("voucher_no", "int"),
+        ("cash_amount", "decimal"),
+    ],
+    "ap_pre_check_vch": [
+        ("voucher_no", "int"),
+        ("cash_amount", "decimal"),
+    ],
+    "ap_check": [
+        ("company_no", "int"),
+        ("check_no", "int"),
+        ("check_date", "date"),
+        ("check_type", "varchar"),
+        ("source", "varchar"),
+        ("type", "varchar"),
+        ("vendor_no", "varchar"),
+        ("name", "varchar"),
+        ("void_flag", "varchar"),
+    ],
+    "ap_history": [
+        ("company_no", "int"),
+        ("check_no", "int"),
+        ("voucher_no", "int"),
+        ("line_no", "int"),
+        ("cash_amount", "decimal"),
+        ("gl_cash", "int"),
+    ],
+
+    # Accounts receivable
+    "ar_invoice": [
+        ("company_no", "int"),
+        ("invoice_no", "varchar"),
+        ("original_invoice_no", "varchar"),
+        ("customer_no", "varchar"),
+        ("job_no", "varchar"),
+        ("invoice_date", "date"),
+        ("invoice_amount", "decimal"),
+        ("amount_due", "decimal"),
+        ("retainage_amount", "decimal"),
+        ("record_status", "varchar"),
+        ("posted_flag", "varchar"),
+        ("closed_flag", "varchar"),
+        ("invoice_source", "varchar"),
+    ],
+    "ar_cash": [
+        ("company_no", "int"),
+        ("cash_receipt_no", "int"),
+        ("check_no", "varchar"),
+        ("receipt_date", "date"),
+        ("cash_receipt_type", "varchar"),
+        ("cash_receipt_source", "varchar"),
+        ("cash_flag", "varchar"),
+        ("customer_no", "varchar"),
+        ("reversal", "varchar"),
+        ("record_status", "varchar"),
+    ],
+    "ar_cash_invoice": [
+        ("company_no", "int"),
+        ("cash_receipt_no", "int"),
+        ("invoice_no", "varchar"),
+        ("line_no", "int"),
+        ("cash_amount", "decimal"),
+    ],
+
+    # Payroll
+    "v_hr_pay_check_timecards": [
+        ("employee_no", "varchar"),
+        ("job_no", "varchar"),
+        ("cost_code_no", "varchar"),
+        ("cost_class_no", "int"),
+        ("earn_type_no", "int"),
+        ("dated", "date"),
+        ("hours", "decimal"),
+    ],
+    "pending_timecards": [
+        ("employee_no", "varchar"),
+        ("job_no", "varchar"),
+        ("cost_code_no", "varchar"),
+        ("cost_class_no", "int"),
+        ("earn_type_no", "int"),
+        ("dated", "date"),
+        ("hours", "decimal"),
+    ],
+}
+
+# Indexes on the columns the steps filter and join on
+INDEXES = {
+    "gl_history": [["date_posted"], ["date_booked"]],
+    "job_history": [["date_posted"], ["job_no", "cost_code_no", "cost_class_no"]],
+    "ap_invoice_d": [["company_no", "voucher_no", "line_no"]],
+    "ap_check": [["company_no", "check_no"], ["check_date"]],
+    "ap_history": [["company_no", "check_no"]],
+    "ar_invoice": [["company_no", "invoice_no"]],
+    "ar_cash": [["company_no", "cash_receipt_no"], ["receipt_date"]],
+    "ar_cash_invoice": [["company_no", "cash_receipt_no"]],
+    "v_hr_pay_check_timecards": [["dated"]],
+    "pending_timecards": [["dated"]],
+}
+
+# Columns the steps filter with literals in SQL, compared as SQL
+# Server's default collation does: case-insensitive, trailing
+# spaces ignored
+COLLATED = {
+    "gl_history": ["journal_no"],
+}
+
+SQLITE_TYPES = {
+    "varchar": "TEXT",
+    "int": "INTEGER",
+    "decimal": "REAL",
+    "date": "TEXT",
+    "datetime": "TEXT",
+}
+
+
+def _collate(a, b):
+    a, b = a.rstrip(" ").upper(), b.rstrip(" ").upper()
+    return (a > b) - (a < b)
+
+
+def register_collation(conn):
+    conn.create_collation("TSQL", _collate)
+
+
+def create_schema(conn):
+    register_collation(conn)
+    for table, columns in SCHEMA.items():
+        collated = COLLATED.get(table, [])
+        cols = ", ".join(
+            f"{name} {SQLITE_TYPES[kind]}" + (" COLLATE TSQL" if name in collated else "")
+            for name, kind in columns
+        )
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.execute(f"CREATE TABLE {table} ({cols})")
+
+
+def create_indexes(conn):
+    for table, indexes in INDEXES.items():
+        for cols in indexes:
+            name = f"ix_{table}_{'_'.join(cols)}"
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(cols)})")
+
+
+# ------------------------------------------------------------
+# T-SQL translation
+# ------------------------------------------------------------
+_LITERAL = r"'(?:[^']|'')*'"
+
+_COMMENT_RE = re.compile(rf"({_LITERAL})|--[^\n]*|/\*.*?\*/", re.S)
+
+_DECLARE_RE = re.compile(
+    rf"DECLARE\s+@(\w+)\s+\w+(?:\s*\([^)]*\))?\s*=\s*({_LITERAL}|[-\w.]+)\s*;",
+    re.I,
+)
+_NOLOCK_RE = re.compile(r"WITH\s*\(\s*NOLOCK\s*\)", re.I)
+_DATE_PART_RE = re.compile(r"\b(DATEADD|DATEDIFF|DATEPART)\s*\(\s*(\w+)\s*,", re.I)
+_RENAME_RE = re.compile(r"\b(ISNULL|LEFT|RIGHT|COUNT_BIG|LEN)\s*\(", re.I)
+_CONCAT_RE = re.compile(rf"(\+\s*)?({_LITERAL})(\s*\+)?")
+_CAST_RE = re.compile(r"\bCAST\s*\(", re.I)
+
+_RENAMES = {
+    "ISNULL": "IFNULL(",
+    "LEFT": "TSQL_LEFT(",
+    "RIGHT": "TSQL_RIGHT(",
+    "COUNT_BIG": "COUNT(",
+    "LEN": "TSQL_LEN(",
+}
+
+
+def _concat(m):
+    plus_before, literal, plus_after = m.groups()
+    return (
+        ("|| " if plus_before else "")
+        + literal
+        + (" ||" if plus_after else "")
+    )
+
+
+def _rewrite_casts(sql):
+    """
+    CAST(x AS date) / CAST(x AS datetime) -> TSQL_DATE(x) /
+    TSQL_DATETIME(x); SQLite would read the ISO text as a number.
+    """
+    out = []
+    pos = 0
+    for m in _CAST_RE.finditer(sql):
+        if m.start() < pos:
+            continue
+        depth, i = 1, m.end()
+        while depth and i < len(sql):
+            depth += {"(": 1, ")": -1}.get(sql[i], 0)
+            i += 1
+        inner = sql[m.end():i - 1]
+        target = re.match(r"(.*)\bAS\s+(date|datetime2?)\s*$", inner, re.I | re.S)
+        if not target:
+            continue
+        func = "TSQL_DATE" if target.group(2).lower() == "date" else "TSQL_DATETIME"
+        out.append(sql[pos:m.start()])
+        out.append(f"{func}({_rewrite_casts(target.group(1))})")
+        pos = i
+    out.append(sql[pos:])
+    return "".join(out)
+
+
+def translate(sql):
+    """
+    The SQLite statement equivalent to a T-SQL statement of the
+    kind the pipeline issues.
+    """
+    # Comments first, so an apostrophe in one cannot pair up
+    # with a real string literal
+    sql = _COMMENT_RE.sub(lambda m: m.group(1) or " ", sql)
+
+    variables = {}
+
+    def declare(m):
+        variables[m.group(1).lower()] = m.group(2)
+        return ""
+
+    sql = _DECLARE_RE.sub(declare, sql)
+    for name, value in variables.items():
+        sql = re.sub(rf"@{name}\b", value, sql, flags=re.I)
+
+    sql = _NOLOCK_RE.sub("", sql)
+    sql = _DATE_PART_RE.sub(lambda m: f"TSQL_{m.group(1).upper()}('{m.group(2).lower()}',", sql)
+    sql = _RENAME_RE.sub(lambda m: _RENAMES[m.group(1).upper()], sql)
+    sql = _CONCAT_RE.sub(_concat, sql)
+    return _rewrite_casts(sql)
+
+
+# ------------------------------------------------------------
+# T-SQL functions
+# ------------------------------------------------------------
+def _parse(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    return datetime.fromisoformat(str(value))
+
+
+def _format(value, like):
+    """
+    ISO text for value, date-only when the input was date-only.
+    """
+    if isinstance(like, str) and len(like) == 10:
+        return value.date().isoformat()
+    return value.isoformat(sep=" ")
+
+
+def _add_months(d, n):
+    i = d.year * 12 + d.month - 1 + n
+    year, month = divmod(i, 12)
+    month += 1
+    first_next = date(year + (month == 12), month % 12 + 1, 1)
+    day = min(d.day, (first_next - timedelta(days=1)).day)
+    return d.replace(year=year, month=month, day=day)
+
+
+def _dateadd(part, n, value):
+    d = _parse(value)
+    if d is None or n is None:
+        return None
+    n = int(n)
+    if part in ("day", "dd", "d", "dayofyear", "dy", "y", "weekday", "dw"):
+        d += timedelta(days=n)
+    elif part in ("week", "wk", "ww"):
+        d += timedelta(weeks=n)
+    elif part in ("month", "mm", "m"):
+        d = _add_months(d, n)
+    elif part in ("quarter", "qq", "q"):
+        d = _add_months(d, 3 * n)
+    elif part in ("year", "yy", "yyyy"):
+        d = _add_months(d, 12 * n)
+    elif part in ("hour", "hh"):
+        d += timedelta(hours=n)
+    else:
+        raise ValueError(f"DATEADD part not supported by the stand-in: {part}")
+    return _format(d, value)
+
+
+def _datepart(part, value):
+    d = _parse(value)
+    if d is None:
+        return None
+    if part in ("year", "yy", "yyyy"):
+        return d.year
+    if part in ("quarter", "qq", "q"):
+        return (d.month - 1) // 3 + 1
+    if part in ("month", "mm", "m"):
+        return d.month
+    if part in ("day", "dd", "d"):
+        return d.day
+    if part in ("dayofyear", "dy", "y"):
+        return d.timetuple().tm_yday
+    if part in ("weekday", "dw"):
+        # SET DATEFIRST 7 (the default): Sunday = 1
+        return d.isoweekday() % 7 + 1
+    if part in ("hour", "hh"):
+        return d.hour
+    raise ValueError(f"DATEPART part not supported by the stand-in: {part}")
+
+
+def _datediff(part, start, end):
+    a, b = _parse(start), _parse(end)
+    if a is None or b is None:
+        return None
+    if part in ("day", "dd", "d"):
+        return (b.date() - a.date()).days
+    if part in ("week", "wk", "ww"):
+        # Sunday-based week boundaries crossed
+        return ((b.date() - a.date()).days + a.isoweekday() % 7) // 7
+    if part in ("month", "mm", "m"):
+        return (b.year - a.year) * 12 + b.month - a.month
+    if part in ("quarter", "qq", "q"):
+        return (b.year - a.year) * 4 + (b.month - 1) // 3 - (a.month - 1) // 3
+    if part in ("year", "yy", "yyyy"):
+        return b.year - a.year
+    raise ValueError(f"DATEDIFF part not supported by the stand-in: {part}")
+
+
+def _to_date(value):
+    d = _parse(value)
+    return None if d is None else d.date().isoformat()
+
+
+def _to_datetime(value):
+    d = _parse(value)
+    return None if d is None else d.isoformat(sep=" ")
+
+
+def _datefromparts(year, month, day):
+    if None in (year, month, day):
+        return None
+    return date(int(year), int(month), int(day)).isoformat()
+
+
+def _part(name):
+    return lambda value: _datepart(name, value)
+
+
+def _left(value, n):
+    return None if value is None or n is None else str(value)[:max(int(n), 0)]
+
+
+def _right(value, n):
+    if value is None or n is None:
+        return None
+    n = max(int(n), 0)
+    return str(value)[-n:] if n else ""
+
+
+def _len(value):
+    # LEN ignores trailing spaces
+    return None if value is None else len(str(value).rstrip(" "))
+
+
+def _binary_checksum(*values):
+    crc = zlib.crc32(repr(values).encode("utf-8"))
+    return crc - (1 << 32) if crc >= (1 << 31) else crc
+
+
+class _ChecksumAgg:
+    def __init__(self):
+        self.value = None
+
+    def step(self, value):
+        if value is not None:
+            self.value = (self.value or 0) ^ int(value)
+
+    def finalize(self):
+        return self.value
+
+
+FUNCTIONS = {
+    "TSQL_DATEADD": (3, _dateadd),
+    "TSQL_DATEPART": (2, _datepart),
+    "TSQL_DATEDIFF": (3, _datediff),
+    "TSQL_DATE": (1, _to_date),
+    "TSQL_DATETIME": (1, _to_datetime),
+    "DATEFROMPARTS": (3, _datefromparts),
+    "YEAR": (1, _part("year")),
+    "MONTH": (1, _part("month")),
+    "DAY": (1, _part("day")),
+    "TSQL_LEFT": (2, _left),
+    "TSQL_RIGHT": (2, _right),
+    "TSQL_LEN": (1, _len),
+    "GETDATE": (0, lambda: datetime.now().isoformat(sep=" ", timespec="milliseconds")),
+    "BINARY_CHECKSUM": (-1, _binary_checksum),
+}
+
+# Query parameters are bound as ISO text, like the stored dates
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(sep=" "))
+
+
+# ------------------------------------------------------------
+# pyodbc-like connection
+# ------------------------------------------------------------
+_DATE_TEXT = re.compile(r"\d{4}-\d{2}-\d{2}(?: \d{2}:\d{2}:\d{2}(?:\.\d+)?)?$")
+
+
+def _from_text(value):
+    if len(value) == 10:
+        return date.fromisoformat(value)
+    return datetime.fromisoformat(value)
+
+
+class Cursor:
+    def __init__(self, conn):
+        self._conn = conn
+        self._cursor = conn._db.cursor()
+        self._date_cols = {}
+        self._elapsed = 0.0
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @contextmanager
+    def _running(self):
+        """
+        SQLite evaluates a statement as its rows are fetched: the
+        time spent in execute and in every fetch since counts
+        against the connection's timeout (the caller's time
+        between fetches does not).
+        """
+        self._conn._started = time.monotonic() - self._elapsed
+        try:
+            yield
+        finally:
+            self._elapsed = time.monotonic() - self._conn._started
+            self._conn._started = None
+
+    def execute(self, sql, params=None):
+        self._date_cols = {}
+        self._elapsed = 0.0
+        with self._running():
+            if params:
+                self._cursor.execute(translate(sql), list(params))
+            else:
+                self._cursor.execute(translate(sql))
+        return self
+
+    def _convert(self, rows):
+        """
+        Date columns (recognised from their first non-NULL value)
+        come back as date/datetime instead of ISO text.
+        """
+        if not rows:
+            return rows
+        for i in range(len(rows[0])):
+            if i in self._date_cols:
+                continue
+            for row in rows:
+                if row[i] is not None:
+                    value = row[i]
+                    self._date_cols[i] = isinstance(value, str) and bool(_DATE_TEXT.match(value))
+                    break
+
+        cols = [i for i, is_date in self._date_cols.items() if is_date]
+        if not cols:
+            return rows
+        out = []
+        for row in rows:
+            row = list(row)
+            for i in cols:
+                if row[i] is not None:
+                    row[i] = _from_text(row[i])
+            out.append(row)
+        return out
+
+    def fetchmany(self, size):
+        with self._running():
+            rows = self._cursor.fetchmany(size)
+        return self._convert(rows)
+
+    def fetchall(self):
+        with self._running():
+            rows = self._cursor.fetchall()
+        return self._convert(rows)
+
+    def close(self):
+        self._cursor.close()
+
+
+class Connection:
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise Error(
+                f"Stand-in database {path} not found; "
+                f"create it with scripts/generate_standin.py"
+            )
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        # dbo.<table> resolves to the same tables as <table>
+        self._db.execute("ATTACH DATABASE ? AS dbo", (path,))
+        self._started = None
+        self.timeout = 0
+
+        for name, (nargs, func) in FUNCTIONS.items():
+            self._db.create_function(name, nargs, func, deterministic=name != "GETDATE")
+        self._db.create_aggregate("CHECKSUM_AGG", 1, _ChecksumAgg)
+        register_collation(self._db)
+
+        # Query timeout, like pyodbc's Connection.timeout
+        self._db.set_progress_handler(self._check_timeout, 100_000)
+
+        # INFORMATION_SCHEMA.COLUMNS for the tables in the file
+        self._db.execute("ATTACH DATABASE ':memory:' AS INFORMATION_SCHEMA")
+        self._db.execute(
+            "CREATE TABLE INFORMATION_SCHEMA.COLUMNS ("
+            "TABLE_SCHEMA TEXT, TABLE_NAME TEXT, COLUMN_NAME TEXT, "
+            "ORDINAL_POSITION INTEGER, DATA_TYPE TEXT)"
+        )
+        tables = [
+            r[0] for r in self._db.execute("SELECT name FROM main.sqlite_master WHERE type = 'table'")
+        ]
+        for table in tables:
+            kinds = dict(SCHEMA.get(table, []))
+            columns = self._db.execute(f"PRAGMA main.table_info({table})").fetchall()
+            self._db.executemany(
+                "INSERT INTO INFORMATION_SCHEMA.COLUMNS VALUES ('dbo', ?, ?, ?, ?)",
+                [(table, c[1], c[0] + 1, kinds.get(c[1], c[2].lower())) for c in columns],
+            )
+
+    def _check_timeout(self):
+        started = self._started
+        return bool(self.timeout and started and time.monotonic() - started > self.timeout)
+
+    def cursor(self):
+        return Cursor(self)
+
+    def close(self):
+        self._db.close()
+
+
+def connect(path=None, **kwargs):
+    return Connection(path or DEFAULT_PATH)
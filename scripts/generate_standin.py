@@ -0,0 +1,707 @@
+"""
+Build the offline Foundation stand-in database.
+
+    python scripts/generate_standin.py --scale 10
+    FOUNDATION_BACKEND=standin python scripts/run_all.py
+
+Writes a SQLite file (default FOUNDATION_STANDIN_DB, i.e.
+standin/foundation.sqlite) with every table the extraction steps
+query, filled with synthetic but consistent data: vouchers have
+detail lines, checks pay vouchers line by line, receipts apply to
+invoices of the receipt's customer, timecards and job costs point
+at real jobs, cost codes and cost classes.
+
+--scale 1 reproduces current production volumes (VOLUMES are
+calibrated against the row counts of today's outputs); 10 and 100
+multiply the transactional tables and the entities they reference
+(jobs, vendors, customers, employees). The chart of
+accounts, cost codes, cost classes and earn types keep their size.
+The same --seed always produces the same database. At 1x the file
+is about 130 MB and takes under a minute; 100x is roughly a
+hundred times both.
+
+Run the pipeline against it from a scratch copy of the repo (it
+overwrites data/) with its own PIPELINE_STATE_DIR.
+"""
+import argparse
+import os
+import sqlite3
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import foundation_standin
+import pipeline_state
+
+# ------------------------------------------------------------
+# Configuration
+# ------------------------------------------------------------
+# Rows at --scale 1, calibrated so that 1x produces today's
+# production outputs: about 355k gl_history_raw rows, 37.5k
+# job_actuals rows (job x cost code x cost class pairs) and 4k
+# ap_invoice_summary rows
+VOLUMES = {
+    "jobs": 4_300,
+    "job_chg": 6_000,
+    "project_managers": 40,
+    "customers": 600,
+    "vendors": 3_000,
+    "employees": 150,
+    "gl_history": 355_000,
+    "job_history": 400_000,
+    "job_cost_pairs": 37_900,
+    "ap_vouchers": 20_000,
+    "ar_invoices": 6_500,
+    "timecards": 350_000,
+    "pending_timecards": 3_000,
+}
+
+FIRST_DATE = date(2015, 1, 1)
+
+# Rows generated and inserted per chunk for the large tables
+CHUNK_ROWS = 200_000
+
+COST_CODES = 30
+COST_CLASSES = {
+    1: "Labor",
+    2: "Material",
+    3: "Subcontract",
+    4: "Equipment",
+    5: "Other",
+    6: "Burden",
+    7: "Permits",
+}
+# Detail lines per AP voucher (1, 2, ... 5): most have one
+AP_DETAIL_LINES = [0.95, 0.02, 0.015, 0.01, 0.005]
+# Vouchers paid by check, and by each other payment source
+AP_PAID_SHARE = 0.92
+AP_OTHER_PAYMENTS = {"ap_pmt_vch": 0.02, "ap_pre_pmt_vch": 0.005, "ap_pre_check_vch": 0.01}
+
+EARN_TYPES = [
+    ("Regular", 0.74),
+    ("Overtime", 0.10),
+    ("Double Time", 0.02),
+    ("Holiday", 0.02),
+    ("Vacation", 0.03),
+    ("Sick", 0.02),
+    ("PTO", 0.01),
+    ("Bonus", 0.01),
+    ("Per Diem", 0.02),
+    ("Truck Allowance", 0.01),
+    ("Fringe Reimbursement", 0.01),
+    ("Insurance Overhead", 0.01),
+]
+JOURNALS = ["AP", "AR", "PR", "JC", "GJ", "CR", "CD"]
+
+WORDS = [
+    "North", "South", "Bay", "Valley", "Central", "Harbor", "Summit", "Pacific",
+    "Mission", "Oak", "Cedar", "Pine", "Ridge", "Creek", "Plaza", "Medical",
+    "Campus", "Tower", "Hospital", "School", "Library", "Station", "Center", "Park",
+]
+SCOPES = [
+    "HVAC Retrofit", "AHU Replacement", "Chiller Upgrade", "Tenant Improvement",
+    "Boiler Replacement", "Controls Upgrade", "Service Agreement", "Plumbing Remodel",
+    "Fire Damper Repair", "Exhaust Fan Replacement", "Ductwork Modifications",
+]
+SUFFIXES = ["Inc.", "LLC", "Co.", "Corp.", "Supply", "Services", "Group"]
+FIRST_NAMES = [
+    "Maria", "Jose", "James", "Linda", "Robert", "Sergio", "Ana", "David",
+    "Karen", "Luis", "Michael", "Rosa", "Daniel", "Susan", "Carlos", "Emily",
+]
+LAST_NAMES = [
+    "Garcia", "Smith", "Nguyen", "Lopez", "Johnson", "Terra", "Martinez", "Brown",
+    "Chen", "Davis", "Hernandez", "Wilson", "Patel", "Moore", "Ramirez", "Clark",
+]
+
+
+# ------------------------------------------------------------
+# Helpers
+# ------------------------------------------------------------
+class Generator:
+    def __init__(self, conn, scale, seed):
+        self.conn = conn
+        self.scale = scale
+        self.rng = np.random.default_rng(seed)
+        self.today = np.datetime64(pipeline_state.today(), "D")
+        self.first = np.datetime64(FIRST_DATE, "D")
+
+    def count(self, name):
+        return max(1, int(round(VOLUMES[name] * self.scale)))
+
+    def pick(self, values, n, p=None):
+        values = np.asarray(values)
+        if values.dtype.kind in "OUS":
+            values = values.astype(object)
+        return values[self.rng.choice(len(values), n, p=p)]
+
+    def dates(self, n, start=None, end=None):
+        start = self.first if start is None else start
+        end = self.today if end is None else end
+        span = (end - start).astype(int) + 1
+        return start + self.rng.integers(0, span, n).astype("timedelta64[D]")
+
+    def money(self, n, median, sigma=1.2):
+        return np.round(self.rng.lognormal(np.log(median), sigma, n), 2)
+
+    def names(self, n, words, suffixes):
+        a = self.pick(words, n)
+        b = self.pick(suffixes, n)
+        return np.array([f"{x} {y}" for x, y in zip(a, b)], dtype=object)
+
+    def insert(self, table, df):
+        columns = [name for name, _ in foundation_standin.SCHEMA[table]]
+        df = df.reindex(columns=columns)
+        for col in df.columns:
+            if pd.api.types.is_datetime64_any_dtype(df[col]):
+                df[col] = df[col].dt.strftime("%Y-%m-%d")
+        rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+        marks = ", ".join("?" * len(columns))
+        self.conn.executemany(f"INSERT INTO {table} VALUES ({marks})", rows)
+        return len(df)
+
+
+def as_datetime_text(days):
+    return pd.Series(days).dt.strftime("%Y-%m-%d 00:00:00")
+
+
+# ------------------------------------------------------------
+# Dimensions
+# ------------------------------------------------------------
+def accounts(g):
+    ranges = [
+        (1000, 1099, 12, "Cash", "D"),
+        (1100, 1999, 40, "Current Asset", "D"),
+        (2000, 2999, 35, "Liability", "C"),
+        (3000, 3999, 8, "Equity", "C"),
+        (4000, 4999, 20, "Revenue", "C"),
+        (5000, 5999, 35, "Job Cost", "D"),
+        (6000, 7999, 45, "Overhead", "D"),
+        (8000, 8020, 5, "Other Income", "C"),
+    ]
+    rows = [(1, "Temporary Account", "D")]
+    for lo, hi, n, label, dc in ranges:
+        numbers = np.sort(g.rng.choice(np.arange(lo + 1, hi + 1), n - 1, replace=False))
+        rows.append((lo, f"{label} - Control", dc))
+        rows += [(int(x), f"{label} {x}", dc) for x in numbers]
+    df = pd.DataFrame(rows, columns=["account_no", "description", "debit_credit"])
+    df["account_no"] = df["account_no"].astype(str)
+    df["company_no"] = 1
+    df["apply_subdivision"] = "N"
+    df["inc_exp_type"] = np.where(df["account_no"].astype(int) >= 4000, "I", "")
+    df["overhead_percent"] = 0.0
+    df["overhead_formula_percent"] = 0.0
+    df["jc_income_expense"] = "N"
+    df["force_job_costing"] = np.where(df["account_no"].str[0].isin(["4", "5"]), "Y", "N")
+    df["account_type"] = df["debit_credit"]
+    df["active_flag"] = "Y"
+    g.insert("accounts", df)
+    return df["account_no"].astype(int).to_numpy()
+
+
+def dimensions(g):
+    n_pm = g.count("project_managers")
+    pms = pd.DataFrame({
+        "project_manager_no": [f"{f.upper()}{i}" for i, f in enumerate(g.pick(FIRST_NAMES, n_pm))],
+        "description": [f"{f} {l}" for f, l in zip(g.pick(FIRST_NAMES, n_pm), g.pick(LAST_NAMES, n_pm))],
+    })
+    pms.loc[0, "description"] = "G&A"
+    g.insert("project_managers", pms)
+
+    n_cust = g.count("customers")
+    customers = pd.DataFrame({
+        "customer_no": (np.arange(n_cust) + 100).astype(str),
+        "name": g.names(n_cust, WORDS + LAST_NAMES, SUFFIXES),
+    })
+    g.insert("customers", customers)
+
+    n_vend = g.count("vendors")
+    vendors = pd.DataFrame({
+        "vendor_no": (np.arange(n_vend) + 1000).astype(str),
+        "name": g.names(n_vend, WORDS + LAST_NAMES, SUFFIXES),
+    })
+    g.insert("vendors", vendors)
+
+    n_jobs = g.count("jobs")
+    jobs = pd.DataFrame({
+        "company_no": 1,
+        "job_no": (np.arange(n_jobs) + 1).astype(str),
+        "description": [
+            f"{w} {s}" for w, s in zip(g.pick(WORDS, n_jobs), g.pick(SCOPES, n_jobs))
+        ],
+        "customer_no": g.pick(customers["customer_no"], n_jobs),
+        "job_status": g.pick(["O", "C"], n_jobs, p=[0.2, 0.8]),
+        "project_manager_no": g.pick(pms["project_manager_no"], n_jobs),
+        "original_contract": g.money(n_jobs, 60_000, 1.5),
+    })
+    jobs["original_cost"] = np.round(jobs["original_contract"] * g.rng.uniform(0.6, 0.9, n_jobs), 2)
+    g.insert("jobs", jobs)
+
+    # Production also has a placeholder job and customer with
+    # non-numeric numbers; nothing is posted to them
+    g.insert("customers", pd.DataFrame({"customer_no": ["MISC"], "name": ["Miscellaneous"]}))
+    g.insert("jobs", pd.DataFrame({
+        "company_no": [1],
+        "job_no": ["BUDGET"],
+        "description": ["Budget Placeholder"],
+        "customer_no": ["MISC"],
+        "job_status": ["O"],
+        "project_manager_no": [pms["project_manager_no"].iloc[0]],
+        "original_contract": [0.0],
+        "original_cost": [0.0],
+    }))
+
+    n_chg = g.count("job_chg")
+    income = np.round(g.money(n_chg, 5_000) * g.pick([1, -1], n_chg, p=[0.85, 0.15]), 2)
+    g.insert("job_chg", pd.DataFrame({
+        "job_no": g.pick(jobs["job_no"], n_chg),
+        "change_no": g.rng.integers(1, 40, n_chg),
+        "status": g.pick(["A", "P", "R"], n_chg, p=[0.8, 0.15, 0.05]),
+        "tot_income_adj": income,
+        "tot_cost_adj": np.round(income * g.rng.uniform(0.6, 0.9, n_chg), 2),
+    }))
+
+    g.insert("cost_codes", pd.DataFrame({
+        "cost_code_no": [f"{i:03d}" for i in range(COST_CODES)],
+        "description": [f"Cost Code {i:03d}" for i in range(COST_CODES)],
+    }))
+    g.insert("cost_classes", pd.DataFrame({
+        "cost_class_no": list(COST_CLASSES),
+        "description": list(COST_CLASSES.values()),
+    }))
+    g.insert("earn_types", pd.DataFrame({
+        "earn_type_no": np.arange(len(EARN_TYPES)) + 1,
+        "description": [name for name, _ in EARN_TYPES],
+    }))
+
+    n_emp = g.count("employees")
+    hourly = g.rng.random(n_emp) < 0.8
+    g.insert("v_hr_employees", pd.DataFrame({
+        "employee_no": (np.arange(n_emp) + 1).astype(str),
+        "last_name": g.pick(LAST_NAMES, n_emp),
+        "first_name": g.pick(FIRST_NAMES, n_emp),
+        "hourly_or_salary": np.where(hourly, "H", "S"),
+        "pay_rate": np.where(
+            hourly,
+            np.round(g.rng.uniform(25, 85, n_emp), 2),
+            np.round(g.rng.uniform(1_500, 4_500, n_emp), 2),
+        ),
+    }))
+
+    return {
+        "jobs": jobs,
+        "customers": customers["customer_no"].to_numpy(),
+        "vendors": vendors,
+        "employees": n_emp,
+    }
+
+
+# ------------------------------------------------------------
+# General ledger and job cost
+# ------------------------------------------------------------
+def gl_history(g, account_nos, jobs, vendor_nos):
+    total = g.count("gl_history")
+    weights = np.select(
+        [
+            account_nos < 1000,
+            account_nos < 1100,
+            account_nos < 3000,
+            account_nos < 4000,
+            account_nos < 5000,
+            account_nos < 6000,
+        ],
+        [0.1, 6.0, 1.5, 0.3, 4.0, 3.0],
+        default=0.8,
+    )
+    weights = weights / weights.sum()
+
+    transaction_no = 0
+    for start in range(0, total, CHUNK_ROWS):
+        n = min(CHUNK_ROWS, total - start)
+        account = g.rng.choice(account_nos, n, p=weights)
+        is_job = (account >= 4000) & (account < 6000) & (g.rng.random(n) < 0.92)
+        job = np.where(is_job, g.pick(jobs["job_no"], n), None)
+
+        amount = g.money(n, 1_200, 1.6)
+        credit_side = np.where(
+            (account >= 4000) & (account < 5000),
+            g.rng.random(n) < 0.93,
+            np.where(account >= 5000, g.rng.random(n) < 0.07, g.rng.random(n) < 0.5),
+        )
+        posted = g.dates(n)
+        booked = pd.Series(posted)
+        late = g.rng.random(n) < 0.05
+        booked[late] = booked[late] - pd.to_timedelta(g.rng.integers(1, 20, late.sum()), unit="D")
+        booked[g.rng.random(n) < 0.15] = pd.NaT
+
+        journal = g.pick(JOURNALS, n)
+        closing = g.rng.random(n) < 0.004
+        journal[closing] = "CLS"
+
+        lines = g.rng.integers(1, 6, n)
+        trx = transaction_no + np.cumsum(lines == 1)
+        transaction_no = int(trx[-1]) + 1
+
+        def ids():
+            return g.rng.integers(1, 2_000_000, n)
+
+        df = pd.DataFrame({
+            "basic_account_no": account.astype(str),
+            "job_no": job,
+            "journal_no": journal,
+            "transaction_no": trx,
+            "line_no": lines,
+            "full_account_no": [
+                f"{a}-{j or '00'}" for a, j in zip(account, job)
+            ],
+            "amount_db": np.where(credit_side, 0.0, amount),
+            "amount_cr": np.where(credit_side, amount, 0.0),
+            "description": g.pick(SCOPES + ["Payroll", "Materials", "Billing", "Transfer"], n),
+            "vendor_no": np.where(journal == "AP", g.pick(vendor_nos, n), None),
+            "voucher_no": np.where(journal == "AP", g.rng.integers(1, 100_000, n), None),
+            "audit_number": g.rng.integers(1, 500_000, n),
+            "customer_no": None,
+            "ar_invoice_no": None,
+            "cash_trx_no": None,
+            "record_status": "A",
+            "ar_invoice_id": ids(),
+            "basic_account_id": ids(),
+            "cash_trx_id": ids(),
+            "customer_id": ids(),
+            "full_account_id": ids(),
+            "job_id": ids(),
+            "job_trx_id": ids(),
+            "journal_id": ids(),
+            "line_id": ids(),
+            "transaction_id": ids(),
+            "vendor_id": ids(),
+            "voucher_id": ids(),
+            "date_booked": booked,
+            "date_posted": posted,
+        })
+        g.insert("gl_history", df)
+
+
+def job_history(g, jobs):
+    # Each job charges a handful of cost code x cost class pairs,
+    # not all of them: pairs are drawn per job (distinct within
+    # the job), then every posting picks a pair
+    n_pairs = g.count("job_cost_pairs")
+    n_combos = COST_CODES * len(COST_CLASSES)
+    pair_job = np.sort(g.rng.integers(0, len(jobs), n_pairs))
+    rank = np.arange(n_pairs) - np.searchsorted(pair_job, pair_job)
+    # A stride coprime with n_combos visits every combination once
+    combo = (g.rng.integers(0, n_combos, len(jobs))[pair_job] + rank * 11) % n_combos
+    pair_code = np.array([f"{i:03d}" for i in combo // len(COST_CLASSES)], dtype=object)
+    pair_class = (combo % len(COST_CLASSES) + 1).astype(float)
+    pair_class[g.rng.random(n_pairs) < 0.01] = np.nan
+
+    total = g.count("job_history")
+    for start in range(0, total, CHUNK_ROWS):
+        n = min(CHUNK_ROWS, total - start)
+        pair = g.rng.integers(0, n_pairs, n)
+        cost = g.money(n, 700, 1.5) * np.where(g.rng.random(n) < 0.03, -1, 1)
+        g.insert("job_history", pd.DataFrame({
+            "job_no": jobs["job_no"].to_numpy()[pair_job[pair]],
+            "cost_code_no": pair_code[pair],
+            "cost_class_no": pd.array(pair_class[pair], dtype="Int64"),
+            "cost": np.round(cost, 2),
+            "date_posted": as_datetime_text(g.dates(n)),
+        }))
+
+
+# ------------------------------------------------------------
+# Accounts payable
+# ------------------------------------------------------------
+def accounts_payable(g, account_nos, jobs, vendors):
+    n = g.count("ap_vouchers")
+    voucher = np.arange(n) + 1
+    vendor_idx = g.rng.integers(0, len(vendors), n)
+    invoice_date = g.dates(n)
+    amount = g.money(n, 1_800, 1.4)
+    retainage_pct = g.pick([0.0, 5.0, 10.0], n, p=[0.85, 0.05, 0.10]).astype(float)
+    job = np.where(g.rng.random(n) < 0.75, g.pick(jobs["job_no"], n), None)
+    # Vendors' own invoice numbers: mostly digits, some not
+    invoice_no = np.array([f"{x:06d}" for x in g.rng.integers(1, 999_999, n)], dtype=object)
+    suffixed = g.rng.random(n) < 0.05
+    invoice_no[suffixed] = [f"{x}-IN" for x in invoice_no[suffixed]]
+
+    g.insert("ap_invoice_h", pd.DataFrame({
+        "company_no": 1,
+        "voucher_no": voucher,
+        "invoice_no": invoice_no,
+        "vendor_no": vendors["vendor_no"].to_numpy()[vendor_idx],
+        "invoice_date": invoice_date,
+        "transaction_date": invoice_date + g.rng.integers(0, 30, n).astype("timedelta64[D]"),
+        "invoice_amount": amount,
+        "retainage_percent": retainage_pct,
+        "retainage_amount": np.round(amount * retainage_pct / 100, 2),
+        "job_no": job,
+    }))
+
+    # Detail lines: the voucher amount split over 1-5 lines
+    lines = g.rng.choice(len(AP_DETAIL_LINES), n, p=AP_DETAIL_LINES) + 1
+    d_voucher = np.repeat(voucher, lines)
+    d_line = np.concatenate([np.arange(k) + 1 for k in lines])
+    share = g.rng.random(len(d_voucher)) + 0.1
+    share = share / np.bincount(d_voucher, weights=share)[d_voucher]
+    d_amount = np.round(np.repeat(amount, lines) * share, 2)
+    # Overhead vouchers still charge some lines to a job
+    d_job = np.repeat(job, lines)
+    charged = pd.isna(d_job) & (g.rng.random(len(d_job)) < 0.3)
+    d_job[charged] = g.pick(jobs["job_no"], int(charged.sum()))
+    # Job lines post to job cost accounts, the others to overhead
+    job_cost = account_nos[(account_nos >= 5000) & (account_nos < 6000)]
+    overhead = account_nos[(account_nos >= 6000) & (account_nos < 8000)]
+    d_account = np.where(
+        pd.isna(d_job), g.pick(overhead, len(d_job)), g.pick(job_cost, len(d_job))
+    ).astype(str)
+    g.insert("ap_invoice_d", pd.DataFrame({
+        "company_no": 1,
+        "voucher_no": d_voucher,
+        "line_no": d_line,
+        "job_no": d_job,
+        "cost_code_no": [f"{i:03d}" for i in g.rng.integers(0, COST_CODES, len(d_voucher))],
+        "cost_class_no": g.rng.integers(1, len(COST_CLASSES) + 1, len(d_voucher)),
+        "account_no": d_account,
+        "amount": d_amount,
+    }))
+
+    # Checks: paid vouchers grouped per vendor, 1-3 per check
+    paid = g.rng.random(n) < AP_PAID_SHARE
+    order = np.lexsort((invoice_date[paid], vendor_idx[paid]))
+    p_voucher = voucher[paid][order]
+    p_vendor = vendor_idx[paid][order]
+    p_date = invoice_date[paid][order]
+    new_check = np.ones(len(p_voucher), dtype=bool)
+    new_check[1:] = (p_vendor[1:] != p_vendor[:-1]) | (g.rng.random(len(p_voucher) - 1) < 0.55)
+    check_idx = np.cumsum(new_check) - 1
+    n_checks = int(check_idx[-1]) + 1 if len(check_idx) else 0
+    check_no = 10_000 + np.arange(n_checks)
+
+    check_vendor = p_vendor[new_check]
+    last_date = pd.Series(p_date).groupby(check_idx).max().to_numpy()
+    check_date = np.minimum(
+        last_date + g.rng.integers(5, 45, n_checks).astype("timedelta64[D]"), g.today
+    )
+    void = g.rng.random(n_checks) < 0.02
+    g.insert("ap_check", pd.DataFrame({
+        "company_no": 1,
+        "check_no": check_no,
+        "check_date": check_date,
+        "check_type": g.pick(["C", "E"], n_checks, p=[0.7, 0.3]),
+        "source": "AP",
+        "type": g.pick(["R", "M"], n_checks, p=[0.9, 0.1]),
+        "vendor_no": vendors["vendor_no"].to_numpy()[check_vendor],
+        "name": vendors["name"].to_numpy()[check_vendor],
+        "void_flag": np.where(void, "Y", "N"),
+    }))
+
+    # One ap_history row per paid detail line
+    line_check = pd.Series(check_no[check_idx], index=p_voucher)
+    d_paid = np.isin(d_voucher, p_voucher)
+    h_voucher = d_voucher[d_paid]
+    g.insert("ap_history", pd.DataFrame({
+        "company_no": 1,
+        "check_no": line_check.loc[h_voucher].to_numpy(),
+        "voucher_no": h_voucher,
+        "line_no": d_line[d_paid],
+        "cash_amount": d_amount[d_paid],
+        "gl_cash": np.where(g.rng.random(len(h_voucher)) < 0.95, 1001, 2010),
+    }))
+
+    v_void = pd.Series(void[check_idx], index=p_voucher)
+    g.insert("ap_check_vch", pd.DataFrame({
+        "voucher_no": p_voucher,
+        "check_no": check_no[check_idx],
+        "cash_amount": pd.Series(amount, index=voucher).loc[p_voucher].to_numpy(),
+        "void_flag": v_void.to_numpy().astype(int),
+    }))
+
+    for table, share in AP_OTHER_PAYMENTS.items():
+        pick = g.rng.random(n) < share
+        g.insert(table, pd.DataFrame({
+            "voucher_no": voucher[pick],
+            "cash_amount": np.round(amount[pick] * g.rng.uniform(0.1, 1.0, pick.sum()), 2),
+        }))
+
+
+# ------------------------------------------------------------
+# Accounts receivable
+# ------------------------------------------------------------
+def accounts_receivable(g, jobs):
+    n = g.count("ar_invoices")
+    invoice_no = (np.arange(n) + 1).astype(str)
+    job_idx = g.rng.integers(0, len(jobs), n)
+    invoice_date = np.sort(g.dates(n))
+    amount = g.money(n, 25_000, 1.3)
+    retainage = np.where(g.rng.random(n) < 0.4, np.round(amount * 0.1, 2), 0.0)
+
+    # A few invoices are revisions of an earlier one
+    original = invoice_no.astype(object).copy()
+    revision = np.flatnonzero(g.rng.random(n) < 0.03)
+    revision = revision[revision > 0]
+    original[revision] = invoice_no[g.rng.integers(0, revision)]
+
+    recent = invoice_date >= g.today - np.timedelta64(180, "D")
+    closed = ~recent & (g.rng.random(n) < 0.97)
+    g.insert("ar_invoice", pd.DataFrame({
+        "company_no": 1,
+        "invoice_no": invoice_no,
+        "original_invoice_no": original,
+        "customer_no": jobs["customer_no"].to_numpy()[job_idx],
+        "job_no": jobs["job_no"].to_numpy()[job_idx],
+        "invoice_date": invoice_date,
+        "invoice_amount": amount,
+        "amount_due": np.where(closed, 0.0, amount),
+        "retainage_amount": retainage,
+        "record_status": "A",
+        "posted_flag": np.where(g.rng.random(n) < 0.97, "Y", "N"),
+        "closed_flag": np.where(closed, "Y", "N"),
+        "invoice_source": np.where(g.rng.random(n) < 0.95, "O", "R"),
+    }))
+
+    # Receipts: paid invoices grouped per customer, 1-3 per receipt
+    paid = closed | (g.rng.random(n) < 0.4)
+    customer = jobs["customer_no"].to_numpy()[job_idx][paid]
+    order = np.lexsort((invoice_date[paid], customer))
+    p_invoice = invoice_no[paid][order]
+    p_customer = customer[order]
+    p_date = invoice_date[paid][order]
+    p_amount = (amount - np.where(g.rng.random(n) < 0.5, retainage, 0.0))[paid][order]
+
+    new_receipt = np.ones(len(p_invoice), dtype=bool)
+    new_receipt[1:] = (p_customer[1:] != p_customer[:-1]) | (g.rng.random(len(p_invoice) - 1) < 0.6)
+    receipt_idx = np.cumsum(new_receipt) - 1
+    n_receipts = int(receipt_idx[-1]) + 1 if len(receipt_idx) else 0
+    receipt_no = np.arange(n_receipts) + 1
+    last_date = pd.Series(p_date).groupby(receipt_idx).max().to_numpy()
+    # Customer check numbers, or an EFT reference
+    check_no = g.rng.integers(1_000, 999_999, n_receipts).astype(str).astype(object)
+    eft = g.rng.random(n_receipts) < 0.2
+    check_no[eft] = [f"EFT{x:0>8}" for x in check_no[eft]]
+
+    g.insert("ar_cash", pd.DataFrame({
+        "company_no": 1,
+        "cash_receipt_no": receipt_no,
+        "check_no": check_no,
+        "receipt_date": np.minimum(
+            last_date + g.rng.integers(15, 75, n_receipts).astype("timedelta64[D]"), g.today
+        ),
+        "cash_receipt_type": "I",
+        "cash_receipt_source": "C",
+        "cash_flag": np.where(g.rng.random(n_receipts) < 0.05, "Y", None),
+        "customer_no": p_customer[new_receipt],
+        "reversal": np.where(g.rng.random(n_receipts) < 0.01, "Y", "N"),
+        "record_status": "A",
+    }))
+    g.insert("ar_cash_invoice", pd.DataFrame({
+        "company_no": 1,
+        "cash_receipt_no": receipt_no[receipt_idx],
+        "invoice_no": p_invoice,
+        "line_no": 1,
+        "cash_amount": np.round(p_amount, 2),
+    }))
+
+
+# ------------------------------------------------------------
+# Payroll
+# ------------------------------------------------------------
+def timecards(g, jobs, n_employees):
+    earn_p = np.array([p for _, p in EARN_TYPES])
+    earn_p = earn_p / earn_p.sum()
+
+    def cards(n, start=None, pending=False):
+        dated = g.dates(n, start=start)
+        # Mostly weekdays
+        weekend = pd.Series(dated).dt.dayofweek.to_numpy() >= 5
+        dated[weekend] -= np.timedelta64(2, "D")
+        return pd.DataFrame({
+            "employee_no": (g.rng.integers(0, n_employees, n) + 1).astype(str),
+            "job_no": g.pick(jobs["job_no"], n),
+            "cost_code_no": [f"{i:03d}" for i in g.rng.integers(0, COST_CODES, n)],
+            "cost_class_no": None if pending else np.ones(n, dtype=int),
+            "earn_type_no": g.rng.choice(len(EARN_TYPES), n, p=earn_p) + 1,
+            "dated": dated,
+            "hours": np.round(g.rng.uniform(0.5, 10, n) * 4) / 4,
+        })
+
+    total = g.count("timecards")
+    for start in range(0, total, CHUNK_ROWS):
+        g.insert("v_hr_pay_check_timecards", cards(min(CHUNK_ROWS, total - start)))
+
+    g.insert(
+        "pending_timecards",
+        cards(g.count("pending_timecards"), start=g.today - np.timedelta64(20, "D"), pending=True),
+    )
+
+
+# ------------------------------------------------------------
+# Main
+# ------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Build the offline Foundation stand-in database")
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1,
+        help="Volume multiplier over current production (1, 10, 100)",
+    )
+    parser.add_argument(
+        "--out",
+        default=foundation_standin.DEFAULT_PATH,
+        help="SQLite file to write (default: FOUNDATION_STANDIN_DB)",
+    )
+    parser.add_argument("--seed", type=int, default=5587)
+    args = parser.parse_args()
+
+    print(f"Building stand-in database {args.out} at {args.scale:g}x ...")
+    started = time.perf_counter()
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    tmp = f"{args.out}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+    conn = sqlite3.connect(tmp)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    foundation_standin.create_schema(conn)
+
+    g = Generator(conn, args.scale, args.seed)
+    account_nos = accounts(g)
+    dims = dimensions(g)
+    jobs = dims["jobs"]
+    vendor_nos = dims["vendors"]["vendor_no"].to_numpy()
+
+    for label, build in (
+        ("gl_history", lambda: gl_history(g, account_nos, jobs, vendor_nos)),
+        ("job_history", lambda: job_history(g, jobs)),
+        ("accounts payable", lambda: accounts_payable(g, account_nos, jobs, dims["vendors"])),
+        ("accounts receivable", lambda: accounts_receivable(g, jobs)),
+        ("timecards", lambda: timecards(g, jobs, dims["employees"])),
+    ):
+        t0 = time.perf_counter()
+        build()
+        conn.commit()
+        print(f"→ {label} ({time.perf_counter() - t0:.1f}s)")
+
+    foundation_standin.create_indexes(conn)
+    conn.execute("ANALYZE")
+    conn.commit()
+
+    counts = {
+        table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in foundation_standin.SCHEMA
+    }
+    conn.close()
+    os.replace(tmp, args.out)
+
+    for table, rows in counts.items():
+        print(f"   {table:<26} {rows:>12,}")
+    print(f"Wrote {args.out} ({time.perf_counter() - started:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+GL balances as of any month.
+
+04 stores the account x month matrix of gl_history's accounts
+densely as the typed dataset data/gl_balances/: one row per account
+and month (every month in the GL, account by account in month
+order) with the month's activity, the running balance carried
+forward (CumToDate) and the account's last month with activity so
+far (LastActivity). gl_history.csv is the rollup of it as of the
+last complete month; history() computes the same rollup as of any
+other month from the stored matrix, one lookup per account and
+column, and snapshots() a batch of them:
+
+    python scripts/gl_balances.py --month 2025-06
+    python scripts/gl_balances.py --last 24 --out data/gl_history_snapshots.csv
+
+A snapshot as of month M is gl_history.csv as a run during month
+M + 1 would write it from the GL as it is now (later postings to
+earlier months included).
+"""
+import argparse
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import artifacts
+import datasets
+import gl_matrix
+import pipeline_state
+import schemas
+
+DATASET = "gl_balances"
+SNAPSHOTS_FILE = "data/gl_history_snapshots.csv"
+
+# Month boundaries are in Pacific time (as in 04)
+TIMEZONE = "America/Los_Angeles"
+
+# Income statement accounts (NetIncomeYTD_* columns)
+INCOME_ACCOUNTS = (4000, 8020)
+
+
+# ------------------------------------------------------------
+# Periods
+# ------------------------------------------------------------
+def month_start(day, offset=0):
+    return (pd.Timestamp(day).replace(day=1) + pd.DateOffset(months=offset)).date()
+
+
+def last_complete_month(day):
+    """
+    Start of the last complete month on day (the month before).
+    """
+    return month_start(day, -1)
+
+
+def history_periods(last_complete):
+    """
+    The gl_history columns (see gl_matrix.rollup) as of
+    last_complete, a month start.
+    """
+    previous = month_start(last_complete, -1)
+    second_previous = month_start(last_complete, -2)
+    year_start = date(last_complete.year, 1, 1)
+
+    return [
+        {"name": "CumToLastComplete", "measure": "cumulative", "end": last_complete},
+        {"name": "CumToPrior", "measure": "cumulative", "end": previous},
+        {"name": "CumToSecondPrior", "measure": "cumulative", "end": second_previous},
+        {
+            "name": "NetIncomeYTD_Prior", "measure": "ytd",
+            "start": year_start, "end": previous,
+            "accounts": INCOME_ACCOUNTS,
+        },
+        {
+            "name": "NetIncomeYTD_LastComplete", "measure": "ytd",
+            "start": year_start, "end": last_complete,
+            "accounts": INCOME_ACCOUNTS,
+        },
+        {"name": "LastCompleteMonthActivity", "measure": "activity", "end": last_complete},
+        {"name": "PriorMonthActivity", "measure": "activity", "end": previous},
+    ]
+
+
+# ------------------------------------------------------------
+# Stored matrix
+# ------------------------------------------------------------
+def to_frame(matrix):
+    """
+    A dense matrix (see gl_matrix.dense) as the rows of the
+    dataset.
+    """
+    accounts, months, amount, cum, last = matrix
+    n, m = amount.shape
+    df = accounts.loc[accounts.index.repeat(m)].reset_index(drop=True)
+    df["MonthStart"] = np.tile(months, n)
+    df["MonthlyAmount"] = amount.ravel()
+    df["CumToDate"] = cum.ravel()
+    df["LastActivity"] = np.where(
+        last >= 0, months[np.maximum(last, 0)], np.datetime64("NaT")
+    ).ravel()
+    return df
+
+
+def publish(matrix):
+    return datasets.write(DATASET, to_frame(matrix), schemas.get(DATASET))
+
+
+def load(directory=None):
+    """
+    The stored matrix, dense (as gl_matrix.dense returns it).
+    """
+    df = datasets.read(DATASET, directory=directory)
+    ms = df["MonthStart"].to_numpy(dtype="datetime64[D]")
+    months = np.unique(ms)
+
+    accounts = df[gl_matrix.KEYS].iloc[::max(len(months), 1)].reset_index(drop=True)
+    shape = (len(accounts), len(months))
+    if len(df) != shape[0] * shape[1] or (ms.reshape(shape) != months).any():
+        raise ValueError(f"{datasets.path(DATASET)} is not one row per account and month")
+
+    last_activity = df["LastActivity"].to_numpy(dtype="datetime64[D]")
+    last = np.where(
+        np.isnat(last_activity), -1, np.searchsorted(months, last_activity)
+    ).reshape(shape)
+    return (
+        accounts,
+        months,
+        df["MonthlyAmount"].to_numpy().reshape(shape),
+        df["CumToDate"].to_numpy().reshape(shape),
+        last,
+    )
+
+
+# ------------------------------------------------------------
+# As-of rollups
+# ------------------------------------------------------------
+def history(matrix, last_complete):
+    """
+    The gl_history rows as of last_complete (a month start).
+    """
+    periods = history_periods(last_complete)
+    final = gl_matrix.rollup_dense(matrix, periods)
+    final["Account_Num"] = final["Account_Num"].astype("int64")
+
+    # FINAL ROUNDING (critical for reporting parity)
+    for col in [p["name"] for p in periods]:
+        final[col] = pd.to_numeric(final[col], errors="coerce").round(2)
+
+    return final.sort_values("Account_Num").reset_index(drop=True)
+
+
+def snapshots(matrix, months):
+    """
+    history() as of each of months, stacked, with the month-end
+    each is as of in an AsOf column.
+    """
+    frames = []
+    for month in months:
+        df = history(matrix, month)
+        df.insert(0, "AsOf", (pd.Timestamp(month) + pd.offsets.MonthEnd(0)).date())
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=list(schemas.get("gl_history_snapshots")))
+    return pd.concat(frames, ignore_index=True)
+
+
+# ------------------------------------------------------------
+# Main
+# ------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(
+        description=f"gl_history as of past month-ends, from {datasets.path(DATASET)}/"
+    )
+    parser.add_argument(
+        "--month",
+        type=lambda s: date.fromisoformat(f"{s}-01"),
+        action="append",
+        help="as of the end of this month (YYYY-MM), repeatable",
+    )
+    parser.add_argument(
+        "--last", type=int, help="as of each of the last N month-ends (the latest complete month first)"
+    )
+    parser.add_argument("--out", default=SNAPSHOTS_FILE)
+    args = parser.parse_args()
+
+    months = list(args.month or [])
+    if args.last:
+        latest = last_complete_month(pipeline_state.today(TIMEZONE))
+        months += [month_start(latest, -i) for i in range(args.last)]
+    if not months:
+        parser.error("give --month and/or --last")
+
+    df = snapshots(load(), months)
+    artifacts.write_csv("gl_history_snapshots", df, args.out)
+    print(f"Wrote {args.out} ({len(months)} month-ends, {len(df)} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+The GL account x month matrix.
+
+Every GL output is derived from the same numbers: net activity
+(Debit - Credit, NULL amounts as zero, CLS journals excluded) per
+account and month. build() computes them in one pass over the raw
+GL dataset; 04 publishes the result as the typed dataset
+data/gl_monthly/ and derives gl_history.csv and gl_history_all.csv
+from it, so the raw lines are loaded and grouped once.
+
+The matrix is stored long: one row per account and month with
+activity, in (Account, MonthStart) order. Each MonthlyAmount sums
+the account's lines for the month in raw GL order, exactly as
+grouping the raw lines directly does, so outputs derived from it
+match to the bit.
+
+rollup() computes period columns (balances, activity, YTD) for
+every account at once from the matrix, given a list of named
+periods (see Period rollup below).
+"""
+import numpy as np
+import pandas as pd
+
+import datasets
+import schemas
+
+RAW_DATASET = "gl_history_raw"
+DATASET = "gl_monthly"
+
+
+def build():
+    """
+    The matrix (Account, MonthStart, MonthlyAmount) from the raw
+    GL dataset.
+    """
+    df = datasets.read(
+        RAW_DATASET, columns=["Account", "Jrnl", "Debit", "Credit", "MonthStart"]
+    )
+
+    pre_rows = len(df)
+    df = df[~closing(df["Jrnl"])]
+    print(f"Filtered CLS journals: {pre_rows - len(df)} rows removed")
+    return aggregate(df)
+
+
+def closing(jrnl):
+    """
+    Lines of CLS journals, matched as 04 and 05 always have:
+    case-sensitive, surrounding spaces ignored (PARITY LOCKED).
+    """
+    return jrnl.str.strip() == "CLS"
+
+
+def aggregate(df):
+    """
+    The matrix from raw GL lines (Account, MonthStart, Debit,
+    Credit), CLS journals already removed.
+    """
+    if df["MonthStart"].isna().any():
+        raise ValueError("[FATAL] Null MonthStart values detected")
+
+    net = df["Debit"].fillna(0.0) - df["Credit"].fillna(0.0)
+    return (
+        pd.DataFrame({
+            "Account": df["Account"],
+            "MonthStart": df["MonthStart"],
+            "MonthlyAmount": net,
+        })
+        .groupby(["Account", "MonthStart"], as_index=False, dropna=False)
+        .sum()
+    )
+
+
+def publish(monthly):
+    return datasets.write(DATASET, monthly, schemas.get(DATASET))
+
+
+def read(columns=None):
+    return datasets.read(DATASET, columns=columns)
+
+
+# ------------------------------------------------------------
+# Period rollup
+# ------------------------------------------------------------
+# A period is a dict:
+#
+#   {"name": "CumToPrior", "measure": "cumulative", "end": date(2026, 8, 1)}
+#
+# with dates given as month starts (MonthStart values) and
+#
+#   cumulative  running balance as of end: the account's
+#               cumulative amount at its last month with activity
+#               on or before end
+#   activity    net activity from start to end (start defaults to
+#               end: that one month)
+#   ytd         running balance at the last month with activity
+#               between start (default January of end's year) and
+#               end; NaN when there was none. Balances are never
+#               closed out (CLS journals are excluded), so this is
+#               the cumulative balance, not activity since start
+#               (PARITY LOCKED)
+#
+# Each is NaN for an account with nothing in the period. An
+# optional "accounts": (low, high) restricts the column to
+# accounts numbered low..high; others get NaN.
+MEASURES = ("cumulative", "activity", "ytd")
+
+# Account columns of the rollup (the accounts of gl_history)
+KEYS = ["Account", "Account_Num", "Account_Description"]
+
+
+def month_index(months, day, side):
+    """
+    Position of day among the sorted months: the last month on or
+    before it (side "right") or the first on or after it ("left").
+    """
+    i = np.searchsorted(months, np.datetime64(day, "D"), side=side)
+    return i - 1 if side == "right" else i
+
+
+def dense(monthly, keys):
+    """
+    The long matrix as dense arrays, one row per account (keys,
+    in order of first appearance) and one column per month:
+    (accounts, months, amount, cum, last) with amount NaN where
+    the account had no activity, cum the running balance carried
+    forward, and last the column of the account's last month with
+    activity so far (-1 before the first).
+    """
+    groups = monthly.groupby(keys, sort=False)
+    row = groups.ngroup().to_numpy()
+    ms = monthly["MonthStart"].to_numpy(dtype="datetime64[D]")
+    months = np.unique(ms)
+    col = np.searchsorted(months, ms)
+
+    shape = (groups.ngroups, len(months))
+    amount = np.full(shape, np.nan)
+    amount[row, col] = monthly["MonthlyAmount"].to_numpy()
+
+    # Running balance over the account's own months, in month
+    # order (the order the rows are summed in matters to the bit)
+    order = np.lexsort((col, row))
+    running = np.full(shape, np.nan)
+    running[row[order], col[order]] = (
+        pd.Series(amount[row[order], col[order]]).groupby(row[order]).cumsum().to_numpy()
+    )
+
+    seen = np.where(np.isnan(amount), -1, np.arange(len(months)))
+    last = np.maximum.accumulate(seen, axis=1)
+    cum = np.take_along_axis(running, np.maximum(last, 0), axis=1)
+    cum[last < 0] = np.nan
+
+    accounts = monthly.drop_duplicates(keys)[keys].reset_index(drop=True)
+    return accounts, months, amount, cum, last
+
+
+def rollup(monthly, periods, keys=KEYS):
+    """
+    One row per account (keys, in order of first appearance in
+    monthly) with a column per period. monthly has the keys,
+    MonthStart and MonthlyAmount, one row per account and month.
+    """
+    return rollup_dense(dense(monthly, list(keys)), periods)
+
+
+def rollup_dense(matrix, periods):
+    """
+    rollup() over a matrix already made dense (see dense()); each
+    period is a lookup per account, however long the history.
+    """
+    accounts, months, amount, cum, last = matrix
+    nan = np.full(len(accounts), np.nan)
+
+    out = accounts.copy()
+    for period in periods:
+        measure = period["measure"]
+        if measure not in MEASURES:
+            raise ValueError(f"Unknown measure {measure!r} for period {period['name']}")
+
+        end = month_index(months, period["end"], "right")
+        if measure == "cumulative":
+            start = 0
+        elif measure == "activity":
+            start = month_index(months, period.get("start", period["end"]), "left")
+        else:
+            start = month_index(
+                months, period.get("start", period["end"].replace(month=1, day=1)), "left"
+            )
+
+        if end < 0 or start > end:
+            values = nan
+        elif measure == "activity":
+            window = amount[:, start:end + 1]
+            values = np.where(
+                np.isnan(window).all(axis=1), np.nan, np.nansum(window, axis=1)
+            )
+        else:
+            values = np.where(last[:, end] >= start, cum[:, end], np.nan)
+
+        if "accounts" in period:
+            low, high = period["accounts"]
+            num = out["Account_Num"].astype(int)
+            values = np.where((num >= low) & (num <= high), values, np.nan)
+
+        out[period["name"]] = values
+    return out
@@ -1,9 +1,15 @@
 import json
 import math
+import sys
 import pandas as pd
 from datetime import datetime, timezone
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import artifacts
+import schemas
+
 # -----------------------------
 # Paths
 # -----------------------------
@@ -14,7 +20,7 @@ OUT_JSON = Path("public/data/financials_gl.json")
 def load_csv(path: Path):
     if not path.exists():
         raise FileNotFoundError(f"Missing required CSV: {path}")
-    return pd.read_csv(path, low_memory=False)
+    return schemas.json_ids(path.stem, artifacts.read_csv(path.stem, path, low_memory=False))
 
 def sanitize_for_json(obj):
     """
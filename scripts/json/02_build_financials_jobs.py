@@ -1,9 +1,15 @@
 import json
 import math
+import sys
 import pandas as pd
 from datetime import datetime, timezone
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import artifacts
+import schemas
+
 JOB_BUDGETS = Path("data/job_budgets.csv")
 JOB_ACTUALS = Path("data/job_actuals.csv")
 JOB_BILLED_REV = Path("data/job_billed_revenue.csv")
@@ -12,7 +18,7 @@ OUT_JSON = Path("public/data/financials_jobs.json")
 def load_csv(path: Path):
     if not path.exists():
         raise FileNotFoundError(f"Missing required CSV: {path}")
-    return pd.read_csv(path, low_memory=False)
+    return schemas.json_ids(path.stem, artifacts.read_csv(path.stem, path, low_memory=False))
 
 def sanitize_for_json(obj):
     if isinstance(obj, float):
@@ -28,9 +34,13 @@ def sanitize_for_json(obj):
 def main():
     print("Building financials_jobs.json ...")
 
-    budgets = load_csv(JOB_BUDGETS).where(pd.notnull(load_csv(JOB_BUDGETS)), None)
-    actuals = load_csv(JOB_ACTUALS).where(pd.notnull(load_csv(JOB_ACTUALS)), None)
-    billed = load_csv(JOB_BILLED_REV).where(pd.notnull(load_csv(JOB_BILLED_REV)), None)
+    budgets = load_csv(JOB_BUDGETS)
+    actuals = load_csv(JOB_ACTUALS)
+    billed = load_csv(JOB_BILLED_REV)
+
+    budgets = budgets.where(pd.notnull(budgets), None)
+    actuals = actuals.where(pd.notnull(actuals), None)
+    billed = billed.where(pd.notnull(billed), None)
 
     payload = {
         "job_budgets": budgets.to_dict(orient="records"),
@@ -1,9 +1,15 @@
 import json
 import math
+import sys
 import pandas as pd
 from datetime import datetime, timezone
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import artifacts
+import schemas
+
 CSV = Path("data/ap_payment_job_allocation.csv")
 OUT_JSON = Path("public/data/ap_payment_job_allocation.json")
 
@@ -21,7 +27,8 @@ def sanitize_for_json(obj):
 def main():
     print("Building ap_payment_job_allocation.json ...")
 
-    df = pd.read_csv(CSV, low_memory=False)
+    df = artifacts.read_csv("ap_payment_job_allocation", CSV, low_memory=False)
+    df = schemas.json_ids("ap_payment_job_allocation", df)
     df = df.where(pd.notnull(df), None)
 
     payload = {
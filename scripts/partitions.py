@@ -0,0 +1,164 @@
+"""
+Partitioned extracts kept between runs.
+
+A partitioned step stores its output as one CSV per period (e.g.
+one per GL month) under STATE_DIR/<name>/, plus a manifest that
+records each partition's row count and the run that wrote it, and
+a watermark: the first period that was still open at the last
+refresh. Closed partitions are reused untouched; the step's output
+file is rebuilt by concatenating the partitions in order.
+
+A store created with typed columns keeps its partitions as
+Parquet files instead and publishes them as an intermediate
+dataset (see datasets.py). Partitions stored under other column
+declarations (see schemas.py), or by other code (a
+pipeline_state.code_signature of what pulls and normalises them),
+are discarded, so the next run pulls everything again in the
+current form.
+"""
+import os
+from datetime import datetime, timezone
+
+import datasets
+import pipeline_state
+
+
+class PartitionStore:
+    def __init__(self, name, columns=None, code=None):
+        self.name = name
+        self.columns = columns
+        self.code = code
+        self.suffix = ".parquet" if columns else ".csv"
+        self.dir = pipeline_state.state_path(name)
+        self.manifest_file = os.path.join(self.dir, "manifest.json")
+        self.manifest = pipeline_state.load_json(
+            self.manifest_file, {"partitions": {}, "watermark": None}
+        )
+        if columns and self.manifest.get("columns") != columns:
+            if self.manifest["partitions"]:
+                print(f"   [{name}] stored partitions have other column types; discarding them")
+            self.reset()
+        elif code and self.manifest.get("code") != code:
+            if self.manifest["partitions"]:
+                print(f"   [{name}] stored partitions were pulled by other code; discarding them")
+            self.reset()
+
+    # --------------------------------------------------------
+    # Manifest
+    # --------------------------------------------------------
+    @property
+    def watermark(self):
+        return self.manifest.get("watermark")
+
+    def entry(self, key):
+        return self.manifest["partitions"].get(key)
+
+    def keys(self):
+        return list(self.manifest["partitions"])
+
+    def has(self, key):
+        """
+        True when the partition was written and is still on disk
+        (a partition with no rows has no file).
+        """
+        entry = self.entry(key)
+        if entry is None:
+            return False
+        return entry["rows"] == 0 or os.path.exists(self.path(key))
+
+    def path(self, key):
+        return os.path.join(self.dir, f"{key}{self.suffix}")
+
+    def reset(self):
+        """
+        Forget every partition (full rebuild).
+        """
+        self.manifest = {"partitions": {}, "watermark": None}
+        if self.columns:
+            self.manifest["columns"] = self.columns
+        if self.code:
+            self.manifest["code"] = self.code
+        pipeline_state.save_json(self.manifest_file, self.manifest)
+
+    def set_watermark(self, key):
+        self.manifest["watermark"] = key
+        pipeline_state.update_json(self.manifest_file, "watermark", key)
+
+    # --------------------------------------------------------
+    # Partitions
+    # --------------------------------------------------------
+    def write(self, key, df):
+        """
+        Replace one partition with df (atomically) and record it
+        in the manifest under the current run id.
+        """
+        os.makedirs(self.dir, exist_ok=True)
+        path = self.path(key)
+
+        if df.empty:
+            if os.path.exists(path):
+                os.remove(path)
+        elif self.columns:
+            datasets.write_file(path, df, self.columns)
+        else:
+            tmp = f"{path}.tmp"
+            df.to_csv(tmp, index=False)
+            os.replace(tmp, path)
+
+        entry = {
+            "rows": len(df),
+            "run_id": os.getenv("PIPELINE_RUN_ID"),
+            "written_utc": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        self.manifest["partitions"][key] = entry
+        pipeline_state.update_json(self.manifest_file, ("partitions", key), entry)
+        return entry
+
+    def assemble(self, keys, outfile):
+        """
+        Write outfile as the concatenation of the given partitions
+        in order: the header of the first non-empty partition, then
+        every partition's rows. Byte-identical to appending each
+        partition's to_csv output in turn.
+        Returns the total row count.
+        """
+        total_rows = 0
+        header = None
+
+        tmp = f"{outfile}.tmp"
+        with open(tmp, "wb") as out:
+            for key in keys:
+                if self.entry(key)["rows"] == 0:
+                    continue
+                with open(self.path(key), "rb") as f:
+                    first = f.readline()
+                    if header is None:
+                        header = first
+                        out.write(first)
+                    while True:
+                        block = f.read(1 << 20)
+                        if not block:
+                            break
+                        out.write(block)
+                total_rows += self.entry(key)["rows"]
+
+        if header is None:
+            os.remove(tmp)
+            if os.path.exists(outfile):
+                os.remove(outfile)
+        else:
+            os.replace(tmp, outfile)
+        return total_rows
+
+    def publish(self, keys, dataset, partition_by):
+        """
+        Publish the given partitions, in order, as the dataset
+        data/<dataset>/ (typed stores only). Returns the total
+        row count.
+        """
+        return datasets.publish(
+            datasets.path(dataset),
+            [(key, self.path(key) if self.entry(key)["rows"] else None) for key in keys],
+            self.columns,
+            partition_by,
+        )
@@ -0,0 +1,176 @@
+"""
+Persistent pipeline state (fingerprints, journals, watermarks).
+
+Everything lives under STATE_DIR, which is not committed: the
+workflow carries it between runs with actions/cache. Losing it
+is always safe; the next run simply does a full rebuild.
+"""
+import csv
+import hashlib
+import inspect
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+STATE_DIR = os.getenv("PIPELINE_STATE_DIR", ".pipeline")
+
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def state_path(*parts):
+    return os.path.join(STATE_DIR, *parts)
+
+
+def load_json(path, default=None):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def save_json(path, data):
+    """
+    Atomic write: a killed run never leaves a half-written file.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True, default=str)
+    os.replace(tmp, path)
+
+
+def update_json(path, key, value):
+    """
+    Set data[key] = value in a JSON object file (thread-safe).
+    key may be a tuple to set a nested value.
+    """
+    keys = key if isinstance(key, tuple) else (key,)
+    with _lock:
+        data = load_json(path, {})
+        node = data
+        for k in keys[:-1]:
+            node = node.setdefault(k, {})
+        node[keys[-1]] = value
+        save_json(path, data)
+
+
+def set_current_step(name):
+    """
+    Name of the step running on this thread (in-process runs);
+    subprocess steps get it from PIPELINE_STEP instead.
+    """
+    _local.step = name
+
+
+def current_step():
+    return getattr(_local, "step", None) or os.getenv("PIPELINE_STEP")
+
+
+def today(tz=None):
+    """
+    The run's as-of date: today in tz (local time if None).
+    PIPELINE_AS_OF pins it, e.g. to replay a recorded run (see
+    sql_replay.py): a date applies to every time zone, an ISO
+    timestamp with a UTC offset is dated per time zone.
+    """
+    as_of = os.getenv("PIPELINE_AS_OF")
+    if as_of:
+        moment = datetime.fromisoformat(as_of)
+        if moment.tzinfo is None:
+            return moment.date()
+    else:
+        moment = datetime.now(timezone.utc)
+    return moment.astimezone(ZoneInfo(tz) if tz else None).date()
+
+
+# ------------------------------------------------------------
+# Fingerprints
+# ------------------------------------------------------------
+def hash_files(paths):
+    h = hashlib.sha256()
+    for path in sorted(paths):
+        h.update(path.encode("utf-8"))
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def code_signature(*parts):
+    """
+    Hash of what a stored result was built from: text (SQL),
+    functions (by source) and JSON-able values (column
+    declarations). A change to any of them changes the hash.
+    """
+    h = hashlib.sha256()
+    for part in parts:
+        if callable(part):
+            part = inspect.getsource(part)
+        elif not isinstance(part, str):
+            part = json.dumps(part, sort_keys=True, default=str)
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def fingerprint_file(path):
+    """
+    Content hash + size for any file. CSVs also get their
+    schema (header) and row count, computed in the same pass;
+    JSON files get their record count.
+    Returns None when the file does not exist.
+    """
+    if not os.path.exists(path):
+        return None
+
+    h = hashlib.sha256()
+    fp = {"bytes": os.path.getsize(path)}
+
+    if path.endswith(".csv"):
+        header = None
+        rows = 0
+        quotes = 0
+        with open(path, "rb") as f:
+            for line in f:
+                h.update(line)
+                if header is None:
+                    header = line
+                    continue
+                # A record ends on a newline outside quotes
+                quotes += line.count(b'"')
+                if quotes % 2 == 0:
+                    rows += 1
+        fp["schema"] = next(csv.reader([header.decode("utf-8-sig")]), []) if header else []
+        fp["rows"] = rows
+    else:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        if path.endswith(".json"):
+            fp["rows"] = count_json_records(path)
+
+    fp["sha256"] = h.hexdigest()
+    return fp
+
+
+def count_json_records(path):
+    """
+    Records in a pipeline JSON output: a top-level list, or the
+    lists inside a top-level object; for a dataset manifest (see
+    datasets.py), the rows of its partitions.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if isinstance(data, list):
+        return len(data)
+    if isinstance(data, dict) and "partition_by" in data:
+        return sum(p["rows"] for p in data["partitions"].values())
+    if isinstance(data, dict):
+        return sum(len(v) for v in data.values() if isinstance(v, list))
+    return None
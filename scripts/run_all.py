@@ -1,86 +1,779 @@
+import argparse
+import glob
+import importlib.util
+import json
+import os
+import resource
 import subprocess
 import sys
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+import artifacts
+import pipeline_state
+import sql_replay
+
+# ============================================================
+# Configuration
+# ============================================================
+
+# Bounded worker pool (keep modest: every DB step opens its own
+# session against Foundation's hosted SQL Server)
+DEFAULT_WORKERS = int(os.getenv("PIPELINE_WORKERS", "4"))
+
+# Logical resource for "Foundation is reachable"
+DB = "db:foundation"
+
+# Last successful input/code fingerprints per step
+FINGERPRINTS_FILE = pipeline_state.state_path("fingerprints.json")
+
+# Per-step resource usage of the current run (read by 99)
+RUN_METRICS_FILE = pipeline_state.state_path("run_metrics.json")
+
+# Run journal: which steps of the current run completed, used by --resume
+JOURNAL_FILE = pipeline_state.state_path("journal.json")
+
+# Per-query telemetry appended by foundation_db (reset per run)
+QUERY_STATS_FILE = pipeline_state.state_path("query_stats.jsonl")
 
 # ============================================================
-# Ordered list of pipeline steps (STRICTLY SEQUENTIAL)
+# Pipeline steps
+#
+# Each step declares what it reads and what it writes. The
+# runner derives the dependency DAG from these declarations:
+# a step waits only for the steps that write its inputs.
+#
+# cost = rough relative runtime, used to put the longest
+# (critical) path first when several steps are ready.
+#
+# as_of = "date" marks steps whose output depends on today's
+# date, so an unchanged input does not make them skippable
+# across days.
 # ============================================================
 
 STEPS = [
     # --------------------------------------------------------
     # Connectivity
     # --------------------------------------------------------
-    "scripts/01_test_connection.py",
+    {
+        "path": "scripts/01_test_connection.py",
+        "reads": [],
+        "writes": [DB],
+        "cost": 1,
+    },
 
     # --------------------------------------------------------
     # Dimensions
     # --------------------------------------------------------
-    "scripts/02_accounts.py",
+    {
+        "path": "scripts/02_accounts.py",
+        "reads": [DB],
+        "writes": ["data/accounts.csv"],
+        "cost": 1,
+    },
 
     # --------------------------------------------------------
     # GL pipeline (locked)
     # --------------------------------------------------------
-    "scripts/03_gl_history_raw.py",
-    "scripts/04_gl_history_derived.py",
-    "scripts/05_gl_history_all.py",
+    {
+        "path": "scripts/03_gl_history_raw.py",
+        "reads": [DB],
+        "writes": ["data/gl_history_raw/manifest.json", "data/gl_history_raw.csv"],
+        "cost": 60,
+    },
+    {
+        "path": "scripts/04_gl_history_derived.py",
+        "reads": ["data/gl_history_raw/manifest.json", "data/accounts.csv"],
+        "writes": [
+            "data/gl_monthly/manifest.json",
+            "data/gl_balances/manifest.json",
+            "data/gl_history.csv",
+            "data/gl_history_all.csv",
+        ],
+        "cost": 4,
+        "as_of": "date",
+    },
 
     # --------------------------------------------------------
     # Jobs CSVs
     # --------------------------------------------------------
-    "scripts/06_job_budgets.py",
-    "scripts/07_job_actuals.py",
-    "scripts/08_job_billed_revenue.py",
+    {
+        "path": "scripts/06_job_budgets.py",
+        "reads": [DB],
+        "writes": ["data/job_budgets.csv"],
+        "cost": 2,
+    },
+    {
+        "path": "scripts/07_job_actuals.py",
+        "reads": [DB],
+        "writes": ["data/job_actuals.csv"],
+        "cost": 5,
+        "as_of": "date",
+    },
+    {
+        "path": "scripts/08_job_billed_revenue.py",
+        "reads": [DB, "data/gl_history_raw/manifest.json"],
+        "writes": ["data/job_billed_revenue.csv"],
+        "cost": 5,
+    },
 
     # --------------------------------------------------------
     # AP base + summary
     # --------------------------------------------------------
-    "scripts/09_payments.py",
-    "scripts/10_ap_invoice_summary.py",
+    {
+        "path": "scripts/09_payments.py",
+        "reads": [DB],
+        "writes": ["data/payments.csv"],
+        "cost": 3,
+    },
+    {
+        "path": "scripts/10_ap_invoice_summary.py",
+        "reads": ["data/payments.csv"],
+        "writes": ["data/ap_invoice_summary.csv"],
+        "cost": 1,
+        "as_of": "date",
+    },
 
     # --------------------------------------------------------
     # AR summary
     # --------------------------------------------------------
-    "scripts/11_ar_invoice_summary.py",
+    {
+        "path": "scripts/11_ar_invoice_summary.py",
+        "reads": [DB],
+        "writes": ["data/ar_invoice_summary.csv"],
+        "cost": 2,
+        "as_of": "date",
+    },
 
     # --------------------------------------------------------
     # AP payment allocations
     # --------------------------------------------------------
-    "scripts/12_ap_payment_job_allocation.py",
+    {
+        "path": "scripts/12_ap_payment_job_allocation.py",
+        "reads": [DB],
+        "writes": ["data/ap_payment_job_allocation.csv"],
+        "cost": 3,
+    },
 
     # --------------------------------------------------------
     # AR receipt allocations
     # --------------------------------------------------------
-    "scripts/13_ar_receipt_job_allocation.py",
+    {
+        "path": "scripts/13_ar_receipt_job_allocation.py",
+        "reads": [DB],
+        "writes": ["data/ar_receipt_job_allocation.csv"],
+        "cost": 2,
+    },
 
     # --------------------------------------------------------
     # Labor allocations
     # --------------------------------------------------------
-    "scripts/14_labor_job_allocation.py",
+    {
+        "path": "scripts/14_labor_job_allocation.py",
+        "reads": [DB],
+        "writes": ["data/labor_job_allocation.csv"],
+        "cost": 10,
+    },
 
     # --------------------------------------------------------
     # JSON builders
     # --------------------------------------------------------
-    "scripts/json/01_build_financials_gl.py",
-    "scripts/json/02_build_financials_jobs.py",
-    "scripts/json/03_build_ap_invoices.py",
-    "scripts/json/04_build_ar_invoices.py",
-    "scripts/json/05_build_ap_payment_allocations.py",
-    "scripts/json/06_build_ar_receipt_allocations.py",
-    "scripts/json/07_build_labor_job_allocation.py",
+    {
+        "path": "scripts/json/01_build_financials_gl.py",
+        "reads": ["data/gl_history.csv", "data/gl_history_all.csv"],
+        "writes": ["public/data/financials_gl.json"],
+        "cost": 1,
+    },
+    {
+        "path": "scripts/json/02_build_financials_jobs.py",
+        "reads": [
+            "data/job_budgets.csv",
+            "data/job_actuals.csv",
+            "data/job_billed_revenue.csv",
+        ],
+        "writes": ["public/data/financials_jobs.json"],
+        "cost": 1,
+    },
+    {
+        "path": "scripts/json/03_build_ap_invoices.py",
+        "reads": ["data/ap_invoice_summary.csv"],
+        "writes": ["public/data/ap_invoices.json"],
+        "cost": 1,
+    },
+    {
+        "path": "scripts/json/04_build_ar_invoices.py",
+        "reads": ["data/ar_invoice_summary.csv"],
+        "writes": ["public/data/ar_invoices.json"],
+        "cost": 1,
+    },
+    {
+        "path": "scripts/json/05_build_ap_payment_allocations.py",
+        "reads": ["data/ap_payment_job_allocation.csv"],
+        "writes": ["public/data/ap_payment_job_allocation.json"],
+        "cost": 1,
+    },
+    {
+        "path": "scripts/json/06_build_ar_receipt_allocations.py",
+        "reads": ["data/ar_receipt_job_allocation.csv"],
+        "writes": ["public/data/ar_receipt_job_allocation.json"],
+        "cost": 1,
+    },
+    {
+        "path": "scripts/json/07_build_labor_job_allocation.py",
+        "reads": ["data/labor_job_allocation.csv"],
+        "writes": ["public/data/labor_job_allocation.json"],
+        "cost": 1,
+    },
 
     # --------------------------------------------------------
-    # Health / observability
+    # Health / observability (barrier: runs after everything)
     # --------------------------------------------------------
-    "scripts/99_write_pipeline_health.py",
+    {
+        "path": "scripts/99_write_pipeline_health.py",
+        "reads": [],
+        "writes": ["public/data/pipeline_health.json"],
+        "cost": 1,
+        "barrier": True,
+    },
 ]
 
+# ============================================================
+# DAG construction
+# ============================================================
+
+def step_name(path):
+    return os.path.splitext(os.path.relpath(path, "scripts"))[0]
+
+def build_dag(steps):
+    """
+    Return {step path: set of step paths it depends on}.
+    Inputs that no step writes are external (e.g. files
+    committed to the repo) and add no dependency.
+    """
+    writers = {}
+    for step in steps:
+        for res in step["writes"]:
+            if res in writers:
+                raise ValueError(
+                    f"{res} is written by both {writers[res]} and {step['path']}"
+                )
+            writers[res] = step["path"]
+
+    deps = {}
+    for step in steps:
+        if step.get("barrier"):
+            deps[step["path"]] = {s["path"] for s in steps if s is not step}
+        else:
+            deps[step["path"]] = {
+                writers[res]
+                for res in step["reads"]
+                if res in writers and writers[res] != step["path"]
+            }
+    return deps
+
+def topo_order(deps):
+    remaining = {p: set(ds) for p, ds in deps.items()}
+    order = []
+    ready = [p for p, ds in remaining.items() if not ds]
+
+    while ready:
+        p = ready.pop()
+        order.append(p)
+        del remaining[p]
+        for q, ds in remaining.items():
+            if p in ds:
+                ds.discard(p)
+                if not ds:
+                    ready.append(q)
+
+    if remaining:
+        raise ValueError(f"Dependency cycle between pipeline steps: {sorted(remaining)}")
+    return order
+
+def critical_path_lengths(steps, deps):
+    """
+    Longest remaining path (by cost) from each step to the end
+    of the pipeline. Ready steps with the largest value go first.
+    """
+    cost = {s["path"]: s.get("cost", 1) for s in steps}
+    lengths = {}
+    for p in reversed(topo_order(deps)):
+        downstream = [lengths[q] for q, ds in deps.items() if p in ds]
+        lengths[p] = cost[p] + max(downstream, default=0)
+    return lengths
+
+# ============================================================
+# Incremental rebuilds (make-style)
+#
+# A step is skipped when its code, its input files and (for
+# as_of steps) today's date all match the fingerprints recorded
+# after its last successful run, and its outputs are still the
+# files that run produced. Steps with nothing on disk to
+# fingerprint always run (see always_runs); everything
+# downstream of an unchanged output is skipped.
+# ============================================================
+
+def code_fingerprints(steps):
+    shared = [
+        p for p in glob.glob("scripts/*.py")
+        if not os.path.basename(p)[0].isdigit()
+        and os.path.basename(p) != "run_all.py"
+    ]
+    return {s["path"]: pipeline_state.hash_files([s["path"], *shared]) for s in steps}
+
+def as_of_key(step):
+    if step.get("as_of") != "date":
+        return None
+    pacific = pipeline_state.today("America/Los_Angeles")
+    return f"{pipeline_state.today().isoformat()}|{pacific.isoformat()}"
+
+def is_file_resource(res):
+    return not res.startswith("db:")
+
+def step_signature(step, code_hash):
+    return {
+        "code": code_hash,
+        "as_of": as_of_key(step),
+        "inputs": {res: pipeline_state.fingerprint_file(res) for res in step["reads"]},
+    }
+
+def always_runs(step):
+    """
+    Barriers, steps reading the database, and steps without file
+    inputs or outputs (01 only checks that db: is reachable): an
+    empty set of fingerprints would match forever.
+    """
+    return (
+        step.get("barrier")
+        or not step["reads"]
+        or not all(is_file_resource(r) for r in step["reads"])
+        or not any(is_file_resource(r) for r in step["writes"])
+    )
+
+def is_up_to_date(step, signature):
+    if always_runs(step):
+        return False
+
+    previous = pipeline_state.load_json(FINGERPRINTS_FILE, {}).get(step["path"])
+    if not previous or previous["signature"] != signature:
+        return False
+
+    return all(
+        pipeline_state.fingerprint_file(res) == previous["outputs"].get(res)
+        for res in step["writes"]
+        if is_file_resource(res)
+    )
+
+def output_fingerprints(step):
+    return {
+        res: pipeline_state.fingerprint_file(res)
+        for res in step["writes"]
+        if is_file_resource(res)
+    }
+
+def record_success(step, signature, outputs):
+    pipeline_state.update_json(FINGERPRINTS_FILE, step["path"], {
+        "signature": signature,
+        "outputs": outputs,
+        "completed_at": datetime.now(timezone.utc).isoformat(),
+    })
+
+# ============================================================
+# Resource accounting
+#
+# wall / CPU / peak RSS come from the step's own rusage
+# (subprocess: the child; in-process: the worker thread, with
+# peak RSS being the shared interpreter's). cpu_scope says which
+# CPU time was measured:
+#
+#   process   the step's own process, every thread included
+#   thread    the step's worker thread only (in-process): CPU of
+#             threads the step starts itself (03's GL_WORKERS)
+#             is not counted
+#   shared    the whole interpreter (in-process where the OS has
+#             no per-thread rusage): includes concurrent steps
+#
+# Bytes read are the step's declared input files plus what its
+# queries returned (query_stats.jsonl); bytes written and rows
+# come from its declared output files.
+# ============================================================
+
+def usage_from_rusage(ru):
+    return {
+        "user_cpu_s": ru.ru_utime,
+        "system_cpu_s": ru.ru_stime,
+        "cpu_scope": "process",
+        "peak_rss_mb": ru.ru_maxrss / 1024,
+    }
+
+def query_stats_offset():
+    try:
+        return os.path.getsize(QUERY_STATS_FILE)
+    except OSError:
+        return 0
+
+def query_bytes(name, offset):
+    """
+    Bytes returned by the queries the step logged to
+    query_stats.jsonl from offset on (the file's size when the
+    step started; concurrent steps' records are skipped).
+    """
+    total = 0
+    try:
+        with open(QUERY_STATS_FILE, "r", encoding="utf-8") as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("step") == name:
+                    total += record.get("bytes") or 0
+    except OSError:
+        pass
+    return total
+
+def step_metrics(status, returncode, wall, usage, inputs, outputs, queried=0):
+    rows = sum(fp.get("rows") or 0 for fp in outputs.values() if fp)
+    return {
+        "status": status,
+        "exit_code": returncode,
+        "wall_s": round(wall, 3),
+        "user_cpu_s": round(usage.get("user_cpu_s", 0.0), 3),
+        "system_cpu_s": round(usage.get("system_cpu_s", 0.0), 3),
+        "cpu_scope": usage.get("cpu_scope"),
+        "peak_rss_mb": round(usage.get("peak_rss_mb", 0.0), 1),
+        "bytes_read": sum(fp["bytes"] for fp in inputs.values() if fp) + queried,
+        "bytes_written": sum(fp["bytes"] for fp in outputs.values() if fp),
+        "rows_produced": rows,
+        "rows_per_sec": round(rows / wall, 1) if wall > 0 else None,
+    }
+
+def record_metrics(step, metrics):
+    pipeline_state.update_json(RUN_METRICS_FILE, ("steps", step_name(step["path"])), metrics)
+
+# ============================================================
+# Run journal / resume
+#
+# Every step's outcome is journaled with the fingerprints of the
+# outputs it produced. --resume continues the last unfinished
+# run under the same run id: steps that completed and whose
+# outputs are still intact are not run again, and steps with
+# their own checkpoints (e.g. 03's months) pick up where they
+# stopped via PIPELINE_RUN_ID / PIPELINE_RESUME.
+# ============================================================
+
+def start_journal(resume):
+    now = datetime.now(timezone.utc).isoformat()
+    previous = pipeline_state.load_json(JOURNAL_FILE, {}) if resume else {}
+
+    if resume and not previous:
+        print("Nothing to resume: no previous run journal")
+    elif resume and previous.get("finished"):
+        print(f"Nothing to resume: run {previous['run_id']} finished")
+        previous = {}
+
+    completed = {
+        p: entry
+        for p, entry in previous.get("steps", {}).items()
+        if entry["status"] in ("ok", "skipped")
+        and all(
+            fp is not None and pipeline_state.fingerprint_file(res) == fp
+            for res, fp in entry["outputs"].items()
+        )
+    }
+
+    journal = {
+        "run_id": previous.get("run_id") or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ"),
+        "started_utc": previous.get("started_utc") or now,
+        "resumed_utc": now if previous else None,
+        "finished": False,
+        "steps": completed,
+    }
+    pipeline_state.save_json(JOURNAL_FILE, journal)
+    return journal["run_id"], bool(previous), set(completed)
+
+def journal_step(path, status, outputs=None):
+    pipeline_state.update_json(JOURNAL_FILE, ("steps", path), {
+        "status": status,
+        "outputs": outputs or {},
+        "finished_utc": datetime.now(timezone.utc).isoformat(),
+    })
+
+def finish_journal():
+    pipeline_state.update_json(JOURNAL_FILE, "finished", True)
+
+def dependents_of(path, deps):
+    found = set()
+    frontier = [path]
+    while frontier:
+        p = frontier.pop()
+        for q, ds in deps.items():
+            if p in ds and q not in found:
+                found.add(q)
+                frontier.append(q)
+    return found
+
+# ============================================================
+# Execution
+# ============================================================
+
 def run_step(path):
-    print(f"\n=== Running {path} ===")
-    subprocess.run([sys.executable, path])
-    print(f"=== Finished {path} ===")
+    name = step_name(path)
+    print(f"\n=== Running {path} ===", flush=True)
+
+    env = dict(os.environ, PYTHONUNBUFFERED="1", PIPELINE_STEP=name)
+    proc = subprocess.Popen(
+        [sys.executable, path],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        env=env,
+    )
+    for line in proc.stdout:
+        print(f"[{name}] {line}", end="", flush=True)
+
+    # Reap the child ourselves to get its own resource usage
+    _, status, ru = os.wait4(proc.pid, 0)
+    proc.returncode = returncode = os.waitstatus_to_exitcode(status)
+
+    print(f"=== Finished {path} (exit {returncode}) ===", flush=True)
+    return returncode, usage_from_rusage(ru)
+
+# ------------------------------------------------------------
+# In-process mode: one interpreter, each step's main() imported
+# once, CSVs shared through the artifact registry
+# ------------------------------------------------------------
+
+_modules = {}
+
+def load_step(path):
+    if path not in _modules:
+        module_name = "step_" + step_name(path).replace("/", "_")
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _modules[path] = module
+    return _modules[path]
+
+class StepOutput:
+    """
+    sys.stdout replacement that prefixes each line with the name
+    of the step printing it (steps run on worker threads).
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        name = getattr(self.local, "name", None)
+        if name is None:
+            return self.stream.write(text)
+
+        buf = self.local.buf + text
+        *lines, self.local.buf = buf.split("\n")
+        with self.lock:
+            for line in lines:
+                self.stream.write(f"[{name}] {line}\n")
+            self.stream.flush()
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def begin(self, name):
+        self.local.name = name
+        self.local.buf = ""
+
+    def end(self):
+        if self.local.buf:
+            self.write("\n")
+        self.local.name = None
+
+def run_step_in_process(path):
+    name = step_name(path)
+    print(f"\n=== Running {path} (in-process) ===", flush=True)
+
+    thread = hasattr(resource, "RUSAGE_THREAD")
+    who = resource.RUSAGE_THREAD if thread else resource.RUSAGE_SELF
+    before = resource.getrusage(who)
+
+    out = sys.stdout
+    out.begin(name)
+    pipeline_state.set_current_step(name)
+    try:
+        load_step(path).main()
+        returncode = 0
+    except SystemExit as e:
+        returncode = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception:
+        traceback.print_exc(file=out)
+        returncode = 1
+    finally:
+        pipeline_state.set_current_step(None)
+        out.end()
+
+    after = resource.getrusage(who)
+    usage = {
+        "user_cpu_s": after.ru_utime - before.ru_utime,
+        "system_cpu_s": after.ru_stime - before.ru_stime,
+        "cpu_scope": "thread" if thread else "shared",
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+    print(f"=== Finished {path} (exit {returncode}) ===", flush=True)
+    return returncode, usage
+
+def execute(step, runner, force, code_hash):
+    signature = step_signature(step, code_hash)
+
+    if not force and is_up_to_date(step, signature):
+        print(f"\n=== Skipping {step['path']} (inputs unchanged) ===", flush=True)
+        record_metrics(step, step_metrics("skipped", 0, 0.0, {}, {}, {}))
+        journal_step(step["path"], "skipped", output_fingerprints(step))
+        return 0
+
+    offset = query_stats_offset()
+    started = time.perf_counter()
+    returncode, usage = runner(step["path"])
+    wall = time.perf_counter() - started
+    queried = query_bytes(step_name(step["path"]), offset)
+
+    outputs = output_fingerprints(step)
+    if returncode == 0:
+        record_success(step, signature, outputs)
+
+    status = "ok" if returncode == 0 else "failed"
+    record_metrics(step, step_metrics(
+        status, returncode, wall, usage, signature["inputs"], outputs, queried
+    ))
+    journal_step(step["path"], status, outputs)
+    return returncode
+
+def run_pipeline(steps, workers, runner=run_step, force=False, completed=()):
+    """
+    Run steps in dependency order. Returns {path: exit code};
+    steps blocked by a failed dependency map to None.
+    """
+    by_path = {s["path"]: s for s in steps}
+    code_hash = code_fingerprints(steps)
+    deps = build_dag(steps)
+    priority = critical_path_lengths(steps, deps)
+    declared = {s["path"]: i for i, s in enumerate(steps)}
+    reads = {s["path"]: set(s["reads"]) for s in steps}
+
+    completed = {p for p in completed if p in by_path and not by_path[p].get("barrier")}
+    pending = {p: ds - completed for p, ds in deps.items() if p not in completed}
+    running = {}
+    results = {}
+
+    for p in sorted(completed, key=declared.get):
+        print(f"=== Already completed in this run: {p} ===")
+
+    pipeline_state.save_json(RUN_METRICS_FILE, {
+        "run_started_utc": datetime.now(timezone.utc).isoformat(),
+        "mode": "in-process" if runner is run_step_in_process else "subprocess",
+        "workers": workers,
+        "steps": {},
+    })
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            ready = sorted(
+                (p for p, ds in pending.items() if not ds),
+                key=lambda p: (-priority[p], declared[p]),
+            )
+            for p in ready[: workers - len(running)]:
+                del pending[p]
+                running[pool.submit(execute, by_path[p], runner, force, code_hash[p])] = p
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                p = running.pop(fut)
+                results[p] = fut.result()
+                for ds in pending.values():
+                    ds.discard(p)
+
+                # A failed step stops everything that consumes its
+                # outputs (the barrier step still runs to report it)
+                if results[p] != 0:
+                    for q in dependents_of(p, deps):
+                        if q in pending and not by_path[q].get("barrier"):
+                            del pending[q]
+                            results[q] = None
+                            print(f"=== Blocked {q} (depends on failed {p}) ===", flush=True)
+                            record_metrics(by_path[q], step_metrics("blocked", None, 0.0, {}, {}, {}))
+                            journal_step(q, "blocked")
+                    for ds in pending.values():
+                        ds -= set(results)
+
+                # Free shared frames nobody is left to read
+                waiting = set(running.values()) | set(pending)
+                for res in reads[p]:
+                    if not any(res in reads[q] for q in waiting):
+                        artifacts.release(res)
+
+    return results
 
 def main():
-    for step in STEPS:
-        run_step(step)
+    parser = argparse.ArgumentParser(description="Run the FTG Foundation pipeline")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="maximum number of steps running at the same time",
+    )
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="run every step's main() in this interpreter and share CSVs in memory",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="run every step even if its inputs are unchanged",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue the last unfinished run instead of starting over",
+    )
+    args = parser.parse_args()
+
+    # Pins PIPELINE_AS_OF for recorded/replayed runs before any
+    # step starts, so subprocess steps inherit it
+    sql_replay.install()
+
+    run_id, resumed, completed = start_journal(args.resume)
+    if not resumed and os.path.exists(QUERY_STATS_FILE):
+        os.remove(QUERY_STATS_FILE)
+    os.environ["PIPELINE_RUN_ID"] = run_id
+    os.environ["PIPELINE_RESUME"] = "1" if resumed else "0"
+    print(f"Pipeline run {run_id}{' (resumed)' if resumed else ''}")
+
+    runner = run_step
+    if args.in_process:
+        artifacts.enable()
+        sys.stdout = StepOutput(sys.stdout)
+        runner = run_step_in_process
+
+    results = run_pipeline(STEPS, max(1, args.workers), runner, args.force, completed)
+
+    failed = [p for p in results if results[p] != 0]
+    if failed:
+        print("\nPIPELINE FINISHED WITH FAILED STEPS:")
+        for p in failed:
+            outcome = "blocked" if results[p] is None else f"exit {results[p]}"
+            print(f"  {p} ({outcome})")
+        print("Re-run with --resume to continue from the first incomplete step")
+        sys.exit(1)
+
+    finish_journal()
     print("\nALL PIPELINE STEPS COMPLETED SUCCESSFULLY")
 
 if __name__ == "__main__":
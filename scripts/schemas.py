@@ -0,0 +1,468 @@
+"""
+Column types of every dataset the pipeline writes.
+
+SCHEMAS maps each dataset (by its artifacts / datasets name) to its
+columns and their kinds:
+
+    id        identifier text, normalised once by the step that
+              pulls it (normalize_id: no trailing ".0", trimmed,
+              NULL -> "")
+    string    free text (NULL stays NULL)
+    category  text with a handful of distinct values (journals,
+              statuses, aging buckets, PM names); read as a pandas
+              categorical, stored dictionary-encoded in Parquet
+    int64     whole numbers, never NULL
+    Int64     whole numbers that may be NULL
+    float64   numbers
+    date      a day: ISO text in CSV, date32 in Parquet
+
+Writers check their output against it before it is written
+(check(), called by artifacts.write_csv), so a column that drifts
+to another type fails the step that produced it instead of
+silently changing what every reader infers. Readers get the
+declared dtypes (read_dtypes(), applied by artifacts.read_csv)
+and no longer infer or re-normalise.
+
+Job and invoice numbers are ids: Foundation allows non-numeric
+ones (placeholder jobs such as BUDGET), which a numeric
+declaration would reject at write. The JSON builders turn ids
+back into numbers where every value is one (json_ids), so the
+public JSON keeps the types it has always had. The other
+declarations are the types these files have always been read as,
+and so the types the public JSON carries: numeric where every
+value is and string where some are not (AP invoice numbers, EFT
+receipt numbers). Changing one changes the JSON consumers get.
+"""
+import collections
+
+import numpy as np
+import pandas as pd
+
+# Columns of a dataset not listed by name (e.g. the month columns
+# of gl_history_all)
+OTHER = "*"
+
+# read_csv dtype per kind
+CSV_DTYPES = {
+    "id": str,
+    "string": str,
+    "category": "category",
+    "int64": "int64",
+    "Int64": "Int64",
+    "float64": "float64",
+    "date": str,
+}
+
+GL_ACCOUNT_COLUMNS = {
+    "Account": "int64",
+    "Account_Num": "int64",
+    "Account_Description": "string",
+}
+
+# gl_history balance columns (see gl_balances.py)
+GL_BALANCE_COLUMNS = {
+    "CumToLastComplete": "float64",
+    "CumToPrior": "float64",
+    "CumToSecondPrior": "float64",
+    "NetIncomeYTD_Prior": "float64",
+    "NetIncomeYTD_LastComplete": "float64",
+    "LastCompleteMonthActivity": "float64",
+    "PriorMonthActivity": "float64",
+}
+
+SCHEMAS = {
+    # ------------------------------------------------------------
+    # General ledger
+    # ------------------------------------------------------------
+    "accounts": {
+        "account_no": "int64",
+        "description": "string",
+        "debit_credit": "category",
+        # Written zero-padded ("0001") but read back as a number
+        # (1); 04 joins on it as such (PARITY LOCKED)
+        "Account_Key": "int64",
+    },
+    # Typed dataset data/gl_history_raw/ (and the GL_RAW_CSV export)
+    "gl_history_raw": {
+        "Account": "id",
+        "Job": "id",
+        "Jrnl": "category",
+        "TrxNo": "int64",
+        "Line": "int64",
+        "FullAccountNo": "id",
+        "Debit": "float64",
+        "Credit": "float64",
+        "description": "string",
+        "vendor_no": "string",
+        "voucher_no": "Int64",
+        "audit_number": "Int64",
+        "customer_no": "string",
+        "ar_invoice_no": "string",
+        "cash_trx_no": "Int64",
+        "record_status": "category",
+        "ar_invoice_id": "Int64",
+        "basic_account_id": "Int64",
+        "cash_trx_id": "Int64",
+        "customer_id": "Int64",
+        "full_account_id": "Int64",
+        "job_id": "Int64",
+        "job_trx_id": "Int64",
+        "journal_id": "Int64",
+        "line_id": "Int64",
+        "transaction_id": "Int64",
+        "vendor_id": "Int64",
+        "voucher_id": "Int64",
+        "ActivityDate": "date",
+        "MonthStart": "date",
+    },
+    # Typed dataset data/gl_monthly/: net activity per account and
+    # month (see gl_matrix.py)
+    "gl_monthly": {
+        "Account": "id",
+        "MonthStart": "date",
+        "MonthlyAmount": "float64",
+    },
+    # Typed dataset data/gl_balances/: every account x month, with
+    # the running balance carried forward (see gl_balances.py)
+    "gl_balances": {
+        "Account": "id",
+        "Account_Num": "int64",
+        "Account_Description": "string",
+        "MonthStart": "date",
+        "MonthlyAmount": "float64",
+        "CumToDate": "float64",
+        "LastActivity": "date",
+    },
+    "gl_history": {
+        **GL_ACCOUNT_COLUMNS,
+        **GL_BALANCE_COLUMNS,
+    },
+    # gl_balances.py --out (not a pipeline output)
+    "gl_history_snapshots": {
+        "AsOf": "date",
+        **GL_ACCOUNT_COLUMNS,
+        **GL_BALANCE_COLUMNS,
+    },
+    "gl_history_all": {
+        **GL_ACCOUNT_COLUMNS,
+        # One column per month (yyyy-MM)
+        OTHER: "float64",
+    },
+    # ------------------------------------------------------------
+    # Jobs
+    # ------------------------------------------------------------
+    "job_budgets": {
+        "job_no": "string",
+        "job_description": "string",
+        "customer_no": "string",
+        "customer_name": "string",
+        "job_status": "category",
+        "project_manager_no": "string",
+        "project_manager_name": "category",
+        "original_contract": "float64",
+        "tot_income_adj": "float64",
+        "revised_contract": "float64",
+        "original_cost": "float64",
+        "tot_cost_adj": "float64",
+        "revised_cost": "float64",
+    },
+    "job_actuals": {
+        "Job_No": "id",
+        "Job_Description": "string",
+        "Project_Manager": "category",
+        "Cost_Class_No": "float64",
+        "Cost_Class": "category",
+        "Cost_Code_No": "int64",
+        "Cost_Code_Description": "string",
+        "Actual_Cost": "float64",
+        "Oldest_Cost_Date": "date",
+        "Most_Recent_Cost_Date": "date",
+        "Days_Since_First_Cost": "int64",
+        "Days_Since_Last_Cost": "int64",
+    },
+    "job_billed_revenue": {
+        # Revenue posted without a job is one row with no Job_No
+        "Job_No": "id",
+        "Job_Description": "string",
+        "Billed_Revenue": "float64",
+    },
+    # ------------------------------------------------------------
+    # Accounts payable
+    # ------------------------------------------------------------
+    "payments": {
+        "voucher_no": "id",
+        "invoice_no": "string",
+        "invoice_date": "date",
+        "transaction_date": "date",
+        "invoice_amount": "float64",
+        "vendor_name": "string",
+        "retainage_amount": "float64",
+        "cash_amount": "float64",
+        "detail_line_count": "int64",
+        "void_flag": "int64",
+        "job_no": "id",
+        "job_description": "string",
+        "project_manager_name": "category",
+    },
+    "ap_invoice_summary": {
+        "invoice_no": "string",
+        "vendor_name": "string",
+        "job_no": "id",
+        "job_description": "string",
+        "project_manager_name": "category",
+        "invoice_date": "date",
+        "transaction_date": "date",
+        "invoice_amount": "float64",
+        "amount_paid": "float64",
+        "total_due": "float64",
+        "retainage_amount": "float64",
+        "open_for_aging": "float64",
+        "days_outstanding": "int64",
+        "aging_bucket": "category",
+        "original_retainage_amount": "float64",
+    },
+    "ap_payment_job_allocation": {
+        "company_no": "int64",
+        "payment_document_no": "int64",
+        "payment_date": "date",
+        "payment_amount": "float64",
+        "payment_type": "category",
+        "payment_source": "category",
+        "payment_subtype": "category",
+        "vendor_no": "int64",
+        "vendor_name": "string",
+        "voucher_no": "int64",
+        "line_no": "int64",
+        "applied_amount": "float64",
+        "gl_cash_account": "int64",
+        "cash_applied_amount": "float64",
+        "is_cash_row": "int64",
+        "reconciliation_note": "string",
+        "job_no": "id",
+        "job_description": "string",
+    },
+    # ------------------------------------------------------------
+    # Accounts receivable
+    # ------------------------------------------------------------
+    "ar_invoice_summary": {
+        "company_no": "int64",
+        "invoice_no": "id",
+        "customer_no": "int64",
+        "customer_name": "string",
+        "job_no": "id",
+        "job_description": "string",
+        "project_manager_name": "category",
+        "invoice_date": "date",
+        "invoice_amount": "float64",
+        "cash_applied": "float64",
+        "total_due": "float64",
+        "retainage_amount": "float64",
+        "calculated_amount_due": "float64",
+        "days_outstanding": "int64",
+        "aging_bucket": "category",
+    },
+    "ar_receipt_job_allocation": {
+        "company_no": "int64",
+        "receipt_document_no": "string",
+        "receipt_no": "int64",
+        "receipt_date": "date",
+        "receipt_amount": "float64",
+        "receipt_type": "category",
+        "receipt_source": "category",
+        "receipt_subtype": "category",
+        "customer_no": "int64",
+        "invoice_no": "id",
+        "line_no": "int64",
+        "applied_amount": "float64",
+        "job_no": "id",
+        "job_description": "string",
+    },
+    # ------------------------------------------------------------
+    # Payroll
+    # ------------------------------------------------------------
+    "labor_job_allocation": {
+        "employee_no": "id",
+        "employee_name": "string",
+        "pay_type": "category",
+        "labor_rate_type": "category",
+        "job_no": "id",
+        "cost_code_no": "id",
+        "cost_class_no": "float64",
+        "week_start": "date",
+        "hour_type_group": "category",
+        "total_hours": "float64",
+        "labor_cost_estimated": "float64",
+        "job_labor_cost_posted": "float64",
+    },
+}
+
+
+class SchemaError(ValueError):
+    """
+    A frame that does not match its dataset's declared columns.
+    """
+
+
+def get(name):
+    if name not in SCHEMAS:
+        raise KeyError(f"No schema for dataset {name!r}; declare it in scripts/schemas.py")
+    return SCHEMAS[name]
+
+
+def read_dtypes(name):
+    """
+    read_csv dtype= argument for the dataset.
+    """
+    columns = get(name)
+    dtypes = {col: CSV_DTYPES[kind] for col, kind in columns.items() if col != OTHER}
+    if OTHER in columns:
+        return collections.defaultdict(lambda: CSV_DTYPES[columns[OTHER]], dtypes)
+    return dtypes
+
+
+# ------------------------------------------------------------
+# Normalisation (at ingest)
+# ------------------------------------------------------------
+def normalize_id(s: pd.Series) -> pd.Series:
+    """
+    Identifier as text: 1606, 1606.0 and "1606.0" become "1606",
+    " 1606 " becomes "1606", NULL becomes "".
+
+    Ids repeat (a few thousand jobs or accounts over hundreds of
+    thousands of rows), so each distinct value is normalised once
+    and the results are mapped back through the factorized codes.
+    Numbers are formatted arithmetically; only text goes through
+    the string rules.
+    """
+    codes, uniques = pd.factorize(s)
+    text = np.append(_normalize_values(np.asarray(uniques)), "")
+    # NULLs have code -1, i.e. the "" appended last
+    return pd.Series(text[codes], index=s.index, name=s.name, dtype=object)
+
+
+def _normalize_values(values):
+    """
+    normalize_id for an array of distinct non-NULL values.
+    """
+    if values.dtype.kind in "iu":
+        return values.astype(str).astype(object)
+
+    if values.dtype.kind == "f":
+        # str() of a whole float below 1e16 is "<int>.0" (-0.0,
+        # which factorizes together with 0.0, becomes "0"); anything
+        # else (fractions, huge values) keeps the text rules
+        whole = (values == np.trunc(values)) & (np.abs(values) < 1e16)
+        text = np.empty(len(values), dtype=object)
+        text[whole] = values[whole].astype(np.int64).astype(str)
+        text[~whole] = _normalize_text([str(v) for v in values[~whole]])
+        return text
+
+    return _normalize_text([str(v) for v in values])
+
+
+def _normalize_text(values):
+    return (
+        pd.Series(values, dtype=object)
+          .str.replace(r"\.0$", "", regex=True)
+          .str.strip()
+          .replace({"nan": "", "None": ""})
+          .to_numpy(dtype=object)
+    )
+
+
+# The code normalize_id runs: results stored between runs hash it
+# (see pipeline_state.code_signature) so a change rebuilds them
+NORMALIZE_CODE = (normalize_id, _normalize_values, _normalize_text)
+
+
+def normalize(name, df):
+    """
+    df (as pulled from the database) with its id columns
+    normalised and trailing spaces removed from category values
+    (SQL Server ignores them when comparing; leading ones count).
+    """
+    for col, kind in get(name).items():
+        if col not in df.columns:
+            continue
+        if kind == "id":
+            df[col] = normalize_id(df[col])
+        elif kind == "category":
+            codes, uniques = pd.factorize(df[col])
+            text = np.append([str(v).rstrip() for v in uniques], None).astype(object)
+            df[col] = pd.Series(text[codes], index=df.index, dtype=object)
+    return df
+
+
+# ------------------------------------------------------------
+# Validation (at write)
+# ------------------------------------------------------------
+def _numbers(s):
+    """
+    s as numbers, or None if some value is not one. Blank text
+    counts as NULL, as it does when the CSV is read back.
+    """
+    if s.dtype == object:
+        s = s.mask(s.astype(str).str.strip() == "")
+    try:
+        return pd.to_numeric(s)
+    except (ValueError, TypeError):
+        return None
+
+
+def _fits(s, kind):
+    if kind not in ("int64", "Int64", "float64"):
+        return True
+    if pd.api.types.is_bool_dtype(s):
+        return False
+    n = s if pd.api.types.is_numeric_dtype(s) else _numbers(s)
+    if n is None:
+        return False
+    if kind == "int64":
+        # Floats (1606.0) would be written, and read back, as such
+        return pd.api.types.is_integer_dtype(n)
+    if kind == "Int64":
+        return bool((n.dropna() % 1 == 0).all())
+    return True
+
+
+def check(name, df):
+    """
+    Raise SchemaError unless df has exactly the declared columns
+    and every value fits its column's kind.
+    """
+    columns = get(name)
+    declared = [c for c in columns if c != OTHER]
+    missing = [c for c in declared if c not in df.columns]
+    extra = [c for c in df.columns if c not in columns] if OTHER not in columns else []
+    if missing or extra:
+        raise SchemaError(
+            f"{name}: columns do not match scripts/schemas.py "
+            f"(missing {missing}, undeclared {extra})"
+        )
+
+    wrong = []
+    for col in df.columns:
+        kind = columns.get(col, columns.get(OTHER))
+        if not _fits(df[col], kind):
+            wrong.append(f"{col} (declared {kind}, got {df[col].dtype})")
+    if wrong:
+        raise SchemaError(f"{name}: values do not fit their declared type: {', '.join(wrong)}")
+
+
+# ------------------------------------------------------------
+# Public JSON
+# ------------------------------------------------------------
+def json_ids(name, df):
+    """
+    df with its id columns as the public JSON has always carried
+    them: numbers where every value is one (int64, or float64 if
+    some are NULL, as pd.read_csv inferred them before the columns
+    were declared ids), text otherwise. The JSON builders call it,
+    so declaring a column an id does not change the JSON.
+    """
+    for col, kind in get(name).items():
+        if kind == "id" and col in df.columns:
+            numbers = _numbers(df[col])
+            if numbers is not None:
+                df[col] = numbers
+    return df
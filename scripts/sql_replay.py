@@ -0,0 +1,236 @@
+"""
+Record and replay of SQL result sets.
+
+FOUNDATION_REPLAY=record stores the complete result of every
+statement foundation_db runs under REPLAY_DIR, keyed by the exact
+statement text and its parameters. FOUNDATION_REPLAY=replay serves
+those results back without a database connection, so transform and
+serialization changes can be run, timed and compared byte for byte
+against production-shaped data, offline and repeatably.
+
+Each result is one gzip file: a header (statement, parameters,
+columns) followed by the rows exactly as the driver returned them,
+pickled in the chunks they were fetched in. Recording and replay
+stream like the query itself; a statement that was not read to the
+end is not recorded.
+
+The manifest keeps the as-of moment the recorded run was pinned to,
+and replay pins PIPELINE_AS_OF to it, so date-dependent statements
+and outputs match the recording. Statements also depend on the pipeline state
+(watermarks, stored partitions): replay from the same state the
+recording started from, e.g. an empty PIPELINE_STATE_DIR for both.
+"""
+import gzip
+import hashlib
+import json
+import os
+import pickle
+from datetime import datetime, timezone
+
+import pipeline_state
+
+MODE = os.getenv("FOUNDATION_REPLAY", "")
+REPLAY_DIR = os.getenv("FOUNDATION_REPLAY_DIR", "replay")
+MANIFEST_FILE = os.path.join(REPLAY_DIR, "manifest.json")
+
+if MODE not in ("", "record", "replay"):
+    raise ValueError(f"Unknown FOUNDATION_REPLAY: {MODE}")
+
+
+class ReplayMiss(LookupError):
+    """
+    A statement (with these parameters) that the recording does
+    not contain.
+    """
+
+
+def result_key(sql, params=None):
+    payload = json.dumps(
+        {
+            "sql": sql,
+            "params": [[type(p).__name__, str(p)] for p in params or []],
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def result_path(key):
+    return os.path.join(REPLAY_DIR, key[:2], f"{key}.pkl.gz")
+
+
+# ------------------------------------------------------------
+# Recording
+# ------------------------------------------------------------
+class RecordingCursor:
+    """
+    Wraps a driver cursor; every row fetched is also written to
+    the statement's result file, which is kept only once the
+    result has been read to the end.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._file = None
+        self._tmp = None
+        self._path = None
+        self._complete = False
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, sql, params=None):
+        if params:
+            self._cursor.execute(sql, params)
+        else:
+            self._cursor.execute(sql)
+
+        self._path = result_path(result_key(sql, params))
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        self._tmp = f"{self._path}.{os.getpid()}.{id(self)}.tmp"
+        self._file = gzip.open(self._tmp, "wb", compresslevel=6)
+        pickle.dump(
+            {
+                "sql": sql,
+                "params": list(params or []),
+                "columns": [d[0] for d in self._cursor.description],
+            },
+            self._file,
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+        return self
+
+    def _tee(self, rows, done):
+        rows = [tuple(r) for r in rows]
+        if rows:
+            pickle.dump(rows, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._complete = done
+        return rows
+
+    def fetchmany(self, size):
+        rows = self._cursor.fetchmany(size)
+        return self._tee(rows, not rows)
+
+    def fetchall(self):
+        return self._tee(self._cursor.fetchall(), True)
+
+    def close(self):
+        self._cursor.close()
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        if self._complete:
+            os.replace(self._tmp, self._path)
+        else:
+            os.remove(self._tmp)
+
+
+def start_recording():
+    # One as-of moment for the whole recorded run (steps started
+    # from run_all inherit it)
+    os.environ.setdefault(
+        "PIPELINE_AS_OF", datetime.now(timezone.utc).isoformat(timespec="seconds")
+    )
+    pipeline_state.save_json(MANIFEST_FILE, {
+        "as_of": os.environ["PIPELINE_AS_OF"],
+        "recorded_utc": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    })
+
+
+# ------------------------------------------------------------
+# Replay
+# ------------------------------------------------------------
+class ReplayCursor:
+    """
+    Cursor over a recorded result: same columns and rows, served
+    in whatever fetch sizes the caller asks for.
+    """
+
+    def __init__(self):
+        self._file = None
+        self._buffer = []
+        self.description = None
+
+    def execute(self, sql, params=None):
+        path = result_path(result_key(sql, params))
+        if not os.path.exists(path):
+            raise ReplayMiss(
+                f"No recorded result for this statement and parameters "
+                f"({os.path.basename(path)}): {' '.join(sql.split())[:200]} {params or ''}"
+            )
+        self._file = gzip.open(path, "rb")
+        header = pickle.load(self._file)
+        self.description = [(c, None, None, None, None, None, None) for c in header["columns"]]
+        return self
+
+    def _fill(self, size):
+        while self._file is not None and (size is None or len(self._buffer) < size):
+            try:
+                self._buffer.extend(pickle.load(self._file))
+            except EOFError:
+                self._file.close()
+                self._file = None
+
+    def fetchmany(self, size):
+        self._fill(size)
+        rows, self._buffer = self._buffer[:size], self._buffer[size:]
+        return rows
+
+    def fetchall(self):
+        self._fill(None)
+        rows, self._buffer = self._buffer, []
+        return rows
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def pin_as_of():
+    """
+    Run as of the recording's moment, unless PIPELINE_AS_OF is
+    already set.
+    """
+    manifest = pipeline_state.load_json(MANIFEST_FILE)
+    if manifest is None:
+        raise ReplayMiss(f"No recording in {REPLAY_DIR} (missing {MANIFEST_FILE})")
+    os.environ.setdefault("PIPELINE_AS_OF", manifest["as_of"])
+
+
+_installed = False
+
+
+def install():
+    """
+    Start recording, or pin the recording's as-of moment, as
+    FOUNDATION_REPLAY asks (once per process). run_all calls it
+    before any step starts, so subprocess steps inherit the pinned
+    PIPELINE_AS_OF.
+    """
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    if MODE == "record":
+        start_recording()
+    elif MODE == "replay":
+        pin_as_of()
+
+
+def attach():
+    """
+    Join the recording or replay run_all set up (foundation_db
+    calls it in every step). A step only starts a recording, and
+    writes the manifest, when none exists for its as-of moment,
+    i.e. when it is run on its own.
+    """
+    global _installed
+    if MODE == "record":
+        manifest = pipeline_state.load_json(MANIFEST_FILE)
+        if manifest and manifest["as_of"] == os.getenv("PIPELINE_AS_OF"):
+            _installed = True
+            return
+    install()
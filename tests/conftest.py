@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The pipeline's modules import each other as top-level modules
+SCRIPTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+sys.path.insert(0, SCRIPTS)
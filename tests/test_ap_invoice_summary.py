@@ -0,0 +1,57 @@
+"""
+10's per-invoice rollup against the header x detail line fan-out
+it replaced (PARITY LOCKED, benchmark.reference_per_invoice):
+each voucher's payments counted once per detail line.
+"""
+import importlib
+
+import numpy as np
+import pandas as pd
+
+import benchmark
+
+summary = importlib.import_module("10_ap_invoice_summary")
+
+
+def payments(n=5000, seed=7):
+    """
+    payments.csv rows as 10 sees them: several vouchers per
+    invoice, their payments interleaved, vouchers without detail
+    lines, NULL jobs, payments and transaction dates.
+    """
+    rng = np.random.default_rng(seed)
+    vouchers = rng.integers(1, n // 3, n)
+    invoice = vouchers // 3
+    lines = rng.integers(0, 6, n // 3)
+    dates = pd.Timestamp("2026-01-01") + pd.to_timedelta(rng.integers(0, 400, n // 3), unit="D")
+    job = np.where(invoice % 7 == 0, None, (invoice % 50).astype(str))
+
+    df = pd.DataFrame({
+        "voucher_no": vouchers.astype(str),
+        "invoice_no": invoice.astype(str),
+        "invoice_date": dates[invoice],
+        "transaction_date": dates[vouchers].where(vouchers % 5 != 0),
+        "invoice_amount": (invoice * 37 % 1000) + 0.13,
+        "vendor_name": "Vendor " + (invoice % 9).astype(str),
+        "retainage_amount": (invoice % 4) * 12.5,
+        "cash_amount": rng.integers(1, 1_000_000, n) / 100,
+        "detail_line_count": lines[vouchers],
+        "job_no": job,
+        "job_description": pd.Series(job).radd("Job "),
+        "project_manager_name": "PM",
+    })
+    df.loc[rng.random(n) < 0.02, "cash_amount"] = np.nan
+    return df
+
+
+def test_per_invoice_matches_fan_out():
+    df = payments()
+    expected = benchmark.reference_per_invoice(df)
+    actual = summary.per_invoice(df)
+
+    pd.testing.assert_frame_equal(
+        actual.drop(columns="amount_paid"), expected.drop(columns="amount_paid")
+    )
+    pd.testing.assert_series_equal(
+        actual["amount_paid"], expected["amount_paid"], check_exact=False, rtol=1e-12
+    )
@@ -0,0 +1,54 @@
+"""
+The stand-in's query timeout (Connection.timeout), which has to
+cover the fetches SQLite evaluates a statement in, not only
+execute.
+"""
+import sqlite3
+import time
+
+import pytest
+
+import foundation_standin
+
+# First row at once, every row in several seconds
+COUNT = (
+    "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 20000000)"
+    " SELECT i FROM n WHERE i % 1000 = 1"
+)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    path = str(tmp_path / "empty.sqlite")
+    sqlite3.connect(path).close()
+    conn = foundation_standin.connect(path)
+    yield conn
+    conn.close()
+
+
+def fetch_all(cursor):
+    cursor.fetchall()
+
+
+def fetch_batches(cursor):
+    while cursor.fetchmany(5000):
+        pass
+
+
+@pytest.mark.parametrize("fetch", [fetch_all, fetch_batches])
+def test_timeout_applies_to_fetches(conn, fetch):
+    conn.timeout = 0.5
+    cursor = conn.cursor().execute(COUNT)
+
+    started = time.monotonic()
+    with pytest.raises(foundation_standin.Error, match="interrupted"):
+        fetch(cursor)
+    assert time.monotonic() - started < 3
+
+
+def test_time_between_fetches_does_not_count(conn):
+    conn.timeout = 0.5
+    cursor = conn.cursor().execute("SELECT 1 UNION ALL SELECT 2")
+    assert cursor.fetchmany(1) == [(1,)]
+    time.sleep(0.6)
+    assert cursor.fetchmany(1) == [(2,)]
@@ -0,0 +1,62 @@
+"""
+04's GL outputs from the account x month matrix (gl_matrix,
+gl_balances) against the per-account code they replaced (PARITY
+LOCKED, benchmark.reference_gl_history and
+reference_gl_history_all), as of several months.
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import benchmark
+
+MONTHS = [date(2026, 9, 1), date(2026, 1, 1), date(2025, 9, 1), date(2024, 12, 1)]
+
+
+def raw_gl(n=20000, seed=11):
+    """
+    gl_history_raw rows as 04 reads them: income and balance
+    sheet accounts, one without a description and one the
+    accounts join misses (below 1000), CLS journals (also with a
+    leading space or lower case), NULL journals and amounts,
+    gaps of months without activity.
+    """
+    rng = np.random.default_rng(seed)
+    accounts = np.array(["0500", "1000", "1200", "2100", "4000", "4100", "6500", "8020", "8100", "9999"])
+    months = pd.date_range("2023-01-01", "2026-10-01", freq="MS").date
+
+    df = pd.DataFrame({
+        "Account": accounts[rng.integers(0, len(accounts), n)],
+        "Jrnl": pd.Categorical(
+            rng.choice(["GJ", "CLS", " CLS", "cls", None], n, p=[0.9, 0.04, 0.02, 0.02, 0.02])
+        ),
+        "Debit": rng.integers(0, 100_000, n) / 100,
+        "Credit": rng.integers(0, 100_000, n) / 100,
+        "MonthStart": months[rng.integers(0, len(months), n)],
+    })
+    df.loc[rng.random(n) < 0.03, "Debit"] = np.nan
+    df.loc[rng.random(n) < 0.03, "Credit"] = np.nan
+    # Account 1200 has no activity in 2025
+    return df[~((df["Account"] == "1200") & (df["MonthStart"].map(lambda d: d.year) == 2025))]
+
+
+def chart_of_accounts():
+    numbers = [500, 1000, 1200, 2100, 4000, 4100, 6500, 8020, 8100]
+    return pd.DataFrame({
+        "account_no": numbers,
+        "description": [f"Account {n}" for n in numbers],
+        "debit_credit": "D",
+        "Account_Key": numbers,
+    })
+
+
+def test_gl_rollups_match_reference():
+    raw, ac = raw_gl(), chart_of_accounts()
+    history, pivot = benchmark.gl_snapshots(raw, ac, MONTHS)
+    expected_history, expected_pivot = benchmark.reference_gl_snapshots(raw, ac, MONTHS)
+
+    pd.testing.assert_frame_equal(pivot, expected_pivot, check_dtype=False, check_exact=True)
+    for month, actual, expected in zip(MONTHS, history, expected_history):
+        assert len(actual) == 8, month
+        pd.testing.assert_frame_equal(actual, expected, check_dtype=False, check_exact=True)
@@ -0,0 +1,116 @@
+"""
+08's job_billed_revenue.csv from the raw GL dataset against the
+one from its SQL scan, on a small stand-in database (see
+generate_standin.py) with GL lines added that the two paths must
+treat alike: closing journals in another case or with leading or
+trailing spaces, NULL journals, NULL amounts and lines without a
+job.
+
+    pip install pytest
+    python -m pytest tests
+"""
+import importlib
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+import artifacts
+from conftest import SCRIPTS
+
+AS_OF = "2026-10-17"
+SCALE = "0.01"
+
+# (journal_no, job_no, amount_db, amount_cr) posted to revenue
+# account 4100. SQL's journal_no <> 'CLS' drops the first four:
+# it compares case-insensitively, ignoring trailing spaces (not
+# leading ones), and is not true for NULL
+EDGE_LINES = [
+    ("CLS", "T-100", 0.0, 500.0),
+    ("cls", "T-100", 0.0, 500.0),
+    ("CLS  ", "T-100", 0.0, 500.0),
+    (None, "T-100", 0.0, 500.0),
+    (" CLS", "T-100", 0.0, 1000.0),
+    ("GJ", "T-100", None, 100.0),
+    ("GJ", "T-100", 30.0, None),
+    ("gj ", "T-100", 0.0, 5.0),
+    ("GJ", None, 0.0, 7.0),
+]
+EDGE_REVENUE = 1000.0 + 100.0 - 30.0 + 5.0
+
+
+def add_edge_lines(db):
+    conn = sqlite3.connect(db)
+    (day,) = conn.execute("SELECT MAX(date_posted) FROM gl_history").fetchone()
+    conn.executemany(
+        "INSERT INTO gl_history (basic_account_no, job_no, journal_no, transaction_no,"
+        " line_no, amount_db, amount_cr, record_status, date_posted)"
+        " VALUES ('4100', ?, ?, ?, 1, ?, ?, 'A', ?)",
+        [
+            (job, journal, 900_000_000 + i, debit, credit, day)
+            for i, (journal, job, debit, credit) in enumerate(EDGE_LINES)
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture(scope="module")
+def step(tmp_path_factory):
+    """
+    08_job_billed_revenue, run against the stand-in after 03 has
+    extracted the raw GL dataset from it.
+    """
+    root = tmp_path_factory.mktemp("standin")
+    db = str(root / "foundation.sqlite")
+    subprocess.run(
+        [sys.executable, os.path.join(SCRIPTS, "generate_standin.py"), "--scale", SCALE, "--out", db],
+        check=True,
+        capture_output=True,
+        env={**os.environ, "PIPELINE_AS_OF": AS_OF},
+    )
+    add_edge_lines(db)
+
+    # The modules read their configuration at import
+    with pytest.MonkeyPatch.context() as mp:
+        mp.chdir(root)
+        mp.setenv("FOUNDATION_BACKEND", "standin")
+        mp.setenv("FOUNDATION_STANDIN_DB", db)
+        mp.setenv("PIPELINE_STATE_DIR", str(root / ".pipeline"))
+        mp.setenv("PIPELINE_AS_OF", AS_OF)
+        for name in ("FOUNDATION_REPLAY", "GL_START_DATE"):
+            mp.delenv(name, raising=False)
+        # Already imported by other tests
+        mp.setattr(importlib.import_module("foundation_standin"), "DEFAULT_PATH", db)
+
+        importlib.import_module("03_gl_history_raw").main()
+        yield importlib.import_module("08_job_billed_revenue")
+
+
+def written(step, grouped, path):
+    """
+    job_billed_revenue.csv as 08 writes it from grouped, read
+    back.
+    """
+    final = step.finalize(grouped, step.job_descriptions())
+    artifacts.write_csv("job_billed_revenue", final, str(path))
+    return artifacts.read_csv("job_billed_revenue", str(path))
+
+
+def test_raw_gl_matches_sql(step, tmp_path):
+    raw = written(step, step.revenue_from_raw_gl(), tmp_path / "raw.csv")
+    sql = written(step, step.revenue_from_sql(), tmp_path / "sql.csv")
+
+    pd.testing.assert_frame_equal(raw.drop(columns="Billed_Revenue"), sql.drop(columns="Billed_Revenue"))
+    # Summation order differs, which can move a rounded total by
+    # a cent (as 08's own parity check allows)
+    assert ((raw["Billed_Revenue"] - sql["Billed_Revenue"]).abs() <= 0.01 + 1e-9).all()
+
+
+def test_journal_filter_and_nulls(step, tmp_path):
+    for name, grouped in (("raw", step.revenue_from_raw_gl()), ("sql", step.revenue_from_sql())):
+        df = written(step, grouped, tmp_path / f"{name}.csv").set_index("Job_No")
+        assert df.loc["T-100", "Billed_Revenue"] == pytest.approx(EDGE_REVENUE)
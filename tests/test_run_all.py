@@ -0,0 +1,51 @@
+"""
+run_all's skip rule: a step is skipped only when it has input and
+output files whose fingerprints match its last successful run.
+"""
+import os
+
+import pytest
+
+import run_all
+
+
+@pytest.fixture
+def fingerprints(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data")
+    monkeypatch.setattr(run_all, "FINGERPRINTS_FILE", str(tmp_path / "fingerprints.json"))
+
+
+def step(path):
+    return next(s for s in run_all.STEPS if s["path"] == path)
+
+
+def succeed(step):
+    for res in step["writes"]:
+        if run_all.is_file_resource(res):
+            os.makedirs(os.path.dirname(res), exist_ok=True)
+            with open(res, "w") as f:
+                f.write("x\n")
+    signature = run_all.step_signature(step, "code")
+    run_all.record_success(step, signature, run_all.output_fingerprints(step))
+    return signature
+
+
+def test_file_step_is_skipped_when_unchanged(fingerprints):
+    summary = step("scripts/10_ap_invoice_summary.py")
+    with open("data/payments.csv", "w") as f:
+        f.write("voucher_no\n1\n")
+    assert run_all.is_up_to_date(summary, succeed(summary))
+
+
+@pytest.mark.parametrize("path", [
+    # No inputs, only writes db:
+    "scripts/01_test_connection.py",
+    # Reads the database
+    "scripts/02_accounts.py",
+    # Barrier
+    "scripts/99_write_pipeline_health.py",
+])
+def test_step_without_file_inputs_always_runs(fingerprints, path):
+    s = step(path)
+    assert not run_all.is_up_to_date(s, succeed(s))
@@ -0,0 +1,73 @@
+"""
+Column declarations (schemas.py): what check() accepts at write
+and how ids reach the public JSON.
+"""
+import pandas as pd
+import pytest
+
+import artifacts
+import schemas
+
+
+def test_json_ids_numeric_as_read_before():
+    df = pd.DataFrame({"invoice_no": ["545", "546"], "job_no": ["1326", None]})
+    schemas.json_ids("ar_invoice_summary", df)
+    assert df["invoice_no"].tolist() == [545, 546]
+    assert df["invoice_no"].dtype == "int64"
+    assert df["job_no"].dtype == "float64"
+    assert df["job_no"].iloc[0] == 1326.0
+
+
+def test_json_ids_text_stays_text():
+    df = pd.DataFrame({"invoice_no": ["545", "546"], "job_no": ["1326", "BUDGET"]})
+    schemas.json_ids("ar_invoice_summary", df)
+    assert df["job_no"].tolist() == ["1326", "BUDGET"]
+
+
+# A value of each kind that fits it
+SAMPLE = {
+    "id": "1",
+    "string": "x",
+    "category": "a",
+    "int64": 1,
+    "Int64": 1,
+    "float64": 1.0,
+    "date": "2026-01-01",
+}
+
+
+def frame(name, **values):
+    """
+    A one-row frame with the dataset's declared columns, sample
+    values but for the given ones.
+    """
+    return pd.DataFrame([{
+        col: values.get(col, SAMPLE[kind]) for col, kind in schemas.get(name).items()
+    }])
+
+
+@pytest.mark.parametrize("name, column", [
+    ("job_billed_revenue", "Job_No"),
+    ("payments", "job_no"),
+    ("ap_invoice_summary", "job_no"),
+    ("ap_payment_job_allocation", "job_no"),
+    ("job_actuals", "Job_No"),
+    ("ar_invoice_summary", "job_no"),
+    ("ar_receipt_job_allocation", "job_no"),
+    ("labor_job_allocation", "job_no"),
+])
+def test_non_numeric_job_is_written(tmp_path, name, column):
+    path = tmp_path / f"{name}.csv"
+    artifacts.write_csv(name, frame(name, **{column: "BUDGET"}), path)
+    assert artifacts.read_csv(name, path)[column].tolist() == ["BUDGET"]
+
+
+@pytest.mark.parametrize("values", [
+    {"employee_no": "E-7"},
+    {"employee_no": ""},
+    {"cost_code_no": "02A"},
+    {"cost_code_no": ""},
+])
+def test_labor_ids_as_14_normalises_them(tmp_path, values):
+    path = tmp_path / "labor_job_allocation.csv"
+    artifacts.write_csv("labor_job_allocation", frame("labor_job_allocation", **values), path)